@@ -1,11 +1,9 @@
 import os
 import json
+import asyncio
 import click # type: ignore
 
 from pathlib import Path
-from cryptography.hazmat.primitives import serialization as crypto_serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
-from cryptography.hazmat.backends import default_backend as crypto_default_backend
 
 @click.group()
 def aster():
@@ -16,8 +14,12 @@ def aster():
 @click.option('--port', default=80, help='Port to bind to (defaults to 80)')
 @click.option('--key', default=None, help='Load a SSH Key from a file.')
 @click.option('--mongo', help='MongoDB connection string.')
-@click.option('--encrypt', help='Encrypt existing data in the database.')
+@click.option('--encrypt', default=None, help='Encrypt existing data in the given database.')
 def install(host, port, key, mongo, encrypt):
+    from cryptography.hazmat.primitives import serialization as crypto_serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.hazmat.backends import default_backend as crypto_default_backend
+
     click.echo('Installing AsterDB API...')
 
     if key is None:
@@ -38,7 +40,7 @@ def install(host, port, key, mongo, encrypt):
             crypto_serialization.PublicFormat.OpenSSH
         )).decode("utf-8")
 
-        home_directory = Path.home().replace("\\", "/")
+        home_directory = str(Path.home()).replace("\\", "/")
         try:
             os.makedirs(home_directory + "/.ssh/aster.db", exist_ok = True)
         except:
@@ -60,7 +62,7 @@ def install(host, port, key, mongo, encrypt):
             click.echo('Private key loaded.')
 
         with open(key + ".pub", "r") as file:
-            public_key = 
+            public_key = file.read()
             click.echo('Public key loaded.')
 
     config_payload = {
@@ -72,4 +74,60 @@ def install(host, port, key, mongo, encrypt):
     }
     with open("./config.json", "x") as file:
         file.write(json.dumps(config_payload, indent = 4))
-        click.echo('Config file created.')
\ No newline at end of file
+        click.echo('Config file created.')
+
+    if encrypt is not None:
+        encrypt_database(mongo, private_key, encrypt, None, 1000, 4, None)
+
+def encrypt_database(mongo, private_key, database, collections, batch_size, workers, rate):
+    from aster.client import AsterClient
+    from aster.migration import Migration
+
+    if os.path.isfile(private_key):
+        with open(private_key, "r") as file:
+            private_key = file.read()
+
+    def report(stats):
+        click.echo(f'{stats.collection}: {stats.migrated} documents encrypted ({stats.throughput:.1f} docs/s)')
+
+    async def run():
+        client = AsterClient(mongo, private_key, executor = "process")
+        try:
+            return await Migration(
+                client,
+                database,
+                collections or None,
+                batch_size = batch_size,
+                workers = workers,
+                max_ops_per_second = rate,
+                on_progress = report
+            ).run()
+        finally:
+            await client.close()
+
+    for stats in asyncio.run(run()).values():
+        click.echo(f'{stats.collection}: done, {stats.migrated} documents encrypted.')
+
+@aster.command()
+@click.argument('mongo')
+@click.option('--key', required=True, help='Path to the private key to encrypt with.')
+@click.option('--database', required=True, help='Database to encrypt.')
+@click.option('--collection', multiple=True, help='Collection to encrypt, repeat for several (defaults to all).')
+@click.option('--batch-size', default=1000, help='Documents per bulk write (defaults to 1000).')
+@click.option('--workers', default=4, help='Batches encrypted in parallel (defaults to 4).')
+@click.option('--rate', default=None, type=float, help='Maximum documents written per second (defaults to no limit).')
+def encrypt(mongo, key, database, collection, batch_size, workers, rate):
+    click.echo('Encrypting existing data, progress is checkpointed and resumes when run again...')
+    encrypt_database(mongo, key, database, list(collection), batch_size, workers, rate)
+
+@aster.command()
+@click.option('--config', default='./config.json', help='Path to the config file (defaults to ./config.json)')
+@click.option('--workers', default=None, type=int, help='Number of worker processes (defaults to the config or 1)')
+def serve(config, workers):
+    from aster.server import run
+
+    click.echo('Starting AsterDB API...')
+    run(config, workers)
+
+if __name__ == '__main__':
+    aster()
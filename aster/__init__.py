@@ -1,20 +1,45 @@
-__title__ = 'aster.db'
-__author__ = 'BenitzCoding'
-__license__ = 'MIT'
-__copyright__ = 'Copyright 2023-present BenitzCoding'
-__version__ = '0.0.1'
-
-from .errors import (
-   BadRequestError,
-   DuplicateError,
-   NotFoundError,
-   PrivateKeyError,
-   ServerError,
-   UnknownError
-)
-from .http import HTTPClient
-from .wrapper import (
-   Aster,
-   # Database,
-   # Collection
-)
\ No newline at end of file
+__title__ = 'aster.db'
+__author__ = 'BenitzCoding'
+__license__ = 'MIT'
+__copyright__ = 'Copyright 2023-present BenitzCoding'
+__version__ = '0.0.1'
+
+from .errors import (
+   BadRequestError,
+   DuplicateError,
+   NotFoundError,
+   PrivateKeyError,
+   ServerError,
+   UnknownError
+)
+
+import importlib
+from typing import Any
+
+# The backends pull in aiohttp, Motor and the crypto packages, they are only
+# imported once they are used so `import aster` stays cheap.
+_LAZY_ATTRIBUTES = {
+   "Aster": ".wrapper",
+   "HTTPClient": ".http",
+   "BlobReader": ".blob",
+   "MetricsRecorder": ".instrumentation",
+   "OpenTelemetryInstrumentation": ".instrumentation",
+   "CompositeInstrumentation": ".instrumentation",
+   "deadline": ".resilience",
+   "RetryPolicy": ".resilience",
+   "Hedging": ".resilience",
+   # "Database": ".wrapper",
+   # "Collection": ".wrapper"
+}
+
+def __getattr__(name: str) -> Any:
+   module = _LAZY_ATTRIBUTES.get(name)
+   if module is None:
+      raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+   value = getattr(importlib.import_module(module, __name__), name)
+   globals()[name] = value
+   return value
+
+def __dir__() -> list:
+   return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
\ No newline at end of file
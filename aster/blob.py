@@ -0,0 +1,235 @@
+from .errors import PrivateKeyError
+
+import os
+from typing import Any, AsyncIterator, List, Optional, Tuple, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .codec import DataKey
+
+# The GridFS default, a chunk and its document stay well below the 16 MB BSON limit.
+CHUNK_SIZE = 255 * 1024
+SALT_SIZE = 16
+
+# Like GridFS, a blob of `<collection>` is described in `<collection>.files` and stored in `<collection>.chunks`.
+FILES_COLLECTION = "files"
+CHUNKS_COLLECTION = "chunks"
+
+# Chunks written or read per round trip.
+BATCH_CHUNKS = 8
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+class BlobCipher:
+    def __init__(self, data_key: "DataKey", salt: bytes, blob_id: str):
+        """Seals the chunks of one blob with the STREAM construction.
+
+        Every blob gets its own AES-256-GCM key, derived with HKDF from a
+        data key and a random salt, so chunk nonces can be a plain counter.
+        The last byte of the nonce marks the final chunk, and the blob ID is
+        authenticated with every chunk, so chunks that were reordered,
+        dropped, cut off at the end or moved to another blob fail to decrypt.
+
+        Args:
+            data_key (DataKey): The data key, wrapped with RSA once and shared with documents.
+            salt (bytes): The random salt of the blob.
+            blob_id (str): The ID of the blob.
+        """
+        # Imported here, HTTPClient uses the rest of this module without the crypto packages.
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+        key = HKDF(hashes.SHA256(), 32, salt, b"aster.db/blob").derive(data_key.key)
+        self.aead = AESGCM(key)
+        self.associated_data = blob_id.encode()
+
+    @staticmethod
+    def nonce(index: int, last: bool) -> bytes:
+        return index.to_bytes(11, "big") + (b"\x01" if last else b"\x00")
+
+    def encrypt(self, index: int, chunk: BytesLike, last: bool) -> bytes:
+        return self.aead.encrypt(self.nonce(index, last), chunk, self.associated_data)
+
+    def decrypt(self, index: int, ciphertext: bytes, last: bool) -> bytes:
+        from cryptography.exceptions import InvalidTag
+
+        try:
+            return self.aead.decrypt(self.nonce(index, last), ciphertext, self.associated_data)
+        except InvalidTag:
+            raise PrivateKeyError("A chunk of the blob failed authentication, the data was modified or the key is wrong.")
+
+def new_salt() -> bytes:
+    return os.urandom(SALT_SIZE)
+
+def chunk_count(length: int, chunk_size: int) -> int:
+    # An empty blob still has one empty chunk, which authenticates that nothing was cut off.
+    return max(1, -(-length // chunk_size))
+
+async def chunks(data: Any, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[BytesLike]:
+    """Splits data into chunks of `chunk_size` bytes, the last one may be shorter.
+
+    Bytes are sliced with memoryviews instead of being copied. Anything else
+    is read piece by piece, so only about one chunk is held at a time.
+
+    Args:
+        data (Any): Bytes, a file object with `read`, or a sync or async iterable of bytes.
+        chunk_size (int, optional): The size of the chunks. Defaults to CHUNK_SIZE.
+
+    Yields:
+        BytesLike: The chunks.
+    """
+    if chunk_size <= 0:
+        raise ValueError("The chunk size has to be positive.")
+
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        view = memoryview(data).cast("B")
+        for offset in range(0, len(view), chunk_size):
+            yield view[offset:offset + chunk_size]
+
+        return
+
+    buffer = bytearray()
+    async for piece in _pieces(data, chunk_size):
+        if not buffer and len(piece) == chunk_size:
+            yield piece
+            continue
+
+        buffer += piece
+        while len(buffer) >= chunk_size:
+            yield bytes(buffer[:chunk_size])
+            del buffer[:chunk_size]
+
+    if buffer:
+        yield bytes(buffer)
+
+async def indexed(source: AsyncIterator[BytesLike]) -> AsyncIterator[Tuple[int, BytesLike, bool]]:
+    """Numbers chunks and marks the last one, which needs to look one chunk ahead.
+
+    Args:
+        source (AsyncIterator[BytesLike]): The chunks, e.g. from `chunks`.
+
+    Yields:
+        Tuple[int, BytesLike, bool]: The index, the chunk and whether it is the last one.
+    """
+    index = 0
+    previous: Optional[BytesLike] = None
+    async for chunk in source:
+        if previous is not None:
+            yield index, previous, False
+            index += 1
+
+        previous = chunk
+
+    yield index, b"" if previous is None else previous, True
+
+async def _pieces(data: Any, size: int) -> AsyncIterator[BytesLike]:
+    if hasattr(data, "read"):
+        while True:
+            piece = data.read(size)
+            if hasattr(piece, "__await__"):
+                piece = await piece
+
+            if not piece:
+                return
+
+            yield piece
+
+    elif hasattr(data, "__aiter__"):
+        async for piece in data:
+            yield piece
+
+    else:
+        for piece in data:
+            yield piece
+
+class BlobReader:
+    def __init__(self, blob_id: str, length: int, source: AsyncIterator[memoryview]):
+        """Reads a blob as it is streamed in, without holding more than a chunk.
+
+        Iterating yields memoryviews of the decrypted chunks, `read` returns
+        bytes of any size. Use it as an async context manager, or call
+        `close`, to release the cursor or connection early.
+
+            async with await db.open_blob("media", "videos", blob_id) as blob:
+                async for chunk in blob:
+                    file.write(chunk)
+
+        Args:
+            blob_id (str): The ID of the blob.
+            length (int): The size of the blob in bytes.
+            source (AsyncIterator[memoryview]): The decrypted chunks.
+        """
+        self.id = blob_id
+        self.length = length
+        self.position = 0
+        self._source = source
+        self._buffer = memoryview(b"")
+
+    def __repr__(self) -> str:
+        return f"<BlobReader id={self.id!r} length={self.length} position={self.position}>"
+
+    async def _next(self) -> Optional[memoryview]:
+        if self._buffer:
+            chunk, self._buffer = self._buffer, memoryview(b"")
+            return chunk
+
+        async for chunk in self._source:
+            if chunk:
+                return chunk
+
+        return None
+
+    def __aiter__(self) -> "BlobReader":
+        return self
+
+    async def __anext__(self) -> memoryview:
+        chunk = await self._next()
+        if chunk is None:
+            raise StopAsyncIteration
+
+        self.position += len(chunk)
+        await self._finish()
+        return chunk
+
+    async def read(self, size: int = -1) -> bytes:
+        """Reads up to `size` bytes, less only at the end of the blob.
+
+        Args:
+            size (int, optional): The number of bytes, -1 for the rest of the blob. Defaults to -1.
+
+        Returns:
+            bytes: The data, empty at the end of the blob.
+        """
+        parts: List[memoryview] = []
+        wanted = self.length - self.position if size < 0 else size
+        while wanted > 0:
+            chunk = await self._next()
+            if chunk is None:
+                break
+
+            if len(chunk) > wanted:
+                chunk, self._buffer = chunk[:wanted], chunk[wanted:]
+
+            parts.append(chunk)
+            wanted -= len(chunk)
+            self.position += len(chunk)
+
+        await self._finish()
+        return parts[0].tobytes() if len(parts) == 1 else b"".join(parts)
+
+    async def _finish(self) -> None:
+        # The cursor or connection is released as soon as the whole blob was read.
+        if self.position >= self.length and not self._buffer:
+            await self.close()
+
+    async def close(self) -> None:
+        self._buffer = memoryview(b"")
+        aclose = getattr(self._source, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    async def __aenter__(self) -> "BlobReader":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
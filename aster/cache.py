@@ -0,0 +1,227 @@
+from . import wire
+from .instrumentation import detached
+
+import asyncio
+import copy
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+MISSING = object()
+
+def copy_result(value: Any) -> Any:
+    """Copies a document or a list of documents, nested values included, so callers cannot change each other's.
+
+    Args:
+        value (Any): The result.
+
+    Returns:
+        Any: The copy, other values as they are.
+    """
+    return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+class DocumentCache:
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 60.0):
+        """An in-process cache of decrypted query results.
+
+        Entries are evicted least recently used first once `max_size` is
+        reached, and expire `ttl` seconds after they were stored.
+
+        Args:
+            max_size (int, optional): The maximum number of entries. Defaults to 1024.
+            ttl (float, optional): Seconds an entry stays valid, None to never expire. Defaults to 60.0.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, Any]]" = OrderedDict()
+        self._namespaces: Dict[Tuple[str, str], Set[Tuple[str, str, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(database: Optional[str], collection: Optional[str], query: Any) -> Tuple[str, str, str]:
+        """Builds the cache key of a query, equal queries with different key order share a key.
+
+        Values keep their type in the key, so `{"_id": ObjectId(x)}` and
+        `{"_id": str(x)}` are cached apart.
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+            query (Any): The query.
+
+        Returns:
+            Tuple[str, str, str]: The cache key.
+        """
+        return str(database), str(collection), wire.canonical(query)
+
+    def get(self, key: Tuple[str, str, str]) -> Any:
+        """Returns a cached result.
+
+        Args:
+            key (Tuple[str, str, str]): The cache key.
+
+        Returns:
+            Any: The result, or `MISSING` when it is not cached.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+
+        expires, value = entry
+        if expires < time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return MISSING
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return copy_result(value)
+
+    def set(self, key: Tuple[str, str, str], value: Any, generation: Optional[int] = None) -> None:
+        """Stores a result.
+
+        Args:
+            key (Tuple[str, str, str]): The cache key.
+            value (Any): The result.
+            generation (int, optional): The `generation` read before the result was fetched, the result is
+                dropped if anything was invalidated since. Defaults to None.
+        """
+        if self.max_size <= 0 or (generation is not None and generation != self.generation):
+            return
+
+        expires = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        self._entries[key] = (expires, copy_result(value))
+        self._entries.move_to_end(key)
+        self._namespaces.setdefault(key[:2], set()).add(key)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+        keys = self._namespaces.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._namespaces[key[:2]]
+
+    def invalidate(self, database: Optional[str] = None, collection: Optional[str] = None) -> None:
+        """Drops cached results.
+
+        Args:
+            database (str, optional): Only drop results of this database, None for every database. Defaults to None.
+            collection (str, optional): Only drop results of this collection, None for every collection. Defaults to None.
+        """
+        self.generation += 1
+        for namespace in list(self._namespaces):
+            if database is not None and namespace[0] != str(database):
+                continue
+
+            if collection is not None and namespace[1] != str(collection):
+                continue
+
+            for key in list(self._namespaces.get(namespace, ())):
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Drops every cached result."""
+        self.generation += 1
+        self._entries.clear()
+        self._namespaces.clear()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """The hit, miss and eviction counters.
+
+        Returns:
+            Dict[str, int]: The counters and the current size.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries)
+        }
+
+class SingleFlight:
+    def __init__(self):
+        """Collapses concurrent identical reads into one backend call.
+
+        The first caller of a key starts the call, callers that arrive while
+        it is running wait for its result, or its error, instead of starting
+        their own. The call runs as its own task, so a cancelled caller does
+        not cancel it for the others. When callers share a call, each gets
+        its own copy of the result.
+        """
+        self.calls = 0
+        self.collapsed = 0
+        self._flights: Dict[Tuple[str, str, str], "asyncio.Future[Any]"] = {}
+        self._shared: "weakref.WeakSet[asyncio.Future[Any]]" = weakref.WeakSet()
+
+    async def run(self, key: Tuple[str, str, str], call: Callable[[], Awaitable[Any]]) -> Any:
+        """Runs a call, or joins the identical call that is already running.
+
+        Args:
+            key (Tuple[str, str, str]): The database, the collection and the serialized request.
+            call (Callable[[], Awaitable[Any]]): Starts the call.
+
+        Returns:
+            Any: The result of the call.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            self.calls += 1
+            flight = self._flights[key] = asyncio.ensure_future(detached(call()))
+            flight.add_done_callback(lambda done: self._land(key, done))
+
+        else:
+            self.collapsed += 1
+            self._shared.add(flight)
+
+        result = await asyncio.shield(flight)
+        # Nobody can join a call that has landed, so whether it was shared is settled by now.
+        return copy_result(result) if flight in self._shared else result
+
+    def _land(self, key: Tuple[str, str, str], flight: "asyncio.Future[Any]") -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+        if not flight.cancelled():
+            flight.exception()
+
+    def forget(self, database: Optional[str] = None, collection: Optional[str] = None) -> None:
+        """Stops new callers from joining calls that started before a write.
+
+        Args:
+            database (str, optional): Only forget calls on this database, None for every database. Defaults to None.
+            collection (str, optional): Only forget calls on this collection, None for every collection. Defaults to None.
+        """
+        for key in list(self._flights):
+            if database is not None and key[0] != str(database):
+                continue
+
+            if collection is not None and key[1] != str(collection):
+                continue
+
+            del self._flights[key]
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """The number of backend calls and of calls that joined one instead.
+
+        Returns:
+            Dict[str, int]: The counters and the number of calls in flight.
+        """
+        return {
+            "calls": self.calls,
+            "collapsed": self.collapsed,
+            "in_flight": len(self._flights)
+        }
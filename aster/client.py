@@ -1,34 +1,397 @@
-from .objects import KeyFile, DirectLink
-from .wrapper import DirectLink
+from .blob import BATCH_CHUNKS, CHUNK_SIZE, CHUNKS_COLLECTION, FILES_COLLECTION, BlobCipher, BlobReader, chunk_count, chunks, indexed, new_salt
+from .codec import (
+    CollectionOptions,
+    DEFAULT_OPTIONS,
+    DocumentCodec,
+    ENVELOPE_VERSION,
+    ENVELOPE_VERSIONS,
+    KEYS_FIELD,
+    MASTER_KEY_FIELD,
+    VERSION_FIELD
+)
+from .encryption import KeyRing
+from .errors import NotFoundError, PrivateKeyError, ServerError, TimeoutError
+from .executor import CryptoExecutor
+from .instrumentation import DISABLED, Instrumentation
+from .objects import KeyFile, DirectLink, load_key
+from .resilience import RetryPolicy, expires, remaining
+from .schema import Schema
 
-from typing import Union, Optional
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterator, List, Mapping, Tuple, Union, Optional
 from motor.motor_asyncio import AsyncIOMotorClient # type: ignore
-from base64 import b64decode
+from pymongo import ASCENDING, DeleteMany, DeleteOne, InsertOne, UpdateMany, UpdateOne, timeout as mongo_timeout # type: ignore
+from pymongo.errors import PyMongoError # type: ignore
+from pymongo.results import UpdateResult # type: ignore
+from bson import ObjectId, json_util # type: ignore
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+import asyncio
+import json
 
-from Crypto.PublicKey import RSA # type: ignore
-from Crypto.Signature import PKCS1_v1_5 # type: ignore
+# How often an `$inc` is tried again when the field changed between the read and the write.
+INCREMENT_RETRY = RetryPolicy(attempts = 10, base_delay = 0.005, max_delay = 0.25)
 
 class AsterClient:
-    def __init__(self, mongo_uri: DirectLink, private_key: Optional[Union[str, KeyFile]] = None):
+    def __init__(
+        self,
+        mongo_uri: DirectLink,
+        private_key: Optional[Union[str, KeyFile]] = None,
+        per_document_keys: bool = False,
+        executor: str = "inline",
+        max_workers: Optional[int] = None,
+        offload_threshold: int = 256,
+        blind_indexes: Optional[Dict[str, List[str]]] = None,
+        compression: Optional[Dict[str, str]] = None,
+        compression_threshold: int = 1024,
+        mongo_client: Optional[Any] = None,
+        previous_keys: Optional[List[Union[str, KeyFile]]] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        timeout: Optional[float] = None,
+        schemas: Optional[Dict[str, Dict[str, Any]]] = None
+    ):
         """Initializes the Client.
 
         Args:
             mongo_uri (DirectLink): The MongoDB URI.
+            private_key (str, KeyFile, optional): Private key that is used to encrypt and decrypt data. Defaults to None.
+            per_document_keys (bool, optional): Wrap a fresh data key for every inserted document. Defaults to False.
+            executor (str, optional): Where crypto work runs, `inline`, `thread` or `process`. Defaults to "inline".
+            max_workers (int, optional): The size of the crypto worker pool. Defaults to None.
+            offload_threshold (int, optional): The number of fields from which a batch leaves the event loop. Defaults to 256.
+            blind_indexes (Dict[str, List[str]], optional): The fields that can be queried by equality,
+                keyed by `database.collection`. Defaults to None.
+            compression (Dict[str, str], optional): `zlib` or `zstd` compression of large values before they are
+                encrypted, keyed by `database.collection`. Defaults to None.
+            compression_threshold (int, optional): The size in bytes from which a value is compressed. Defaults to 1024.
+            mongo_client (Any, optional): An existing Motor client to use instead of connecting to `mongo_uri`. Defaults to None.
+            previous_keys (List[str, KeyFile], optional): Keys that were rotated out but may still be needed to read,
+                the newest first. Defaults to None.
+            instrumentation (Instrumentation, optional): Receives the encrypt, database and decrypt timings of every
+                operation. Defaults to None.
+            timeout (float, optional): Seconds every operation may take, None to only end operations by `deadline`.
+                Defaults to None.
+            schemas (Dict[str, Dict[str, Any]], optional): The field types of collections, see `Schema`, keyed by
+                `database.collection`. Defaults to None.
         """
         self.mongo_uri = mongo_uri
-        self.mongo_client = AsyncIOMotorClient(self.mongo_uri)
-        self.private_key = KeyFile().load_key(private_key)
+        self.mongo_client = mongo_client or AsyncIOMotorClient(mongo_uri.mongo_uri if isinstance(mongo_uri, DirectLink) else mongo_uri)
+        self.per_document_keys = per_document_keys
+        self.executor_mode = executor
+        self.max_workers = max_workers
+        self.offload_threshold = offload_threshold
+        self.instrumentation = instrumentation or DISABLED
+        self.timeout = timeout
+        self.collections: Dict[str, CollectionOptions] = {
+            namespace: CollectionOptions(
+                (blind_indexes or {}).get(namespace, ()),
+                (compression or {}).get(namespace),
+                compression_threshold,
+                (schemas or {}).get(namespace)
+            )
+            for namespace in set(blind_indexes or {}) | set(compression or {}) | set(schemas or {})
+        }
+        self.private_key = None
+        self.crypto: Optional[KeyRing] = None
+        self.codec: Optional[DocumentCodec] = None
+        self.executor: Optional[CryptoExecutor] = None
+        self._blob_indexes: set = set()
+        self.set_key(private_key, previous_keys)
 
-    async def fetch(self, database: Optional[str], collection: Optional[str], query: dict) -> dict:
+    def set_key(self, private_key: Optional[Union[str, KeyFile]], previous_keys: Optional[List[Union[str, KeyFile]]] = None) -> None:
+        """Sets the private key and parses it once for all following requests.
+
+        Args:
+            private_key (str, KeyFile, optional): The private key.
+            previous_keys (List[str, KeyFile], optional): Older keys that can still decrypt, the newest first. Defaults to None.
+        """
+        self.private_key = load_key(private_key)
+        self.crypto = KeyRing([self.private_key] + [load_key(key) for key in previous_keys or ()]) if self.private_key is not None else None
+        self.codec = DocumentCodec(self.crypto, self.per_document_keys) if self.crypto is not None else None
+        self._start_executor()
+
+    def rotate_key(self, private_key: Union[str, KeyFile]) -> None:
+        """Makes a new key the active key without interrupting requests.
+
+        New writes are encrypted with the new key right away, the current keys
+        stay in the key ring so everything written before can still be read.
+        Run `KeyRotation` afterwards to move existing documents to the new key.
+
+        Args:
+            private_key (str, KeyFile): The new private key.
+        """
+        if self.codec is None:
+            return self.set_key(private_key)
+
+        self.private_key = load_key(private_key)
+        self.crypto = self.crypto.rotate(self.private_key)
+        self.codec.set_keys(self.crypto)
+        if self.executor_mode == "process":
+            self._start_executor()
+
+    def _start_executor(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait = False)
+
+        self.executor = CryptoExecutor(
+            self.codec,
+            self.executor_mode,
+            self.max_workers,
+            self.offload_threshold
+        ) if self.codec is not None else None
+
+    async def close(self) -> None:
+        """Closes the MongoDB connection pool and the crypto workers."""
+        self.mongo_client.close()
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def _get_collection(self, database: Optional[str], collection: Optional[str]) -> Any:
+        if database is None:
+            raise ValueError("No database provided.")
+
+        elif collection is None:
+            raise ValueError("No collection provided.")
+
+        return self.mongo_client[database][collection]
+
+    def add_blind_index(self, database: str, collection: str, fields: List[str]) -> None:
+        """Enables blind indexes on fields of a collection.
+
+        Only documents written afterwards are indexed, existing documents
+        have to be rewritten to be found through the index.
+
+        Args:
+            database (str): The name of the database.
+            collection (str): The name of the collection.
+            fields (List[str]): The plaintext field names.
+        """
+        options = self.collection_options(database, collection)
+        self.collections[f"{database}.{collection}"] = CollectionOptions(
+            options.indexed | frozenset(fields),
+            options.compression,
+            options.compression_threshold,
+            options.schema
+        )
+
+    def set_compression(self, database: str, collection: str, compression: Optional[str], threshold: int = 1024) -> None:
+        """Sets how large values of a collection are compressed before they are encrypted.
+
+        Args:
+            database (str): The name of the database.
+            collection (str): The name of the collection.
+            compression (str, optional): `zlib`, `zstd` or None to stop compressing.
+            threshold (int, optional): The size in bytes from which a value is compressed. Defaults to 1024.
+        """
+        options = self.collection_options(database, collection)
+        self.collections[f"{database}.{collection}"] = CollectionOptions(
+            options.indexed,
+            compression,
+            threshold,
+            options.schema
+        )
+
+    def set_schema(self, database: str, collection: str, schema: Optional[Union[Schema, Dict[str, Any]]]) -> None:
+        """Sets the field types of a collection, see `Schema`.
+
+        The schema only changes how values are written, every stored value
+        records its own type, so documents written before are still read
+        as they were.
+
+        Args:
+            database (str): The name of the database.
+            collection (str): The name of the collection.
+            schema (Schema, Dict[str, Any], optional): The type of every field by name, None to type values at runtime.
+        """
+        options = self.collection_options(database, collection)
+        self.collections[f"{database}.{collection}"] = CollectionOptions(
+            options.indexed,
+            options.compression,
+            options.compression_threshold,
+            schema
+        )
+
+    def collection_options(self, database: Optional[str], collection: Optional[str]) -> CollectionOptions:
+        """Returns how documents of a collection are encoded.
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+
+        Returns:
+            CollectionOptions: The options of the collection.
+        """
+        return self.collections.get(f"{database}.{collection}", DEFAULT_OPTIONS)
+
+    @contextmanager
+    def _deadline(self, expires_at: Optional[float] = None) -> Iterator[None]:
+        # MongoDB gets the time that is left too, so it stops working on an operation nobody waits for anymore.
+        left = remaining(expires_at if expires_at is not None else expires(self.timeout))
+        if left is None:
+            yield
+            return
+
+        try:
+            with mongo_timeout(left):
+                yield
+
+        except PyMongoError as error:
+            if error.timeout:
+                raise TimeoutError("The database did not answer before the deadline.") from error
+
+            raise
+
+    def _query(self, database: Optional[str], collection: Optional[str], query: dict) -> dict:
+        options = self.collection_options(database, collection)
+        return self.codec.rewrite_query(query, options.indexed, options)
+
+    def _update_query(self, database: Optional[str], collection: Optional[str], query: dict) -> dict:
+        # Legacy documents encrypt every name with RSA and cannot take envelope fields.
+        query = self._query(database, collection, query)
+        query.setdefault(VERSION_FIELD, {"$in": list(ENVELOPE_VERSIONS)})
+        return query
+
+    def _update(self, database: Optional[str], collection: Optional[str], data: dict) -> dict:
+        return self.codec.encode_update(data, self.collection_options(database, collection))
+
+    async def _increment(
+        self,
+        database: Optional[str],
+        collection: Optional[str],
+        query: dict,
+        data: dict,
+        operation: Any,
+        expires_at: Optional[float]
+    ) -> Any:
+        # Ciphertext cannot be incremented by MongoDB, so the current values are
+        # read and the new ones are written only if nobody changed them meanwhile.
+        col = self._get_collection(database, collection)
+        increments = data["$inc"]
+        tokens = [self.codec.field_token(name) for name in increments]
+        for attempt in range(INCREMENT_RETRY.attempts):
+            if attempt:
+                # Writers that lost together back off by different amounts, so they do not collide again.
+                delay = INCREMENT_RETRY.backoff(attempt - 1)
+                left = remaining(expires_at)
+                if left is not None and left <= delay:
+                    raise TimeoutError("The increment kept conflicting with other writes until the deadline.")
+
+                await asyncio.sleep(delay)
+
+            with operation.phase("database"):
+                document = await col.find_one(query, self.codec.projection(list(increments)))
+
+            if document is None:
+                return UpdateResult({"n": 0, "nModified": 0}, True)
+
+            with operation.phase("decrypt"):
+                current = self.codec.decode(document)
+
+            sets = dict(data.get("$set", {}))
+            for name, amount in increments.items():
+                value = current.get(name, 0)
+                # Numbers written before typed values were stored as JSON strings and stay strings.
+                sets[name] = json.dumps(json.loads(value) + amount) if isinstance(value, str) else value + amount
+
+            update = {operator: fields for operator, fields in data.items() if operator != "$inc"}
+            update["$set"] = sets
+            condition = {"_id": document["_id"]}
+            for token in tokens:
+                condition[token] = document[token] if token in document else {"$exists": False}
+
+            with operation.phase("encrypt"):
+                encoded = self._update(database, collection, update)
+
+            with operation.phase("database"):
+                result = await col.update_one(condition, encoded)
+
+            if result.matched_count:
+                return result
+
+        raise ServerError(f"The increment conflicted with other writes {INCREMENT_RETRY.attempts} times in a row.")
+
+    async def create_blind_indexes(self, database: Optional[str], collection: Optional[str]) -> List[str]:
+        """Creates the MongoDB indexes that back the blind indexes of a collection.
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+
+        Returns:
+            List[str]: The names of the created indexes.
+        """
+        col = self._get_collection(database, collection)
+        return [
+            await col.create_index(self.codec.index_field(field))
+            for field in sorted(self.collection_options(database, collection).indexed)
+        ]
+
+    def _find_options(
+        self,
+        limit: int = 0,
+        skip: int = 0,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        projection: Optional[List[str]] = None
+    ) -> dict:
+        options: dict = {
+            "limit": limit,
+            "skip": skip
+        }
+        if sort:
+            options["sort"] = [(self.codec.field_name(field), direction) for field, direction in sort]
+
+        if projection is not None:
+            options["projection"] = self.codec.projection(projection)
+
+        return options
+
+    @staticmethod
+    def encode_page_token(last_id: Any) -> str:
+        """Encodes the continuation token that points after a document.
+
+        Args:
+            last_id (Any): The `_id` of the last document of a page.
+
+        Returns:
+            str: The opaque token.
+        """
+        return urlsafe_b64encode(json_util.dumps({"_id": last_id}).encode()).decode()
+
+    @staticmethod
+    def decode_page_token(token: str) -> Any:
+        """Decodes a continuation token.
+
+        Args:
+            token (str): The opaque token.
+
+        Returns:
+            Any: The `_id` the next page starts after.
+        """
+        try:
+            return json_util.loads(urlsafe_b64decode(token.encode()))["_id"]
+        except (ValueError, KeyError, TypeError):
+            raise ValueError("Invalid page token provided.")
+
+    async def fetch(
+        self,
+        database: Optional[str],
+        collection: Optional[str],
+        query: dict,
+        *,
+        projection: Optional[List[str]] = None,
+        lazy: bool = False
+    ) -> Mapping[str, Any]:
         """Fetches data from the database.
 
         Args:
             database (str, optional): The name of the database.
             collection (str, optional): The name of the collection.
             query (dict): The query.
+            projection (List[str], optional): The fields to return, None for all fields. Defaults to None.
+            lazy (bool, optional): Return a read-only LazyDocument that decrypts each field on first access. Defaults to False.
 
         Returns:
-            dict: The query result.
+            Mapping[str, Any]: The query result.
         """
         if database is None:
             raise ValueError("No database provided.")
@@ -40,22 +403,21 @@ class AsterClient:
             db = self.mongo_client[database]
             col = db[collection]
 
-            rsa_key = RSA.importKey(self.private_key)
-            cipher = PKCS1_v1_5.new(rsa_key)
-            document = await col.find_one(query)
-            decrypted_data: dict = {}
-            for key, value in document.items():
-                raw_cipher_key = b64decode(key)
-                raw_cipher_value = b64decode(value)
-                decrypted_key = cipher.decrypt(raw_cipher_key, None)
-                decrypted_value = cipher.decrypt(raw_cipher_value, None)
-                decrypted_data.update(
-                    {
-                        decrypted_key: decrypted_value
-                    }
-                )
-
-            return decrypted_data
+            with self.instrumentation.operation("fetch", database = database, collection = collection) as operation, self._deadline():
+                with operation.phase("database"):
+                    document = await col.find_one(
+                        self._query(database, collection, query),
+                        self.codec.projection(projection) if projection is not None else None
+                    )
+
+                if document is None:
+                    raise NotFoundError("The query returned no results.")
+
+                if lazy:
+                    return self.codec.decode_lazy(document)
+
+                with operation.phase("decrypt"):
+                    return await self.executor.decode(document)
 
     async def insert(self, database: Optional[str], collection: Optional[str], data: dict) -> dict:
         """Inserts data into the database.
@@ -78,27 +440,28 @@ class AsterClient:
             db = self.mongo_client[database]
             col = db[collection]
 
-            rsa_key = RSA.importKey(self.private_key)
-            cipher = PKCS1_v1_5.new(rsa_key)
-            encrypted_data: dict = {}
-            for key, value in data.items():
-                encrypted_key = cipher.encrypt(key.encode())
-                encrypted_value = cipher.encrypt(value.encode())
-                encrypted_data.update(
-                    {
-                        encrypted_key: encrypted_value
-                    }
-                )
-            return await col.insert_one(encrypted_data)
+            with self.instrumentation.operation("insert", database = database, collection = collection) as operation, self._deadline():
+                with operation.phase("encrypt"):
+                    document = await self.executor.encode(data, self.collection_options(database, collection))
+
+                with operation.phase("database"):
+                    return await col.insert_one(document)
 
     async def update(self, database: Optional[str], collection: Optional[str], query: dict, data: dict) -> dict:
         """Updates data in the database.
 
+        `data` is either the fields to set or an update with `$set`, `$unset`
+        and `$inc`. Only the fields it touches are encrypted, and the update
+        runs as a single `update_one`. `$inc` works on numeric values, it
+        reads the current value first and retries with jittered backoff if
+        the field changed in the meantime, raising ServerError when it keeps
+        conflicting and TimeoutError when the deadline comes first.
+
         Args:
             database (str, optional): The name of the database.
             collection (str, optional): The name of the collection.
             query (dict): The query.
-            data (dict): The data.
+            data (dict): The fields to set or the update.
 
         Returns:
             dict: The query result.
@@ -112,7 +475,17 @@ class AsterClient:
         else:
             db = self.mongo_client[database]
             col = db[collection]
-            return await col.update_one(query, data)
+            if "$inc" in data:
+                expires_at = expires(self.timeout)
+                with self.instrumentation.operation("update", database = database, collection = collection) as operation, self._deadline(expires_at):
+                    return await self._increment(database, collection, self._update_query(database, collection, query), data, operation, expires_at)
+
+            with self.instrumentation.operation("update", database = database, collection = collection) as operation, self._deadline():
+                with operation.phase("encrypt"):
+                    update = self._update(database, collection, data)
+
+                with operation.phase("database"):
+                    return await col.update_one(self._update_query(database, collection, query), update)
 
     async def delete(self, database: Optional[str], collection: Optional[str], query: dict) -> dict:
         """Deletes data from the database.
@@ -134,4 +507,427 @@ class AsterClient:
         else:
             db = self.mongo_client[database]
             col = db[collection]
-            return await col.delete_one(query)
\ No newline at end of file
+            with self.instrumentation.operation("delete", database = database, collection = collection) as operation, self._deadline():
+                with operation.phase("database"):
+                    return await col.delete_one(self._query(database, collection, query))
+
+    async def fetch_many(
+        self,
+        database: Optional[str],
+        collection: Optional[str],
+        query: dict,
+        limit: int = 0,
+        skip: int = 0,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        projection: Optional[List[str]] = None
+    ) -> List[dict]:
+        """Fetches every document that matches the query.
+
+        Limit, skip, sort and projection are all applied by MongoDB, so only
+        the requested documents and fields are transferred and decrypted.
+        Encrypted fields sort by ciphertext, sort on `_id` for a stable order.
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+            query (dict): The query.
+            limit (int, optional): The maximum number of documents, 0 for no limit. Defaults to 0.
+            skip (int, optional): The number of documents to skip. Defaults to 0.
+            sort (List[Tuple[str, int]], optional): Field and direction pairs. Defaults to None.
+            projection (List[str], optional): The fields to return, None for all fields. Defaults to None.
+
+        Returns:
+            List[dict]: The decrypted documents.
+        """
+        col = self._get_collection(database, collection)
+        with self.instrumentation.operation("fetch_many", database = database, collection = collection) as operation, self._deadline():
+            with operation.phase("database"):
+                documents = await col.find(self._query(database, collection, query), **self._find_options(limit, skip, sort, projection)).to_list(None)
+
+            operation.set(documents = len(documents))
+            with operation.phase("decrypt"):
+                return await self.executor.decode_many(documents)
+
+    async def fetch_page(
+        self,
+        database: Optional[str],
+        collection: Optional[str],
+        query: dict,
+        page_size: int = 50,
+        token: Optional[str] = None,
+        projection: Optional[List[str]] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Fetches one page of documents in `_id` order.
+
+        Pages are addressed with a continuation token instead of `skip`, so
+        every page costs an indexed range scan no matter how deep it is.
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+            query (dict): The query.
+            page_size (int, optional): The number of documents per page. Defaults to 50.
+            token (str, optional): The token returned with the previous page, None for the first page. Defaults to None.
+            projection (List[str], optional): The fields to return, None for all fields. Defaults to None.
+
+        Returns:
+            Tuple[List[dict], Optional[str]]: The decrypted documents and the token of the next page, None on the last page.
+        """
+        col = self._get_collection(database, collection)
+        query = self._query(database, collection, query)
+        if token is not None:
+            query = {"$and": [query, {"_id": {"$gt": self.decode_page_token(token)}}]}
+
+        options = self._find_options(page_size, 0, [("_id", ASCENDING)], projection)
+        with self.instrumentation.operation("fetch_page", database = database, collection = collection) as operation, self._deadline():
+            with operation.phase("database"):
+                documents = await col.find(query, **options).to_list(None)
+
+            next_token = self.encode_page_token(documents[-1]["_id"]) if len(documents) == page_size else None
+            operation.set(documents = len(documents))
+            with operation.phase("decrypt"):
+                return await self.executor.decode_many(documents), next_token
+
+    async def find(self, database: Optional[str], collection: Optional[str], query: dict, batch_size: int = 100) -> AsyncIterator[dict]:
+        """Streams every document that matches the query.
+
+        Documents are pulled from a Motor cursor `batch_size` at a time and
+        each batch is decrypted as it arrives, so memory stays bounded by the
+        batch size instead of the size of the result.
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+            query (dict): The query.
+            batch_size (int, optional): The number of documents per batch. Defaults to 100.
+
+        Yields:
+            dict: The decrypted documents.
+        """
+        col = self._get_collection(database, collection)
+        cursor = col.find(self._query(database, collection, query), batch_size = batch_size)
+        try:
+            while True:
+                batch = await cursor.to_list(batch_size)
+                if not batch:
+                    break
+
+                for document in await self.executor.decode_many(batch):
+                    yield document
+
+        finally:
+            await cursor.close()
+
+    async def insert_many(self, database: Optional[str], collection: Optional[str], data: List[dict], ordered: bool = True) -> Any:
+        """Inserts a batch of documents with a single bulk operation.
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+            data (List[dict]): The documents.
+            ordered (bool, optional): Stop at the first failed insert. Defaults to True.
+
+        Returns:
+            InsertManyResult: The query result.
+        """
+        col = self._get_collection(database, collection)
+        with self.instrumentation.operation("insert_many", database = database, collection = collection, documents = len(data)) as operation, self._deadline():
+            with operation.phase("encrypt"):
+                documents = await self.executor.encode_many(data, self.collection_options(database, collection))
+
+            with operation.phase("database"):
+                return await col.insert_many(documents, ordered = ordered)
+
+    async def update_many(self, database: Optional[str], collection: Optional[str], query: dict, data: dict) -> Any:
+        """Updates every document that matches the query.
+
+        Takes the same updates as `update` except `$inc`, which needs the
+        current value of every document.
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+            query (dict): The query.
+            data (dict): The fields to set or the update.
+
+        Returns:
+            UpdateResult: The query result.
+        """
+        col = self._get_collection(database, collection)
+        with self.instrumentation.operation("update_many", database = database, collection = collection) as operation, self._deadline():
+            with operation.phase("encrypt"):
+                update = self._update(database, collection, data)
+
+            with operation.phase("database"):
+                return await col.update_many(self._update_query(database, collection, query), update)
+
+    async def delete_many(self, database: Optional[str], collection: Optional[str], query: dict) -> Any:
+        """Deletes every document that matches the query.
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+            query (dict): The query.
+
+        Returns:
+            DeleteResult: The query result.
+        """
+        col = self._get_collection(database, collection)
+        with self.instrumentation.operation("delete_many", database = database, collection = collection) as operation, self._deadline():
+            with operation.phase("database"):
+                return await col.delete_many(self._query(database, collection, query))
+
+    async def bulk_write(self, database: Optional[str], collection: Optional[str], operations: List[dict], ordered: bool = True) -> Any:
+        """Runs a mixed batch of writes with a single bulk operation.
+
+        Every operation is a dict with an `op` of `insert_one`, `update_one`,
+        `update_many`, `delete_one` or `delete_many` and the `data` and/or
+        `query` that operation takes. Inserted documents are encrypted
+        together in one pass.
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+            operations (List[dict]): The operations.
+            ordered (bool, optional): Stop at the first failed operation. Defaults to True.
+
+        Returns:
+            BulkWriteResult: The query result.
+        """
+        col = self._get_collection(database, collection)
+        with self.instrumentation.operation("bulk_write", database = database, collection = collection, documents = len(operations)) as instrumented, self._deadline():
+            with instrumented.phase("encrypt"):
+                inserts = iter(await self.executor.encode_many([
+                    operation["data"] for operation in operations if operation["op"] == "insert_one"
+                ], self.collection_options(database, collection)))
+
+                requests: list = []
+                for operation in operations:
+                    op = operation["op"]
+                    if op == "insert_one":
+                        requests.append(InsertOne(next(inserts)))
+
+                    elif op == "update_one":
+                        requests.append(UpdateOne(self._update_query(database, collection, operation["query"]), self._update(database, collection, operation["data"])))
+
+                    elif op == "update_many":
+                        requests.append(UpdateMany(self._update_query(database, collection, operation["query"]), self._update(database, collection, operation["data"])))
+
+                    elif op == "delete_one":
+                        requests.append(DeleteOne(self._query(database, collection, operation["query"])))
+
+                    elif op == "delete_many":
+                        requests.append(DeleteMany(self._query(database, collection, operation["query"])))
+
+                    else:
+                        raise ValueError(f"Unknown bulk operation: {op}")
+
+            with instrumented.phase("database"):
+                return await col.bulk_write(requests, ordered = ordered)
+
+    async def _blob_collections(self, database: Optional[str], collection: Optional[str]) -> Tuple[Any, Any]:
+        self._get_collection(database, collection)
+        db = self.mongo_client[database]
+        files, chunks_col = db[f"{collection}.{FILES_COLLECTION}"], db[f"{collection}.{CHUNKS_COLLECTION}"]
+        namespace = f"{database}.{collection}"
+        if namespace not in self._blob_indexes:
+            await chunks_col.create_index([("files_id", ASCENDING), ("n", ASCENDING)], unique = True)
+            self._blob_indexes.add(namespace)
+
+        return files, chunks_col
+
+    async def put_blob(
+        self,
+        database: Optional[str],
+        collection: Optional[str],
+        data: Any,
+        blob_id: Optional[str] = None,
+        chunk_size: int = CHUNK_SIZE
+    ) -> str:
+        """Stores a value too large for a document in encrypted chunks, GridFS-style.
+
+        The data is split into `chunk_size` chunks that are sealed one at a
+        time, see `BlobCipher`, and written `BATCH_CHUNKS` at a time to
+        `<collection>.chunks`. Its size and key go to `<collection>.files`.
+        Only a few chunks are held at once, no matter the size of the blob.
+        The blob can be opened once every chunk is written, an upload that
+        fails removes what it wrote.
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+            data (Any): Bytes, a file object with `read`, or a sync or async iterable of bytes.
+            blob_id (str, optional): The ID of the blob, a new ObjectId string when None. Defaults to None.
+            chunk_size (int, optional): The size of the chunks in bytes. Defaults to CHUNK_SIZE.
+
+        Returns:
+            str: The ID of the blob.
+        """
+        blob_id = blob_id or str(ObjectId())
+        with self.instrumentation.operation("put_blob", database = database, collection = collection) as operation:
+            expires_at = expires(self.timeout)
+            with self._deadline(expires_at):
+                files, chunks_col = await self._blob_collections(database, collection)
+                data_key = self.codec.data_key
+                salt = new_salt()
+                with operation.phase("database"):
+                    await files.insert_one({
+                        "_id": blob_id,
+                        VERSION_FIELD: ENVELOPE_VERSION,
+                        KEYS_FIELD: {
+                            data_key.id.hex(): data_key.wrapped
+                        },
+                        MASTER_KEY_FIELD: data_key.master,
+                        "salt": salt,
+                        "chunkSize": chunk_size,
+                        "length": None
+                    })
+
+            try:
+                with self._deadline(expires_at):
+                    cipher = BlobCipher(data_key, salt, blob_id)
+                    length = 0
+                    batch: List[dict] = []
+                    async for index, chunk, last in indexed(chunks(data, chunk_size)):
+                        with operation.phase("encrypt"):
+                            batch.append({"files_id": blob_id, "n": index, "data": cipher.encrypt(index, chunk, last)})
+
+                        length += len(chunk)
+                        if len(batch) == BATCH_CHUNKS or last:
+                            with operation.phase("database"):
+                                await chunks_col.insert_many(batch)
+
+                            batch = []
+
+                    with operation.phase("database"):
+                        await files.update_one({"_id": blob_id}, {"$set": {"length": length, "uploadDate": datetime.now(timezone.utc)}})
+
+            except BaseException:
+                await chunks_col.delete_many({"files_id": blob_id})
+                await files.delete_one({"_id": blob_id})
+                raise
+
+            operation.size("request_bytes", length)
+            return blob_id
+
+    async def open_blob(self, database: Optional[str], collection: Optional[str], blob_id: str) -> BlobReader:
+        """Opens a blob stored with `put_blob` for reading.
+
+        Chunks are fetched `BATCH_CHUNKS` at a time and decrypted as the
+        reader gets to them, so the blob never has to fit in memory.
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+            blob_id (str): The ID of the blob.
+
+        Returns:
+            BlobReader: The reader.
+
+        Raises:
+            NotFoundError: There is no blob with that ID, or it is still being written.
+        """
+        with self.instrumentation.operation("open_blob", database = database, collection = collection) as operation, self._deadline():
+            files, chunks_col = await self._blob_collections(database, collection)
+            with operation.phase("database"):
+                info = await files.find_one({"_id": blob_id})
+
+            if info is None or info.get("length") is None:
+                raise NotFoundError("The blob does not exist.")
+
+            with operation.phase("decrypt"):
+                key_id, wrapped = next(iter(info[KEYS_FIELD].items()))
+                cipher = BlobCipher(self.codec.unwrap(bytes.fromhex(key_id), wrapped), info["salt"], blob_id)
+
+        count = chunk_count(info["length"], info["chunkSize"])
+        return BlobReader(blob_id, info["length"], self._read_chunks(chunks_col, cipher, blob_id, count))
+
+    async def _read_chunks(self, col: Any, cipher: BlobCipher, blob_id: str, count: int) -> AsyncIterator[memoryview]:
+        cursor = col.find({"files_id": blob_id}, sort = [("n", ASCENDING)], batch_size = BATCH_CHUNKS)
+        index = 0
+        try:
+            while True:
+                batch = await cursor.to_list(BATCH_CHUNKS)
+                if not batch:
+                    break
+
+                for chunk in batch:
+                    if chunk["n"] != index or index >= count:
+                        raise PrivateKeyError("The chunks of the blob were modified.")
+
+                    yield memoryview(cipher.decrypt(index, chunk["data"], index == count - 1))
+                    index += 1
+
+        finally:
+            await cursor.close()
+
+        if index != count:
+            raise PrivateKeyError("Chunks of the blob are missing.")
+
+    async def delete_blob(self, database: Optional[str], collection: Optional[str], blob_id: str) -> Any:
+        """Deletes a blob and its chunks.
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+            blob_id (str): The ID of the blob.
+
+        Returns:
+            DeleteResult: The result of deleting the blob, `deleted_count` is 0 when it did not exist.
+        """
+        with self.instrumentation.operation("delete_blob", database = database, collection = collection) as operation, self._deadline():
+            files, chunks_col = await self._blob_collections(database, collection)
+            with operation.phase("database"):
+                # The blob is gone for readers as soon as its file document is, the chunks follow.
+                result = await files.delete_one({"_id": blob_id})
+                await chunks_col.delete_many({"files_id": blob_id})
+                return result
+
+    async def create_collection(self, database: str, collection: str) -> Any:
+        """Creates a collection.
+
+        Args:
+            database (str): The name of the database.
+            collection (str): The name of the collection.
+
+        Returns:
+            AsyncIOMotorCollection: The created collection.
+        """
+        return await self.mongo_client[database].create_collection(collection)
+
+    async def delete_collection(self, database: str, collection: str) -> Any:
+        """Deletes a collection.
+
+        Args:
+            database (str): The name of the database.
+            collection (str): The name of the collection.
+
+        Returns:
+            dict: The command result.
+        """
+        return await self.mongo_client[database].drop_collection(collection)
+
+    async def create_database(self, database: str) -> Any:
+        """Creates a database.
+
+        MongoDB creates databases with their first collection, so this only
+        returns a handle to the database.
+
+        Args:
+            database (str): The name of the database.
+
+        Returns:
+            AsyncIOMotorDatabase: The database.
+        """
+        return self.mongo_client[database]
+
+    async def delete_database(self, database: str) -> Any:
+        """Deletes a database.
+
+        Args:
+            database (str): The name of the database.
+
+        Returns:
+            dict: The command result.
+        """
+        return await self.mongo_client.drop_database(database)
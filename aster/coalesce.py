@@ -0,0 +1,157 @@
+from .errors import BadRequestError, DuplicateError, ServerError
+from .instrumentation import detached
+
+from pymongo.errors import BulkWriteError # type: ignore
+from pymongo.results import InsertOneResult, UpdateResult # type: ignore
+
+import asyncio
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+DUPLICATE_KEY = 11000
+
+# Raised while a batch is encoded, before any of it reaches the database. The server answers them with a 400.
+UNSENT_ERRORS = (ValueError, KeyError, BadRequestError)
+
+class WriteBuffer:
+    def __init__(self, client: Any, max_delay: float = 0.005, max_size: int = 100, assign_ids: bool = True):
+        """Coalesces concurrent single-document writes into bulk writes.
+
+        Writes are collected per collection and flushed as one unordered
+        `bulk_write` once `max_size` operations are waiting or the first of
+        them has waited `max_delay` seconds. Every caller still gets its own
+        result or error: failed operations are matched to their callers by
+        their index in the batch. A batch that was rejected before it was sent
+        is split up so one bad write cannot fail its neighbours. Any other
+        failure may have applied part of the batch, so every write in it
+        fails with that error instead of being written again.
+
+        Results have the shape the client gives for a single write, Motor's
+        InsertOneResult and UpdateResult for an AsterClient and their
+        `serialize`d dicts for an HTTPClient. Bulk writes only count matched
+        and modified documents per batch, so an update reports 1 when every
+        update of its batch matched, 0 when none did, and None otherwise.
+
+        Args:
+            client (Any): The HTTPClient or AsterClient the batches are written with.
+            max_delay (float, optional): Seconds a write waits for others to join its batch. Defaults to 0.005.
+            max_size (int, optional): The number of writes that flushes a batch right away. Defaults to 100.
+            assign_ids (bool, optional): Give inserted documents an ObjectId up front so their `inserted_id`
+                can be reported, every wire format carries ObjectIds. Defaults to True.
+        """
+        self.client = client
+        self.max_delay = max_delay
+        self.max_size = max_size
+        self.assign_ids = assign_ids
+        self._pending: Dict[Tuple[str, str], List[Tuple[dict, asyncio.Future]]] = {}
+        self._timers: Dict[Tuple[str, str], asyncio.TimerHandle] = {}
+        self._flushing: Set[asyncio.Future] = set()
+
+    async def submit(self, database: str, collection: str, operation: dict) -> Any:
+        """Queues a bulk operation, as taken by `bulk_write`, and waits for its batch.
+
+        Args:
+            database (str): The name of the database.
+            collection (str): The name of the collection.
+            operation (dict): The operation.
+
+        Returns:
+            Any: The result of the operation, as the client returns it for a single write.
+        """
+        if operation["op"] == "insert_one" and self.assign_ids and "_id" not in operation["data"]:
+            from bson import ObjectId # type: ignore
+            operation = dict(operation, data = dict(operation["data"], _id = ObjectId()))
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (database, collection)
+        pending = self._pending.setdefault(key, [])
+        pending.append((operation, future))
+        if len(pending) >= self.max_size:
+            self._flush(key)
+
+        elif len(pending) == 1:
+            self._timers[key] = loop.call_later(self.max_delay, self._flush, key)
+
+        return await future
+
+    def _flush(self, key: Tuple[str, str]) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._pending.pop(key, None)
+        if batch:
+            task = asyncio.ensure_future(detached(self._write(key, batch)))
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+
+    async def _write(self, key: Tuple[str, str], batch: List[Tuple[dict, asyncio.Future]]) -> None:
+        database, collection = key
+        try:
+            result = await self.client.bulk_write(database, collection, [operation for operation, _ in batch], False)
+            details = getattr(result, "bulk_api_result", result)
+            motor = details is not result
+        except Exception as error:
+            details = getattr(error, "details", None)
+            motor = isinstance(error, BulkWriteError)
+            if not isinstance(details, dict):
+                if len(batch) > 1 and isinstance(error, UNSENT_ERRORS):
+                    await asyncio.gather(*(self._write(key, [item]) for item in batch))
+                    return
+
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+                return
+
+        details = details or {}
+        errors = {error["index"]: error for error in details.get("writeErrors", [])}
+        updates = sum(1 for index, (operation, _) in enumerate(batch) if operation["op"] != "insert_one" and index not in errors)
+        counts = {name: self._count(details.get(name, 0), updates) for name in ("nMatched", "nModified")}
+        for index, (operation, future) in enumerate(batch):
+            if future.done():
+                continue
+
+            error = errors.get(index)
+            if error is None:
+                future.set_result(self._result(operation, counts, motor))
+
+            elif error.get("code") == DUPLICATE_KEY:
+                future.set_exception(DuplicateError(error.get("errmsg", "The data is already in the collection.")))
+
+            else:
+                future.set_exception(ServerError(error.get("errmsg", "The write failed.")))
+
+    @staticmethod
+    def _count(total: int, updates: int) -> Optional[int]:
+        # The count of one update of the batch, when the total of the batch settles it.
+        if total == 0:
+            return 0
+
+        return 1 if total == updates else None
+
+    @staticmethod
+    def _result(operation: dict, counts: Dict[str, Optional[int]], motor: bool) -> Any:
+        if operation["op"] == "insert_one":
+            inserted_id = operation["data"].get("_id")
+            return InsertOneResult(inserted_id, True) if motor else {"inserted_id": inserted_id}
+
+        if motor:
+            return UpdateResult({"n": counts["nMatched"], "nModified": counts["nModified"], "ok": 1.0}, True)
+
+        return {"matched_count": counts["nMatched"], "modified_count": counts["nModified"]}
+
+    async def flush(self, database: Optional[str] = None, collection: Optional[str] = None) -> None:
+        """Writes every waiting batch now and waits until all batches are written.
+
+        Args:
+            database (str, optional): Only flush this database, None for all. Defaults to None.
+            collection (str, optional): Only flush this collection, None for all. Defaults to None.
+        """
+        for key in list(self._pending):
+            if database in (None, key[0]) and collection in (None, key[1]):
+                self._flush(key)
+
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions = True)
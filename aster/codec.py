@@ -0,0 +1,721 @@
+from .encryption import KeyRing, RSAContext
+from .errors import PrivateKeyError
+from .schema import STR, Schema, as_schema, pack, unpack
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+import hashlib
+import hmac
+import os
+import struct
+import threading
+import zlib
+from base64 import b64decode
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Collection, Dict, Iterator, List, Optional, Tuple, Union
+
+try:
+    import zstandard # type: ignore
+except ImportError:
+    zstandard = None
+
+VERSION_FIELD = "_aster"
+KEYS_FIELD = "_keys"
+BLIND_INDEX_FIELD = "_bi"
+MASTER_KEY_FIELD = "_kek"
+
+LEGACY_VERSION = 1
+ENVELOPE_VERSION = 3
+ENVELOPE_VERSIONS = (2, 3)
+
+RESERVED_FIELDS = ("_id", VERSION_FIELD, KEYS_FIELD, BLIND_INDEX_FIELD, MASTER_KEY_FIELD)
+
+KEY_ID_SIZE = 8
+
+# AES-GCM with random 96-bit nonces stays within NIST SP 800-38D for 2^32
+# encryptions per key. A shared data key is replaced after 2^24 fields, which
+# keeps the chance of a nonce collision below 2^-48.
+MAX_DATA_KEY_USES = 2 ** 24
+NONCE_SIZE = 12
+
+UNCOMPRESSED = 0
+ZLIB = 1
+ZSTD = 2
+
+COMPRESSION = {
+    "zlib": ZLIB,
+    "zstd": ZSTD
+}
+
+def compress(method: int, data: bytes) -> bytes:
+    if method == ZLIB:
+        return zlib.compress(data, 6)
+
+    return zstandard.ZstdCompressor().compress(data)
+
+def decompress(method: int, data: bytes) -> bytes:
+    if method == ZLIB:
+        return zlib.decompress(data)
+
+    elif method == ZSTD:
+        if zstandard is None:
+            raise ValueError("The field is compressed with zstd, install `zstandard` to read it.")
+
+        return zstandard.ZstdDecompressor().decompress(data)
+
+    raise ValueError(f"Unknown compression method: {method}")
+
+class CollectionOptions:
+    def __init__(
+        self,
+        indexed: Collection[str] = (),
+        compression: Optional[str] = None,
+        compression_threshold: int = 1024,
+        schema: Optional[Union[Schema, Dict[str, Any]]] = None
+    ):
+        """How the documents of one collection are encoded.
+
+        Args:
+            indexed (Collection[str], optional): The fields that get a blind index. Defaults to ().
+            compression (str, optional): `zlib` or `zstd` to compress large values before they are encrypted. Defaults to None.
+            compression_threshold (int, optional): The size in bytes from which a value is compressed. Defaults to 1024.
+            schema (Schema, Dict[str, Any], optional): The types of the fields, see `Schema`. Defaults to None.
+        """
+        if compression is not None and compression not in COMPRESSION:
+            raise ValueError(f"Invalid compression provided, expected one of {', '.join(COMPRESSION)}.")
+
+        elif compression == "zstd" and zstandard is None:
+            raise ValueError("zstd compression needs the `zstandard` package.")
+
+        self.indexed = frozenset(indexed)
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+        self.method = COMPRESSION.get(compression, UNCOMPRESSED)
+        self.schema = as_schema(schema)
+
+    def pack(self, name: str, value: Any) -> Tuple[int, bytes]:
+        """Encodes the value of a field, with the schema when the collection has one.
+
+        Args:
+            name (str): The field name.
+            value (Any): The value.
+
+        Returns:
+            Tuple[int, bytes]: The type tag and the encoded value.
+        """
+        if self.schema is not None:
+            return self.schema.pack(name, value)
+
+        return pack(value)
+
+DEFAULT_OPTIONS = CollectionOptions()
+
+class DataKey:
+    def __init__(self, key: bytes, wrapped: str, key_id: Optional[bytes] = None):
+        """A symmetric data key and its RSA-wrapped form.
+
+        Args:
+            key (bytes): The raw AES-256 key.
+            wrapped (str): The key wrapped by a KeyRing, as it is stored in documents.
+            key_id (bytes, optional): The ID fields refer to the key by, derived from the first wrapped form when None. Defaults to None.
+        """
+        self.key = key
+        self.wrapped = wrapped
+        self.master = KeyRing.key_id(wrapped)
+        self.id = key_id or hashlib.sha256(b64decode(wrapped.split(":", 1)[-1])).digest()[:KEY_ID_SIZE]
+        self.aead = AESGCM(key)
+        self.uses = 0
+
+class DocumentCodec:
+    def __init__(
+        self,
+        crypto: Union[RSAContext, KeyRing],
+        per_document: bool = False,
+        cache_size: int = 1024,
+        max_key_uses: int = MAX_DATA_KEY_USES
+    ):
+        """Encrypts documents with envelope encryption.
+
+        A random AES-256 data key is wrapped once with RSA and stored in the
+        document, every field is then sealed with AES-GCM under that key. By
+        default one data key is reused for the documents written by this
+        codec, so inserts cost almost no RSA operations and reads unwrap each
+        data key once. A data key is replaced once it sealed `max_key_uses`
+        fields, as GCM with random nonces is only safe for a bounded number
+        of encryptions per key. The count is checked before every document,
+        or batch of `encode_many`, so a key can go over by one batch. Field
+        names are replaced by keyed tokens so they stay hidden but can still
+        be addressed in queries and projections.
+
+        Documents written by older versions, where every key and value is
+        encrypted with RSA on its own, are still decrypted.
+
+        Args:
+            crypto (RSAContext, KeyRing): The parsed private key, or a key ring while keys are rotated.
+            per_document (bool, optional): Use a fresh data key for every document. Defaults to False.
+            cache_size (int, optional): Number of unwrapped data keys that are kept. Defaults to 1024.
+            max_key_uses (int, optional): Fields a shared data key seals before it is replaced. Defaults to MAX_DATA_KEY_USES.
+        """
+        self.crypto = crypto if isinstance(crypto, KeyRing) else KeyRing([crypto])
+        self.per_document = per_document
+        self.cache_size = cache_size
+        self.max_key_uses = max_key_uses
+        self.name_key = self.crypto.derive_key(b"field-names")
+        self.index_key = self.crypto.derive_key(b"blind-index")
+        self._data_key: Optional[DataKey] = None
+        self._unwrapped: "OrderedDict[bytes, DataKey]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def data_key(self) -> DataKey:
+        """The data key used for new writes.
+
+        Returns:
+            DataKey: The data key.
+        """
+        data_key = self._data_key
+        if data_key is None or self.per_document or data_key.master != self.crypto.active_id or data_key.uses >= self.max_key_uses:
+            data_key = self._data_key = self.new_data_key()
+
+        return data_key
+
+    def set_keys(self, crypto: KeyRing) -> None:
+        """Switches to a new key ring, e.g. after a rotation.
+
+        Unwrapped data keys stay cached, new writes get a data key wrapped with
+        the active key of the new ring.
+
+        Args:
+            crypto (KeyRing): The key ring.
+        """
+        if crypto.root.key_id != self.crypto.root.key_id:
+            raise PrivateKeyError("The key ring does not contain the key the data was first encrypted with.")
+
+        self.crypto = crypto
+
+    def new_data_key(self) -> DataKey:
+        """Generates and wraps a new data key.
+
+        Returns:
+            DataKey: The data key.
+        """
+        key = AESGCM.generate_key(bit_length = 256)
+        data_key = DataKey(key, self.crypto.wrap(key))
+        self._remember(data_key)
+        return data_key
+
+    def _remember(self, data_key: DataKey) -> None:
+        with self._lock:
+            self._unwrapped[data_key.id] = data_key
+            self._unwrapped.move_to_end(data_key.id)
+            while len(self._unwrapped) > self.cache_size:
+                self._unwrapped.popitem(last = False)
+
+    def unwrap(self, key_id: bytes, wrapped: str) -> DataKey:
+        """Returns the data key for a key ID, unwrapping it with RSA on a cache miss.
+
+        Args:
+            key_id (bytes): The key ID stored with the ciphertext.
+            wrapped (str): The wrapped data key.
+
+        Returns:
+            DataKey: The data key.
+        """
+        with self._lock:
+            data_key = self._unwrapped.get(key_id)
+            if data_key is not None:
+                self._unwrapped.move_to_end(key_id)
+                return data_key
+
+        data_key = DataKey(self.crypto.unwrap(wrapped), wrapped, key_id)
+        self._remember(data_key)
+        return data_key
+
+    def rewrap(self, document: dict) -> Optional[dict]:
+        """Builds the `$set` that moves the data keys of a document to the active key.
+
+        Only the wrapped keys change, the fields are not touched, and every
+        data key is rewrapped with RSA once no matter how many documents share it.
+
+        Args:
+            document (dict): The document as it is stored, at least its `_keys`.
+
+        Returns:
+            dict, optional: The update, None when every data key already uses the active key.
+        """
+        update: dict = {}
+        for key_id, wrapped in document.get(KEYS_FIELD, {}).items():
+            if KeyRing.key_id(wrapped) == self.crypto.active_id:
+                continue
+
+            data_key = self.unwrap(bytes.fromhex(key_id), wrapped)
+            if data_key.master != self.crypto.active_id:
+                data_key = DataKey(data_key.key, self.crypto.wrap(data_key.key), data_key.id)
+                self._remember(data_key)
+
+            update[f"{KEYS_FIELD}.{key_id}"] = data_key.wrapped
+
+        if not update and document.get(MASTER_KEY_FIELD) == self.crypto.active_id:
+            return None
+
+        update[MASTER_KEY_FIELD] = self.crypto.active_id
+        return update
+
+    def field_token(self, name: str) -> str:
+        """Returns the stored name of a field.
+
+        Args:
+            name (str): The plaintext field name.
+
+        Returns:
+            str: The token the field is stored under.
+        """
+        return "f" + hmac.new(self.name_key, name.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def field_name(self, name: str) -> str:
+        """Returns the name a field is stored under, `_id` is kept as is.
+
+        Args:
+            name (str): The plaintext field name.
+
+        Returns:
+            str: The stored field name.
+        """
+        return name if name == "_id" else self.field_token(name)
+
+    def projection(self, fields: List[str]) -> dict:
+        """Builds a MongoDB projection that only returns the given fields.
+
+        Args:
+            fields (List[str]): The plaintext field names.
+
+        Returns:
+            dict: The projection, including the metadata needed to decrypt.
+        """
+        projection = {self.field_name(name): 1 for name in fields}
+        projection.update({VERSION_FIELD: 1, KEYS_FIELD: 1})
+        return projection
+
+    def blind_index(self, name: str, value: Any, options: CollectionOptions = DEFAULT_OPTIONS) -> str:
+        """Computes the blind index of a value, a keyed HMAC that only matches equal values of the same field.
+
+        Values that are not strings are indexed with their type, so `5` and `"5"` do not match.
+
+        Args:
+            name (str): The plaintext field name.
+            value (Any): The plaintext value.
+            options (CollectionOptions, optional): The options of the collection. Defaults to DEFAULT_OPTIONS.
+
+        Returns:
+            str: The blind index.
+        """
+        if type(value) is str:
+            raw_value = value.encode()
+
+        else:
+            # 0xFF never occurs in UTF-8, so these cannot collide with the index of a string.
+            kind, raw_value = options.pack(name, value)
+            raw_value = bytes((0xFF, kind)) + raw_value
+
+        message = self.field_token(name).encode() + b"\x00" + raw_value
+        return hmac.new(self.index_key, message, hashlib.sha256).hexdigest()[:32]
+
+    def index_field(self, name: str) -> str:
+        """Returns the stored name of the blind index of a field.
+
+        Args:
+            name (str): The plaintext field name.
+
+        Returns:
+            str: The dotted path of the blind index.
+        """
+        return f"{BLIND_INDEX_FIELD}.{self.field_token(name)}"
+
+    def rewrite_query(self, query: dict, indexed: Collection[str] = (), options: CollectionOptions = DEFAULT_OPTIONS) -> dict:
+        """Rewrites equality matches on encrypted fields onto their blind indexes.
+
+        Supports plain values, `$eq`, `$ne`, `$in` and `$nin` on indexed fields,
+        and recurses into `$and`, `$or` and `$nor`. `_id` and the metadata
+        fields are passed through unchanged.
+
+        Args:
+            query (dict): The plaintext query.
+            indexed (Collection[str], optional): The fields that have a blind index. Defaults to ().
+            options (CollectionOptions, optional): The options of the collection, for typed values. Defaults to DEFAULT_OPTIONS.
+
+        Returns:
+            dict: The query as it runs against the stored documents.
+        """
+        rewritten: dict = {}
+        for key, value in query.items():
+            if key in ("$and", "$or", "$nor"):
+                rewritten[key] = [self.rewrite_query(clause, indexed, options) for clause in value]
+
+            elif key.startswith("$") or key in RESERVED_FIELDS:
+                rewritten[key] = value
+
+            elif key not in indexed:
+                raise ValueError(f"The field '{key}' is encrypted and has no blind index to query it with.")
+
+            elif isinstance(value, dict) and value and all(operator.startswith("$") for operator in value):
+                rewritten[self.index_field(key)] = {
+                    operator: self._index_operand(key, operator, operand, options)
+                    for operator, operand in value.items()
+                }
+
+            else:
+                rewritten[self.index_field(key)] = self.blind_index(key, value, options)
+
+        return rewritten
+
+    def _index_operand(self, name: str, operator: str, operand: Any, options: CollectionOptions) -> Any:
+        if operator in ("$eq", "$ne"):
+            return self.blind_index(name, operand, options)
+
+        elif operator in ("$in", "$nin"):
+            return [self.blind_index(name, value, options) for value in operand]
+
+        raise ValueError(f"The operator '{operator}' is not supported on the encrypted field '{name}'.")
+
+    def encrypt_field(self, name: str, value: Any, data_key: DataKey, options: CollectionOptions = DEFAULT_OPTIONS) -> Tuple[str, bytes]:
+        """Encrypts a single field.
+
+        The plaintext starts with a header byte that records the type of the
+        value in its high four bits and whether it was compressed in the low
+        four, values of at least `compression_threshold` bytes are compressed
+        when the collection enables it and it makes them smaller. Values are
+        encoded with `CollectionOptions.pack`, strings keep the header of
+        older versions.
+
+        Args:
+            name (str): The plaintext field name.
+            value (Any): The plaintext value.
+            data_key (DataKey): The data key to seal the field with.
+            options (CollectionOptions, optional): The options of the collection. Defaults to DEFAULT_OPTIONS.
+
+        Returns:
+            Tuple[str, bytes]: The token and the ciphertext.
+        """
+        token = self.field_token(name)
+        raw_name = name.encode()
+        kind, raw_value = options.pack(name, value)
+        method = UNCOMPRESSED
+        if options.method != UNCOMPRESSED and len(raw_value) >= options.compression_threshold:
+            compressed = compress(options.method, raw_value)
+            if len(compressed) < len(raw_value):
+                method, raw_value = options.method, compressed
+
+        plaintext = struct.pack(">BH", kind << 4 | method, len(raw_name)) + raw_name + raw_value
+        nonce = os.urandom(NONCE_SIZE)
+        data_key.uses += 1
+        ciphertext = data_key.aead.encrypt(nonce, plaintext, token.encode())
+        return token, data_key.id + nonce + ciphertext
+
+    def decrypt_field(self, token: str, value: Union[str, bytes], keys: Dict[bytes, str]) -> Tuple[str, Any]:
+        """Decrypts a single field.
+
+        Fields are stored as raw bytes with a header byte, fields written by
+        format version 2 are base64 text without one.
+
+        Args:
+            token (str): The stored field name.
+            value (str, bytes): The ciphertext.
+            keys (Dict[bytes, str]): The wrapped data keys of the document by key ID.
+
+        Returns:
+            Tuple[str, Any]: The plaintext field name and value.
+        """
+        raw = b64decode(value) if isinstance(value, str) else bytes(value)
+        key_id = raw[:KEY_ID_SIZE]
+        nonce = raw[KEY_ID_SIZE:KEY_ID_SIZE + NONCE_SIZE]
+        if key_id not in keys:
+            raise PrivateKeyError("The document does not contain the key of one of its fields.")
+
+        data_key = self.unwrap(key_id, keys[key_id])
+        try:
+            plaintext = data_key.aead.decrypt(nonce, raw[KEY_ID_SIZE + NONCE_SIZE:], token.encode())
+        except InvalidTag:
+            raise PrivateKeyError("A field failed authentication, the data was modified or the key is wrong.")
+
+        if isinstance(value, str):
+            (name_size,) = struct.unpack(">H", plaintext[:2])
+            return plaintext[2:2 + name_size].decode(), plaintext[2 + name_size:].decode()
+
+        header, name_size = struct.unpack(">BH", plaintext[:3])
+        kind, method = header >> 4, header & 0x0F
+        raw_value = plaintext[3 + name_size:]
+        if method != UNCOMPRESSED:
+            raw_value = decompress(method, raw_value)
+
+        name = plaintext[3:3 + name_size].decode()
+        return name, raw_value.decode() if kind == STR else unpack(kind, raw_value)
+
+    def encode(self, data: dict, data_key: Optional[DataKey] = None, options: CollectionOptions = DEFAULT_OPTIONS) -> dict:
+        """Encrypts a document.
+
+        Args:
+            data (dict): The plaintext document.
+            data_key (DataKey, optional): The data key to use. Defaults to the codec's data key.
+            options (CollectionOptions, optional): The options of the collection. Defaults to DEFAULT_OPTIONS.
+
+        Returns:
+            dict: The document as it is stored.
+        """
+        data_key = data_key or self.data_key
+        document: dict = {
+            VERSION_FIELD: ENVELOPE_VERSION,
+            KEYS_FIELD: {
+                data_key.id.hex(): data_key.wrapped
+            },
+            MASTER_KEY_FIELD: data_key.master
+        }
+        for key, value in data.items():
+            if key == "_id":
+                document["_id"] = value
+                continue
+
+            token, ciphertext = self.encrypt_field(key, value, data_key, options)
+            document[token] = ciphertext
+            if key in options.indexed:
+                document.setdefault(BLIND_INDEX_FIELD, {})[token] = self.blind_index(key, value, options)
+
+        return document
+
+    def encode_update(self, update: dict, options: CollectionOptions = DEFAULT_OPTIONS, data_key: Optional[DataKey] = None) -> dict:
+        """Encrypts a `$set`/`$unset` update, only the fields it sets are encrypted.
+
+        An update without operators is treated as `$set`. Set fields are
+        sealed under the current data key, which is added to `_keys` in the
+        same update, and their blind indexes are updated along with them.
+        Operators that need the plaintext on the server, such as `$inc`,
+        cannot run on ciphertext and raise ValueError.
+
+        Args:
+            update (dict): The plaintext update.
+            options (CollectionOptions, optional): The options of the collection. Defaults to DEFAULT_OPTIONS.
+            data_key (DataKey, optional): The data key to use. Defaults to the codec's data key.
+
+        Returns:
+            dict: The update as it runs against the stored documents.
+        """
+        if not any(key.startswith("$") for key in update):
+            update = {"$set": update}
+
+        encoded: dict = {}
+        for operator, fields in update.items():
+            for name in fields:
+                if name in RESERVED_FIELDS:
+                    raise ValueError(f"The field '{name}' cannot be updated.")
+
+            if operator == "$set":
+                if not fields:
+                    continue
+
+                data_key = data_key or self.data_key
+                sets = encoded.setdefault("$set", {})
+                for name, value in fields.items():
+                    token, ciphertext = self.encrypt_field(name, value, data_key, options)
+                    sets[token] = ciphertext
+                    if name in options.indexed:
+                        sets[f"{BLIND_INDEX_FIELD}.{token}"] = self.blind_index(name, value, options)
+
+                sets[f"{KEYS_FIELD}.{data_key.id.hex()}"] = data_key.wrapped
+                sets[VERSION_FIELD] = ENVELOPE_VERSION
+
+            elif operator == "$unset":
+                unsets = encoded.setdefault("$unset", {})
+                for name in fields:
+                    token = self.field_token(name)
+                    unsets[token] = ""
+                    unsets[f"{BLIND_INDEX_FIELD}.{token}"] = ""
+
+            else:
+                raise ValueError(f"The update operator '{operator}' is not supported on encrypted fields.")
+
+        return encoded
+
+    def encode_many(self, documents: List[dict], options: CollectionOptions = DEFAULT_OPTIONS) -> List[dict]:
+        """Encrypts a batch of documents in one pass.
+
+        Unless per-document keys are enabled the whole batch shares one data key.
+
+        Args:
+            documents (List[dict]): The plaintext documents.
+            options (CollectionOptions, optional): The options of the collection. Defaults to DEFAULT_OPTIONS.
+
+        Returns:
+            List[dict]: The documents as they are stored.
+        """
+        if self.per_document:
+            return [self.encode(data, None, options) for data in documents]
+
+        data_key = self.data_key
+        return [self.encode(data, data_key, options) for data in documents]
+
+    def decode(self, document: dict) -> dict:
+        """Decrypts a stored document of any known format version.
+
+        Args:
+            document (dict): The document as it is stored.
+
+        Returns:
+            dict: The plaintext document.
+        """
+        version = document.get(VERSION_FIELD, LEGACY_VERSION)
+        if version == LEGACY_VERSION:
+            return self.decode_legacy(document)
+
+        elif version not in ENVELOPE_VERSIONS:
+            raise ValueError(f"Unsupported document format version: {version}")
+
+        keys = {
+            bytes.fromhex(key_id): wrapped
+            for key_id, wrapped in document.get(KEYS_FIELD, {}).items()
+        }
+        decrypted_data: dict = {}
+        for key, value in document.items():
+            if key in RESERVED_FIELDS:
+                continue
+
+            name, plaintext = self.decrypt_field(key, value, keys)
+            decrypted_data[name] = plaintext
+
+        return decrypted_data
+
+    def decode_lazy(self, document: dict) -> "LazyDocument":
+        """Wraps a stored document in a read-only mapping that decrypts each field on first access.
+
+        Args:
+            document (dict): The document as it is stored.
+
+        Returns:
+            LazyDocument: The plaintext view of the document.
+        """
+        return LazyDocument(self, document)
+
+    def decode_legacy(self, document: dict) -> dict:
+        """Decrypts a document where every key and value was encrypted with RSA.
+
+        Args:
+            document (dict): The document as it is stored.
+
+        Returns:
+            dict: The plaintext document.
+        """
+        decrypted_data: dict = {}
+        for key, value in document.items():
+            if key == "_id":
+                continue
+
+            decrypted_key = self.crypto.decrypt(b64decode(key)).decode()
+            decrypted_value = self.crypto.decrypt(b64decode(value)).decode()
+            decrypted_data[decrypted_key] = decrypted_value
+
+        return decrypted_data
+
+    def is_legacy(self, document: dict) -> bool:
+        """Tells a legacy RSA document apart from a plaintext one, neither has a version field.
+
+        Every field name of a legacy document is the base64 RSA ciphertext of
+        the name, as long as the modulus of one of the keys, and every value
+        is one too.
+
+        Args:
+            document (dict): The document as it is stored.
+
+        Returns:
+            bool: Whether the document was written in the legacy format.
+        """
+        if VERSION_FIELD in document:
+            return False
+
+        sizes = {context.rsa_key.size_in_bytes() for context in self.crypto.contexts.values()}
+        fields = [(key, value) for key, value in document.items() if key != "_id"]
+        for key, value in fields:
+            if not isinstance(value, str):
+                return False
+
+            try:
+                if len(b64decode(key, validate = True)) not in sizes or len(b64decode(value, validate = True)) not in sizes:
+                    return False
+
+            except ValueError:
+                return False
+
+        return bool(fields)
+
+class LazyDocument(Mapping):
+    def __init__(self, codec: DocumentCodec, document: dict):
+        """A read-only plaintext view of a stored document.
+
+        A field is decrypted the first time it is read and kept afterwards, so
+        reading one field of a wide document costs one AES-GCM operation
+        instead of one per field. Field names are only stored encrypted, so
+        iterating, `len` aside, decrypts every field. Documents in the legacy
+        format are decrypted up front.
+
+        Args:
+            codec (DocumentCodec): The codec that decrypts the fields.
+            document (dict): The document as it is stored.
+        """
+        self._codec = codec
+        self._document = document
+        self._values: Dict[str, Any] = {}
+        self._complete = False
+        version = document.get(VERSION_FIELD, LEGACY_VERSION)
+        if version == LEGACY_VERSION:
+            self._values = codec.decode_legacy(document)
+            self._complete = True
+
+        elif version not in ENVELOPE_VERSIONS:
+            raise ValueError(f"Unsupported document format version: {version}")
+
+        self._keys = {
+            bytes.fromhex(key_id): wrapped
+            for key_id, wrapped in document.get(KEYS_FIELD, {}).items()
+        }
+
+    def _decrypt(self, token: str) -> Tuple[str, Any]:
+        name, value = self._codec.decrypt_field(token, self._document[token], self._keys)
+        self._values[name] = value
+        return name, value
+
+    def _decrypt_all(self) -> Dict[str, Any]:
+        if not self._complete:
+            for token in self._document:
+                if token not in RESERVED_FIELDS:
+                    self._decrypt(token)
+
+            self._complete = True
+
+        return self._values
+
+    def __getitem__(self, name: str) -> Any:
+        if name in self._values or self._complete:
+            return self._values[name]
+
+        token = self._codec.field_token(name)
+        if token not in self._document:
+            raise KeyError(name)
+
+        return self._decrypt(token)[1]
+
+    def __contains__(self, name: object) -> bool:
+        if name in self._values or self._complete:
+            return name in self._values
+
+        return isinstance(name, str) and self._codec.field_token(name) in self._document
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._decrypt_all())
+
+    def __len__(self) -> int:
+        if self._complete:
+            return len(self._values)
+
+        return sum(1 for token in self._document if token not in RESERVED_FIELDS)
+
+    def __repr__(self) -> str:
+        return f"<LazyDocument decrypted={len(self._values)}/{len(self)}>"
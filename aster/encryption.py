@@ -1,12 +1,198 @@
+from .errors import PrivateKeyError
+from .instrumentation import DISABLED, Instrumentation
 from .objects import KeyFile
 
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet
 
-from typing import Union, Any
+from Crypto.PublicKey import RSA # type: ignore
+from Crypto.Cipher import PKCS1_v1_5 # type: ignore
 
-class Encryption:
+import hashlib
+import hmac
+import threading
+from base64 import b64decode, b64encode
+from typing import Dict, List, Optional, Sequence, Union, Any
+
+class RSAContext:
     def __init__(self, private_key: Union[str, KeyFile]):
-        self.private_key: str = private_key if isinstance(private_key, str) else private_key.key
+        """Parses the RSA key once so it can be reused by every request.
+
+        The parsed key is shared, cipher objects are created lazily once per
+        thread so the context is safe to use from executors.
+
+        Args:
+            private_key (str, KeyFile): The PEM encoded RSA private key.
+        """
+        self.private_key: str = private_key if isinstance(private_key, str) else private_key.load_key()
+        try:
+            self.rsa_key = RSA.importKey(self.private_key)
+        except (ValueError, IndexError, TypeError):
+            raise PrivateKeyError("The private key is invalid.")
+
+        self.key_id = hashlib.sha256(self.rsa_key.publickey().export_key("DER")).hexdigest()[:16]
+        self._local = threading.local()
+
+    @property
+    def cipher(self) -> Any:
+        """The PKCS#1 v1.5 cipher bound to the current thread.
+
+        Returns:
+            Any: The cipher.
+        """
+        cipher = getattr(self._local, "cipher", None)
+        if cipher is None:
+            cipher = self._local.cipher = PKCS1_v1_5.new(self.rsa_key)
+
+        return cipher
+
+    def encrypt(self, message: bytes) -> bytes:
+        return self.cipher.encrypt(message)
+
+    def derive_key(self, label: bytes) -> bytes:
+        """Derives a 256-bit secret bound to the private key.
+
+        Args:
+            label (bytes): The purpose of the secret, different labels give unrelated keys.
+
+        Returns:
+            bytes: The derived secret.
+        """
+        seed = hashlib.sha256(self.rsa_key.export_key("DER")).digest()
+        return hmac.new(seed, b"aster.db/" + label, hashlib.sha256).digest()
+
+    def decrypt(self, encrypted_message: bytes) -> bytes:
+        decrypted_message = self.cipher.decrypt(encrypted_message, None)
+        if decrypted_message is None:
+            raise PrivateKeyError("The data could not be decrypted with the private key.")
+
+        return decrypted_message
+
+class KeyRing:
+    def __init__(self, private_keys: Sequence[Union[str, KeyFile, RSAContext]]):
+        """The RSA keys that data keys are wrapped with, the newest first.
+
+        New data keys are wrapped with the active (first) key and stored as
+        `<key id>:<wrapped key>`, so any key of the ring can unwrap them.
+        Secrets for field names and blind indexes are derived from the oldest
+        key, they stay the same across rotations so existing tokens and
+        indexes keep matching.
+
+        Args:
+            private_keys (Sequence[str, KeyFile, RSAContext]): The keys, the active key first.
+        """
+        contexts = [key if isinstance(key, RSAContext) else RSAContext(key) for key in private_keys]
+        if not contexts:
+            raise PrivateKeyError("No private key provided.")
+
+        self.active: RSAContext = contexts[0]
+        self.root: RSAContext = contexts[-1]
+        self.contexts: Dict[str, RSAContext] = {}
+        for context in [self.active] + contexts[1:-1] + [self.root]:
+            if context.key_id not in self.contexts or context is self.root:
+                self.contexts.pop(context.key_id, None)
+                self.contexts[context.key_id] = context
+
+    @property
+    def active_id(self) -> str:
+        return self.active.key_id
+
+    @property
+    def private_keys(self) -> List[str]:
+        return [context.private_key for context in self.contexts.values()]
+
+    def rotate(self, private_key: Union[str, KeyFile, RSAContext]) -> "KeyRing":
+        """Returns a ring with a new active key that still reads everything this ring reads.
+
+        Args:
+            private_key (str, KeyFile, RSAContext): The new key.
+
+        Returns:
+            KeyRing: The new ring.
+        """
+        return KeyRing([private_key] + list(self.contexts.values()))
+
+    def derive_key(self, label: bytes) -> bytes:
+        return self.root.derive_key(label)
+
+    def wrap(self, key: bytes) -> str:
+        """Wraps a data key with the active key.
+
+        Args:
+            key (bytes): The raw data key.
+
+        Returns:
+            str: The wrapped key, prefixed with the ID of the key that wrapped it.
+        """
+        return f"{self.active_id}:{b64encode(self.active.encrypt(key)).decode()}"
+
+    @staticmethod
+    def key_id(wrapped: str) -> str:
+        """Returns the ID of the key that wrapped a data key, empty for keys written before key IDs.
+
+        Args:
+            wrapped (str): The wrapped key.
+
+        Returns:
+            str: The key ID.
+        """
+        return wrapped.split(":", 1)[0] if ":" in wrapped else ""
+
+    def unwrap(self, wrapped: str) -> bytes:
+        """Unwraps a data key with the key of the ring that wrapped it.
+
+        Args:
+            wrapped (str): The wrapped key.
+
+        Returns:
+            bytes: The raw data key.
+        """
+        key_id = self.key_id(wrapped)
+        if not key_id:
+            return self.decrypt(b64decode(wrapped))
+
+        context = self.contexts.get(key_id)
+        if context is None:
+            raise PrivateKeyError("The data was encrypted with a key that is not in the key ring.")
+
+        return context.decrypt(b64decode(wrapped.split(":", 1)[1]))
+
+    def decrypt(self, encrypted_message: bytes) -> bytes:
+        """Decrypts a message that does not record its key by trying every key, the active key first.
+
+        Args:
+            encrypted_message (bytes): The message.
+
+        Returns:
+            bytes: The decrypted message.
+        """
+        for context in self.contexts.values():
+            try:
+                return context.decrypt(encrypted_message)
+            except PrivateKeyError:
+                continue
+
+        raise PrivateKeyError("The data could not be decrypted with any key of the key ring.")
+
+class Encryption:
+    def __init__(
+        self,
+        private_key: Union[str, KeyFile, Sequence[Union[str, KeyFile]]],
+        instrumentation: Optional[Instrumentation] = None
+    ):
+        """Fernet encryption with one key or, during a rotation, several.
+
+        With several keys, messages are encrypted with the first key and
+        decrypted with whichever key matches, like `MultiFernet`.
+
+        Args:
+            private_key (str, KeyFile, Sequence[str, KeyFile]): The key, or the keys with the newest first.
+            instrumentation (Instrumentation, optional): Receives the encrypt and decrypt timings. Defaults to None.
+        """
+        self.instrumentation = instrumentation or DISABLED
+        keys = [private_key] if isinstance(private_key, (str, bytes, KeyFile)) else list(private_key)
+        self.private_keys: List[str] = [key.key if isinstance(key, KeyFile) else key for key in keys]
+        self.private_key: str = self.private_keys[0]
+        self.fernet = MultiFernet([Fernet(key) for key in self.private_keys]) if len(self.private_keys) > 1 else Fernet(self.private_key)
 
     @staticmethod
     def generate_keys():
@@ -14,9 +200,27 @@ class Encryption:
         return key
 
     def encrypt(self, message: Any) -> bytes:
-        encrypted_message: bytes = Fernet(self.private_key).encrypt(message)
+        with self.instrumentation.operation("encrypt") as operation, operation.phase("encrypt"):
+            encrypted_message: bytes = self.fernet.encrypt(message)
+
         return encrypted_message
 
     def decrypt_public_key(self, encrypted_message: bytes) -> Any:
-        decrypted_message: bytes = Fernet(self.private_key).decrypt(encrypted_message).decode()
-        return decrypted_message
\ No newline at end of file
+        with self.instrumentation.operation("decrypt") as operation, operation.phase("decrypt"):
+            decrypted_message: bytes = self.fernet.decrypt(encrypted_message).decode()
+
+        return decrypted_message
+
+    def rotate(self, encrypted_message: bytes) -> bytes:
+        """Re-encrypts a message with the newest key.
+
+        Args:
+            encrypted_message (bytes): A message encrypted with any of the keys.
+
+        Returns:
+            bytes: The message encrypted with the newest key.
+        """
+        if isinstance(self.fernet, MultiFernet):
+            return self.fernet.rotate(encrypted_message)
+
+        return self.fernet.encrypt(self.fernet.decrypt(encrypted_message))
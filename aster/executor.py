@@ -0,0 +1,146 @@
+from .codec import CollectionOptions, DEFAULT_OPTIONS, DocumentCodec
+from .encryption import KeyRing
+
+import asyncio
+import math
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+EXECUTOR_MODES = ("inline", "thread", "process")
+
+_worker_codec: Optional[DocumentCodec] = None
+
+def _initialize_worker(private_keys: List[str], per_document: bool) -> None:
+    global _worker_codec
+    _worker_codec = DocumentCodec(KeyRing(private_keys), per_document)
+
+def _encode_many(documents: List[dict], options: CollectionOptions = DEFAULT_OPTIONS) -> List[dict]:
+    return _worker_codec.encode_many(documents, options)
+
+def _decode_many(documents: List[dict]) -> List[dict]:
+    return [_worker_codec.decode(document) for document in documents]
+
+class CryptoExecutor:
+    def __init__(
+        self,
+        codec: DocumentCodec,
+        mode: str = "inline",
+        max_workers: Optional[int] = None,
+        threshold: int = 256
+    ):
+        """Runs document encryption and decryption off the event loop.
+
+        Batches with fewer fields than `threshold` are handled inline, where
+        the executor overhead would cost more than it saves. Larger batches
+        are split across the workers of the pool:
+
+        - `thread`: a thread pool, for the AES-GCM and RSA primitives that
+          release the GIL while they run.
+        - `process`: a process pool, for the pure-Python parts of the codec.
+          Every worker parses the private keys once when it starts, a key
+          rotation needs a new executor.
+
+        Args:
+            codec (DocumentCodec): The codec used inline and by thread workers.
+            mode (str, optional): `inline`, `thread` or `process`. Defaults to "inline".
+            max_workers (int, optional): The size of the pool, None for the default of the pool. Defaults to None.
+            threshold (int, optional): The number of fields from which a batch is offloaded. Defaults to 256.
+        """
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Invalid executor mode provided, expected one of {', '.join(EXECUTOR_MODES)}.")
+
+        self.codec = codec
+        self.mode = mode
+        self.threshold = threshold
+        self.pool: Optional[Executor] = None
+        if mode == "thread":
+            self.pool = ThreadPoolExecutor(max_workers, thread_name_prefix = "aster-crypto")
+
+        elif mode == "process":
+            self.pool = ProcessPoolExecutor(
+                max_workers,
+                initializer = _initialize_worker,
+                initargs = (codec.crypto.private_keys, codec.per_document)
+            )
+
+        self.workers: int = getattr(self.pool, "_max_workers", 1)
+
+    def _offload(self, documents: List[dict]) -> bool:
+        return self.pool is not None and sum(len(document) for document in documents) >= self.threshold
+
+    def _chunks(self, documents: List[dict]) -> List[List[dict]]:
+        size = max(1, math.ceil(len(documents) / self.workers))
+        return [documents[index:index + size] for index in range(0, len(documents), size)]
+
+    async def run(self, function: Callable, *args: Any) -> Any:
+        """Runs any blocking crypto call, such as `Encryption.encrypt`, on the pool.
+
+        Process pools need `function` and its arguments to be picklable.
+
+        Args:
+            function (Callable): The function.
+            *args (Any): Its arguments.
+
+        Returns:
+            Any: The return value of the function.
+        """
+        if self.pool is None:
+            return function(*args)
+
+        return await asyncio.get_running_loop().run_in_executor(self.pool, function, *args)
+
+    async def _map(self, thread_function: Callable, process_function: Callable, documents: List[dict], *args: Any) -> List[dict]:
+        loop = asyncio.get_running_loop()
+        function = process_function if self.mode == "process" else thread_function
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self.pool, function, chunk, *args) for chunk in self._chunks(documents)
+        ))
+        return [document for chunk in results for document in chunk]
+
+    def _decode_chunk(self, documents: List[dict]) -> List[dict]:
+        return [self.codec.decode(document) for document in documents]
+
+    async def encode_many(self, documents: List[dict], options: CollectionOptions = DEFAULT_OPTIONS) -> List[dict]:
+        """Encrypts a batch of documents.
+
+        Args:
+            documents (List[dict]): The plaintext documents.
+            options (CollectionOptions, optional): The options of the collection. Defaults to DEFAULT_OPTIONS.
+
+        Returns:
+            List[dict]: The documents as they are stored.
+        """
+        if not self._offload(documents):
+            return self.codec.encode_many(documents, options)
+
+        return await self._map(self.codec.encode_many, _encode_many, documents, options)
+
+    async def decode_many(self, documents: List[dict]) -> List[dict]:
+        """Decrypts a batch of stored documents.
+
+        Args:
+            documents (List[dict]): The documents as they are stored.
+
+        Returns:
+            List[dict]: The plaintext documents.
+        """
+        if not self._offload(documents):
+            return self._decode_chunk(documents)
+
+        return await self._map(self._decode_chunk, _decode_many, documents)
+
+    async def encode(self, data: dict, options: CollectionOptions = DEFAULT_OPTIONS) -> dict:
+        return (await self.encode_many([data], options))[0]
+
+    async def decode(self, document: dict) -> dict:
+        return (await self.decode_many([document]))[0]
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stops the workers of the pool.
+
+        Args:
+            wait (bool, optional): Wait for running jobs to finish. Defaults to True.
+        """
+        if self.pool is not None:
+            self.pool.shutdown(wait = wait)
+            self.pool = None
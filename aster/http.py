@@ -1,58 +1,417 @@
+from . import wire
+from .blob import CHUNK_SIZE, BlobReader, chunks
+from .cache import SingleFlight
+from .instrumentation import DISABLED, NULL_OPERATION, Instrumentation, detached
+from .objects import authorization
+from .resilience import Hedging, RetryBudget, RetryPolicy, expires, remaining, within
+from .routing import Node, Router
 from .errors import (
     BadRequestError,
     DuplicateError,
     NotFoundError,
     PrivateKeyError,
     ServerError,
+    TimeoutError,
     UnknownError
 )
 
 import aiohttp # type: ignore
-from typing import Optional
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List, Optional, Sequence, Tuple, Union
 
 RESPONSE_MAP = {
     400: BadRequestError("Bad Request."),
     401: PrivateKeyError("The private key is invalid."),
     404: NotFoundError("The query returned no results."),
-    500: ServerError("The server encountered an error.")
+    409: DuplicateError("The data is already in the collection."),
+    500: ServerError("The server encountered an error."),
+    502: ServerError("The server is unreachable."),
+    503: ServerError("The server is unavailable."),
+    504: TimeoutError("The server timed out.")
 }
 
+READ_ROUTES = ("fetch", "fetch_many", "fetch_page")
+STREAM_ROUTES = ("find", "open_blob")
+
+# Failures a read is retried after, the request may not have reached the database or can safely run again.
+RETRYABLE = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, ServerError, TimeoutError)
+
 class HTTPClient:
-    def __init__(self, url: str, private_key: str):
+    def __init__(
+        self,
+        url: Union[str, Sequence[Union[str, Sequence[str]]]],
+        private_key: str,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        keepalive_timeout: float = 30.0,
+        ttl_dns_cache: Optional[int] = 300,
+        session: Optional[aiohttp.ClientSession] = None,
+        wire_format: str = "json",
+        single_flight: bool = True,
+        max_failures: int = 3,
+        eject_for: float = 30.0,
+        slow_threshold: Optional[float] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        timeout: Optional[float] = None,
+        retry: Optional[RetryPolicy] = RetryPolicy(),
+        hedging: Optional[Hedging] = None,
+        retry_budget: float = 0.1
+    ):
         """Initializes the HTTPClient.
 
+        The client owns a single connection pool that is shared by every
+        request, so connections to the AsterDB Server are reused instead of
+        paying a new TCP/TLS handshake and DNS lookup per call.
+
+        Several servers can be given, as a list of replicas or a list of
+        shards that are each a list of replicas, see `Router` for how
+        requests are spread across them.
+
+        Every call ends by its deadline, the earlier of `timeout` and an
+        enclosing `deadline` block, with `TimeoutError`. Reads are retried
+        on connection and server errors as long as the deadline allows, and
+        with `hedging` a slow read is also sent to a second replica. Retries
+        and hedges together stay within `retry_budget` of the requests.
+
         Args:
-            url (str): The URL of the AsterDB Server.
+            url (str, Sequence[str, Sequence[str]]): The URL of the AsterDB Server, or the URLs of several.
             private_key (str): Private key that is used to encrypt and decrypt data.
+            limit (int, optional): Total number of simultaneous connections in the pool. Defaults to 100.
+            limit_per_host (int, optional): Simultaneous connections per host, 0 for no limit. Defaults to 0.
+            keepalive_timeout (float, optional): Seconds an idle connection is kept open. Defaults to 30.0.
+            ttl_dns_cache (int, optional): Seconds DNS results are cached, None to cache forever. Defaults to 300.
+            session (aiohttp.ClientSession, optional): An existing session to use instead of creating one. Defaults to None.
+            wire_format (str, optional): The body format, `json`, `msgpack` or `bson`. Binary formats fall back
+                to JSON when their package is not installed or the server answers in JSON. Defaults to "json".
+            single_flight (bool, optional): Let concurrent identical reads share one request, see `SingleFlight`. Defaults to True.
+            max_failures (int, optional): Consecutive failures that take a server out of rotation. Defaults to 3.
+            eject_for (float, optional): Seconds a failing or slow server stays out of rotation. Defaults to 30.0.
+            slow_threshold (float, optional): Average latency in seconds that takes a server out of rotation,
+                None to only eject on failures. Defaults to None.
+            instrumentation (Instrumentation, optional): Receives the serialize, network and deserialize timings
+                and the payload sizes of every request. Reads that share a single-flight request time their wait,
+                and the request is reported as `<route>.shared`. Defaults to None.
+            timeout (float, optional): Seconds every call may take, None to only end calls by `deadline`. Streams and blobs
+                may take longer, as long as no single read waits for more. Defaults to None.
+            retry (RetryPolicy, optional): How reads are retried, None to never retry. Defaults to RetryPolicy().
+            hedging (Hedging, optional): When reads are sent to a second replica, None to never hedge. Defaults to None.
+            retry_budget (float, optional): Retries and hedges allowed per request. Defaults to 0.1.
         """
+        if wire_format not in wire.WIRE_FORMATS:
+            raise ValueError(f"Invalid wire format provided, expected one of {', '.join(wire.WIRE_FORMATS)}.")
+
         self.url = url
         self.private_key = private_key
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self._session = session
+        self._owns_session = session is None
+        self.content_type = wire.WIRE_FORMATS[wire_format]
+        if not wire.available(self.content_type):
+            self.content_type = wire.JSON
+
+        self.single_flight: Optional[SingleFlight] = SingleFlight() if single_flight else None
+        self.router = Router(url, max_failures, eject_for, slow_threshold)
+        self.instrumentation = instrumentation or DISABLED
+        self.timeout = timeout
+        self.retry = retry
+        self.hedging = hedging
+        self.budget = RetryBudget(retry_budget)
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The pooled session, created on first use inside the running event loop.
 
-    async def fetch(self, database: str, collection: str, query: dict, limit: Optional[int] = 0) -> dict:
-        """Fetches data with given query.
+        Returns:
+            aiohttp.ClientSession: The shared session.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit = self.limit,
+                limit_per_host = self.limit_per_host,
+                keepalive_timeout = self.keepalive_timeout,
+                ttl_dns_cache = self.ttl_dns_cache,
+                use_dns_cache = True
+            )
+            self._session = aiohttp.ClientSession(connector = connector)
+            self._owns_session = True
+
+        return self._session
+
+    def set_key(self, private_key: str) -> None:
+        """Sets the private key sent with every request.
 
         Args:
-            collection (str): The name of the collection.
+            private_key (str): The private key.
+        """
+        self.private_key = private_key
+
+    async def close(self) -> None:
+        """Closes the connection pool if it is owned by this client."""
+        if self._session is not None and self._owns_session and not self._session.closed:
+            await self._session.close()
+
+        self._session = None
+
+    async def __aenter__(self) -> "HTTPClient":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def request(self, method: str, path: str, payload: dict) -> Any:
+        """Sends a request to the AsterDB Server over the pooled session.
+
+        Identical reads that are sent while one of them is still running
+        share its response. Any other request stops later reads of its
+        database or collection from joining reads that started before it.
+        A shared read runs until the default timeout, every caller stops
+        waiting for it at its own deadline.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The route, relative to the server URL.
+            payload (dict): The body.
 
         Returns:
-            dict: The query result.
+            Any: The `result` field of the response.
         """
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.url}/{database}/{collection}/fetch",
-                headers = {
-                    "Authorization": self.private_key,
-                },
-                json = {
-                    "query": query
-                }
+        namespace, _, route = path.rpartition("/")
+        database, _, collection = namespace.partition("/")
+        with self.instrumentation.operation(route, database = database or None, collection = collection or None) as operation:
+            if self.single_flight is None:
+                return await self._call(method, path, payload, operation, expires(self.timeout))
+
+            if method == "POST" and route in READ_ROUTES:
+                key = (database, collection, route + wire.canonical(payload))
+                deadline = expires(self.timeout)
+                with operation.phase("wait"):
+                    return await within(deadline, self.single_flight.run(
+                        key,
+                        lambda: self._shared(method, path, payload, route, database or None, collection or None)
+                    ))
+
+            try:
+                return await self._call(method, path, payload, operation, expires(self.timeout))
+            finally:
+                self.single_flight.forget(*namespace.split("/")[:2] if namespace else ())
+
+    async def _shared(self, method: str, path: str, payload: dict, route: str, database: Optional[str], collection: Optional[str]) -> Any:
+        # The request of a single-flight call outlives whichever caller started it, so it is timed as an
+        # operation of its own, while every caller times its wait.
+        with self.instrumentation.operation(f"{route}.shared", database = database, collection = collection) as operation:
+            return await self._call(method, path, payload, operation, None if self.timeout is None else time.monotonic() + self.timeout)
+
+    def _key(self, path: str, payload: dict) -> str:
+        parts = path.split("/")
+        if len(parts) == 1:
+            return str(payload.get("database"))
+
+        if len(parts) == 2:
+            return f"{parts[0]}/{payload.get('collection')}"
+
+        return f"{parts[0]}/{parts[1]}"
+
+    def _pick(self, method: str, path: str, payload: dict) -> Node:
+        return self.router.pick(self._key(path, payload), method == "POST" and path.rpartition("/")[2] in READ_ROUTES + STREAM_ROUTES)
+
+    async def _call(self, method: str, path: str, payload: dict, operation: Any, deadline: Optional[float]) -> Any:
+        route = path.rpartition("/")[2]
+        read = method == "POST" and route in READ_ROUTES
+        self.budget.deposit()
+        node = self._pick(method, path, payload)
+        retries = 0
+        while True:
+            try:
+                if read and self.hedging is not None:
+                    return await self._hedge(method, path, payload, operation, deadline, node)
+
+                return await self._send(method, path, payload, operation, node, remaining(deadline))
+
+            except RETRYABLE:
+                if not read or self.retry is None or retries + 1 >= self.retry.attempts:
+                    raise
+
+                delay = self.retry.backoff(retries)
+                if deadline is not None and time.monotonic() + delay >= deadline or not self.budget.withdraw():
+                    raise
+
+                retries += 1
+                operation.set(retries = retries)
+                await asyncio.sleep(delay)
+                node = self.router.alternative(self._key(path, payload), node) or self._pick(method, path, payload)
+
+    async def _hedge(self, method: str, path: str, payload: dict, operation: Any, deadline: Optional[float], node: Node) -> Any:
+        route = path.rpartition("/")[2]
+        first = asyncio.ensure_future(detached(self._send(method, path, payload, operation, node, remaining(deadline))))
+        pending = {first}
+        try:
+            await asyncio.wait(pending, timeout = self.hedging.delay(route))
+            other = None if first.done() else self.router.alternative(self._key(path, payload), node)
+            if other is None or not self.budget.withdraw():
+                return await first
+
+            self.hedging.hedged += 1
+            operation.set(hedged = True)
+            second = asyncio.ensure_future(detached(self._send(method, path, payload, operation, other, remaining(deadline))))
+            pending.add(second)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when = asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.hedging.won += task is second
+                        return task.result()
+
+                if not pending:
+                    return done.pop().result()
+
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _send(
+        self,
+        method: str,
+        path: str,
+        payload: dict,
+        operation: Any = NULL_OPERATION,
+        node: Optional[Node] = None,
+        timeout: Optional[float] = None
+    ) -> Any:
+        node = node or self._pick(method, path, payload)
+        operation.set(node = node.url)
+        with operation.phase("serialize"):
+            data = wire.dumps(self.content_type, payload)
+
+        operation.size("request_bytes", len(data))
+        options = {"timeout": aiohttp.ClientTimeout(total = timeout)} if timeout is not None else {}
+        started = self.router.started(node)
+        failed: Optional[bool] = True
+        try:
+            with operation.phase("network"):
+                async with self.session.request(
+                    method,
+                    f"{node.url}/{path}",
+                    headers = {
+                        "Authorization": authorization(self.private_key),
+                        "Content-Type": self.content_type,
+                        "Accept": f"{self.content_type}, {wire.JSON};q=0.5",
+                    },
+                    data = data,
+                    **options
+                ) as response:
+                    failed = response.status >= 500
+                    body = await response.read()
+
+            operation.size("response_bytes", len(body))
+            if response.status == 200:
+                route = path.rpartition("/")[2]
+                if self.hedging is not None and method == "POST" and route in READ_ROUTES:
+                    self.hedging.record(route, time.monotonic() - started)
+
+                with operation.phase("deserialize"):
+                    return wire.loads(response.headers.get("Content-Type"), body).get("result")
+
+            raise RESPONSE_MAP.get(response.status, UnknownError(f"The server encountered an unknown error: HTTP {response.status}"))
+
+        except asyncio.CancelledError:
+            failed = None
+            raise
+
+        except asyncio.TimeoutError as error:
+            raise TimeoutError(f"{node.url} did not answer before the deadline.") from error
+
+        finally:
+            self._finished(node, started, failed)
+
+    @asynccontextmanager
+    async def _transfer(self, method: str, path: str, payload: dict, headers: dict, **options: Any) -> AsyncIterator[aiohttp.ClientResponse]:
+        # Sends a request whose body or response is streamed instead of read at once, these are never retried.
+        # The timeout bounds connecting and every read rather than the whole transfer, so a long download
+        # that keeps arriving is not cut off while a stalled one still is.
+        timeout = remaining(expires(self.timeout))
+        if timeout is not None:
+            options["timeout"] = aiohttp.ClientTimeout(total = None, sock_connect = timeout, sock_read = timeout)
+
+        node = self._pick(method, path, payload)
+        started = self.router.started(node)
+        failed: Optional[bool] = True
+        try:
+            async with self.session.request(
+                method,
+                f"{node.url}/{path}",
+                headers = dict(headers, Authorization = authorization(self.private_key)),
+                **options
             ) as response:
-                if response.status == 200:
-                    result: dict = await response.json().get("result")
-                    result[0] if limit == 1 else (result[:limit] if limit != 0 and limit != 1 else result)
-                    return result
+                failed = response.status >= 500
+                if response.status != 200:
+                    raise RESPONSE_MAP.get(response.status, UnknownError(f"The server encountered an unknown error: HTTP {response.status}"))
+
+                yield response
+
+        except (asyncio.CancelledError, GeneratorExit):
+            failed = None
+            raise
+
+        except asyncio.TimeoutError as error:
+            raise TimeoutError(f"{node.url} stopped sending the stream before the deadline.") from error
+
+        finally:
+            self._finished(node, started, failed)
+
+    def _finished(self, node: Node, started: float, failed: Optional[bool]) -> None:
+        # None marks a cancelled request, a hedge loser cut short would make a slow replica look fast.
+        if failed is None:
+            self.router.abandoned(node)
+
+        else:
+            self.router.finished(node, started, failed)
+
+    async def stream(self, method: str, path: str, payload: dict) -> AsyncIterator[dict]:
+        """Sends a request and yields the newline delimited JSON objects of the response as they arrive.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The route, relative to the server URL.
+            payload (dict): The body, encoded in the wire format.
+
+        Yields:
+            dict: The objects of the response.
+        """
+        headers = {"Content-Type": self.content_type, "Accept": "application/x-ndjson"}
+        async with self._transfer(method, path, payload, headers, data = wire.dumps(self.content_type, payload)) as response:
+            async for line in response.content:
+                if line.strip():
+                    yield wire.loads(wire.JSON, line)
+
+    async def fetch(self, database: str, collection: str, query: dict, *, projection: Optional[List[str]] = None) -> dict:
+        """Fetches the first document that matches the query.
+
+        `projection` is keyword-only, the fourth positional argument used to be `limit`.
+
+        Args:
+            collection (str): The name of the collection.
+            query (dict): The query to find the data.
+            projection (List[str], optional): The fields to return, None for all fields. Defaults to None.
 
-                raise RESPONSE_MAP.get(response.status, UnknownError(f"The server encountered an unknown error: HTTP {response.status}"))
+        Returns:
+            dict: The document.
+
+        Raises:
+            NotFoundError: No document matches the query.
+        """
+        return await self.request(
+            "POST",
+            f"{database}/{collection}/fetch",
+            {
+                "query": query,
+                "projection": projection
+            }
+        )
 
     async def insert(self, database: str, collection: str, data: dict) -> dict:
         """Inserts data into a collection.
@@ -64,20 +423,13 @@ class HTTPClient:
         Returns:
             dict: The inserted data.
         """
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.url}/{database}/{collection}/insert",
-                headers = {
-                    "Authorization": self.private_key,
-                },
-                json = {
-                    "data": data
-                }
-            ) as response:
-                if response.status == 200:
-                    return await response.json().get("result")
-
-                raise RESPONSE_MAP.get(response.status, UnknownError(f"The server encountered an unknown error: HTTP {response.status}"))
+        return await self.request(
+            "POST",
+            f"{database}/{collection}/insert",
+            {
+                "data": data
+            }
+        )
 
     async def update(self, database: str, collection: str, query: dict, data: dict) -> dict:
         """Updates data in a collection.
@@ -90,21 +442,14 @@ class HTTPClient:
         Returns:
             dict: The updated data.
         """
-        async with aiohttp.ClientSession() as session:
-            async with session.patch(
-                f"{self.url}/{database}/{collection}/update",
-                headers = {
-                    "Authorization": self.private_key,
-                },
-                json = {
-                    "query": query,
-                    "data": data
-                }
-            ) as response:
-                if response.status == 200:
-                    return await response.json().get("result")
-
-                raise RESPONSE_MAP.get(response.status, UnknownError(f"The server encountered an unknown error: HTTP {response.status}"))
+        return await self.request(
+            "PATCH",
+            f"{database}/{collection}/update",
+            {
+                "query": query,
+                "data": data
+            }
+        )
 
     async def delete(self, database: str, collection: str, query: dict) -> dict:
         """Deletes data in a collection.
@@ -116,20 +461,13 @@ class HTTPClient:
         Returns:
             dict: The deleted data.
         """
-        async with aiohttp.ClientSession() as session:
-            async with session.delete(
-                f"{self.url}/{database}/{collection}/delete",
-                headers = {
-                    "Authorization": self.private_key,
-                },
-                json = {
-                    "query": query
-                }
-            ) as response:
-                if response.status == 200:
-                    return await response.json().get("result")
-
-                raise RESPONSE_MAP.get(response.status, UnknownError(f"The server encountered an unknown error: HTTP {response.status}"))
+        return await self.request(
+            "DELETE",
+            f"{database}/{collection}/delete",
+            {
+                "query": query
+            }
+        )
 
     async def create_collection(self, database: str, collection: str) -> dict:
         """Creates a collection.
@@ -140,20 +478,13 @@ class HTTPClient:
         Returns:
             dict: The created collection.
         """
-        async with aiohttp.ClientSession() as session:
-            async with session.create(
-                f"{self.url}/{database}/create",
-                headers = {
-                    "Authorization": self.private_key,
-                },
-                json = {
-                    "collection": collection
-                }
-            ) as response:
-                if response.status == 200:
-                    return await response.json().get("result")
-
-                raise RESPONSE_MAP.get(response.status, UnknownError(f"The server encountered an unknown error: HTTP {response.status}"))
+        return await self.request(
+            "POST",
+            f"{database}/create",
+            {
+                "collection": collection
+            }
+        )
 
     async def delete_collection(self, database: str, collection: str) -> dict:
         """Deletes a collection.
@@ -164,20 +495,13 @@ class HTTPClient:
         Returns:
             dict: The deleted collection.
         """
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.url}/{database}/delete",
-                headers = {
-                    "Authorization": self.private_key,
-                },
-                json = {
-                    "collection": collection
-                }
-            ) as response:
-                if response.status == 200:
-                    return await response.json().get("result")
-
-                raise RESPONSE_MAP.get(response.status, UnknownError(f"The server encountered an unknown error: HTTP {response.status}"))
+        return await self.request(
+            "POST",
+            f"{database}/delete",
+            {
+                "collection": collection
+            }
+        )
 
     async def create_database(self, database: str) -> dict:
         """Creates a database.
@@ -188,21 +512,14 @@ class HTTPClient:
         Returns:
             dict: The created database.
         """
-        async with aiohttp.ClientSession() as session:
-            async with session.create(
-                f"{self.url}/create",
-                headers = {
-                    "Authorization": self.private_key,
-                },
-                json = {
-                    "database": database
-                }
-            ) as response:
-                if response.status == 200:
-                    return await response.json().get("result")
+        return await self.request(
+            "POST",
+            "create",
+            {
+                "database": database
+            }
+        )
 
-                raise RESPONSE_MAP.get(response.status, UnknownError(f"The server encountered an unknown error: HTTP {response.status}"))
-            
     async def delete_database(self, database: str) -> dict:
         """Deletes a database.
 
@@ -212,17 +529,291 @@ class HTTPClient:
         Returns:
             dict: The deleted database.
         """
-        async with aiohttp.ClientSession() as session:
-            async with session.delete(
-                f"{self.url}/delete",
-                headers = {
-                    "Authorization": self.private_key,
-                },
-                json = {
-                    "database": database
-                }
+        return await self.request(
+            "DELETE",
+            "delete",
+            {
+                "database": database
+            }
+        )
+
+    async def fetch_many(
+        self,
+        database: str,
+        collection: str,
+        query: dict,
+        limit: int = 0,
+        skip: int = 0,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        projection: Optional[List[str]] = None
+    ) -> List[dict]:
+        """Fetches every document that matches the query.
+
+        Limit, skip, sort and projection are applied by the server and MongoDB.
+
+        Args:
+            collection (str): The name of the collection.
+            query (dict): The query to find the data.
+            limit (int, optional): The maximum number of documents, 0 for no limit. Defaults to 0.
+            skip (int, optional): The number of documents to skip. Defaults to 0.
+            sort (List[Tuple[str, int]], optional): Field and direction pairs. Defaults to None.
+            projection (List[str], optional): The fields to return, None for all fields. Defaults to None.
+
+        Returns:
+            List[dict]: The query result.
+        """
+        return await self.request(
+            "POST",
+            f"{database}/{collection}/fetch_many",
+            {
+                "query": query,
+                "limit": limit,
+                "skip": skip,
+                "sort": sort,
+                "projection": projection
+            }
+        )
+
+    async def fetch_page(
+        self,
+        database: str,
+        collection: str,
+        query: dict,
+        page_size: int = 50,
+        token: Optional[str] = None,
+        projection: Optional[List[str]] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Fetches one page of documents.
+
+        Args:
+            collection (str): The name of the collection.
+            query (dict): The query to find the data.
+            page_size (int, optional): The number of documents per page. Defaults to 50.
+            token (str, optional): The token returned with the previous page, None for the first page. Defaults to None.
+            projection (List[str], optional): The fields to return, None for all fields. Defaults to None.
+
+        Returns:
+            Tuple[List[dict], Optional[str]]: The documents and the token of the next page, None on the last page.
+        """
+        result = await self.request(
+            "POST",
+            f"{database}/{collection}/fetch_page",
+            {
+                "query": query,
+                "page_size": page_size,
+                "token": token,
+                "projection": projection
+            }
+        )
+        return result["documents"], result["next"]
+
+    async def find(self, database: str, collection: str, query: dict, batch_size: int = 100) -> AsyncIterator[dict]:
+        """Streams every document that matches the query.
+
+        The server answers with one JSON document per line and decrypts them
+        `batch_size` at a time, so neither side holds the whole result.
+
+        Args:
+            collection (str): The name of the collection.
+            query (dict): The query to find the data.
+            batch_size (int, optional): The number of documents per batch. Defaults to 100.
+
+        Yields:
+            dict: The documents.
+        """
+        async for document in self.stream(
+            "POST",
+            f"{database}/{collection}/find",
+            {
+                "query": query,
+                "batch_size": batch_size
+            }
+        ):
+            yield document
+
+    async def insert_many(self, database: str, collection: str, data: List[dict], ordered: bool = True) -> dict:
+        """Inserts a batch of documents in a single request.
+
+        Args:
+            collection (str): The name of the collection.
+            data (List[dict]): The documents that should be inserted.
+            ordered (bool, optional): Stop at the first failed insert. Defaults to True.
+
+        Returns:
+            dict: The inserted data.
+        """
+        return await self.request(
+            "POST",
+            f"{database}/{collection}/insert_many",
+            {
+                "data": data,
+                "ordered": ordered
+            }
+        )
+
+    async def update_many(self, database: str, collection: str, query: dict, data: dict) -> dict:
+        """Updates every document that matches the query.
+
+        Args:
+            collection (str): The name of the collection.
+            query (dict): The query to find the data.
+            data (dict): The data that should be updated.
+
+        Returns:
+            dict: The updated data.
+        """
+        return await self.request(
+            "PATCH",
+            f"{database}/{collection}/update_many",
+            {
+                "query": query,
+                "data": data
+            }
+        )
+
+    async def delete_many(self, database: str, collection: str, query: dict) -> dict:
+        """Deletes every document that matches the query.
+
+        Args:
+            collection (str): The name of the collection.
+            query (dict): The query to find the data.
+
+        Returns:
+            dict: The deleted data.
+        """
+        return await self.request(
+            "DELETE",
+            f"{database}/{collection}/delete_many",
+            {
+                "query": query
+            }
+        )
+
+    async def bulk_write(self, database: str, collection: str, operations: List[dict], ordered: bool = True) -> dict:
+        """Runs a mixed batch of writes in a single request.
+
+        Args:
+            database (str): The name of the database.
+            collection (str): The name of the collection.
+            operations (List[dict]): The operations, see `AsterClient.bulk_write`.
+            ordered (bool, optional): Stop at the first failed operation. Defaults to True.
+
+        Returns:
+            dict: The result of the batch, failed operations are listed by index in `writeErrors`.
+        """
+        return await self.request(
+            "POST",
+            f"{database}/{collection}/bulk",
+            {
+                "operations": operations,
+                "ordered": ordered
+            }
+        )
+
+    async def create_blind_indexes(self, database: str, collection: str) -> List[str]:
+        """Creates the indexes that back the blind indexes the server has configured for a collection.
+
+        Args:
+            collection (str): The name of the collection.
+
+        Returns:
+            List[str]: The names of the created indexes.
+        """
+        return await self.request(
+            "POST",
+            f"{database}/{collection}/indexes",
+            {}
+        )
+
+    async def put_blob(self, database: str, collection: str, data: Any, blob_id: Optional[str] = None, chunk_size: int = CHUNK_SIZE) -> str:
+        """Uploads a value too large for a document, see `AsterClient.put_blob`.
+
+        The body is streamed chunk by chunk and the server encrypts and
+        stores the chunks as they arrive, so neither side holds the blob.
+        Uploads are never retried, as the data may not be readable twice.
+
+        Args:
+            database (str): The name of the database.
+            collection (str): The name of the collection.
+            data (Any): Bytes, a file object with `read`, or a sync or async iterable of bytes.
+            blob_id (str, optional): The ID of the blob, a new ObjectId string when None. Defaults to None.
+            chunk_size (int, optional): The size of the stored chunks in bytes. Defaults to CHUNK_SIZE.
+
+        Returns:
+            str: The ID of the blob.
+        """
+        params: dict = {"chunk_size": chunk_size}
+        if blob_id is not None:
+            params["blob_id"] = blob_id
+
+        with self.instrumentation.operation("put_blob", database = database, collection = collection) as operation:
+            async def body() -> AsyncIterator[Any]:
+                async for chunk in chunks(data, chunk_size):
+                    operation.size("request_bytes", len(chunk))
+                    yield chunk
+
+            with operation.phase("network"):
+                async with self._transfer(
+                    "POST",
+                    f"{database}/{collection}/put_blob",
+                    {},
+                    {"Content-Type": "application/octet-stream", "Accept": f"{self.content_type}, {wire.JSON};q=0.5"},
+                    params = params,
+                    data = body()
+                ) as response:
+                    content = await response.read()
+
+            with operation.phase("deserialize"):
+                return wire.loads(response.headers.get("Content-Type"), content)["result"]["id"]
+
+    async def open_blob(self, database: str, collection: str, blob_id: str) -> BlobReader:
+        """Opens a blob for reading.
+
+        The server decrypts the chunks as it sends them and the reader
+        hands out what has arrived, so the blob never has to fit in memory.
+
+        Args:
+            database (str): The name of the database.
+            collection (str): The name of the collection.
+            blob_id (str): The ID of the blob.
+
+        Returns:
+            BlobReader: The reader.
+        """
+        payload = {"id": blob_id}
+
+        async def download() -> AsyncIterator[Any]:
+            async with self._transfer(
+                "POST",
+                f"{database}/{collection}/open_blob",
+                payload,
+                {"Content-Type": self.content_type, "Accept": "application/octet-stream"},
+                data = wire.dumps(self.content_type, payload)
             ) as response:
-                if response.status == 200:
-                    return await response.json().get("result")
+                # The size comes first, so errors and a missing blob are raised by `open_blob` itself.
+                yield response.content_length
+                async for piece in response.content.iter_any():
+                    yield memoryview(piece)
 
-                raise RESPONSE_MAP.get(response.status, UnknownError(f"The server encountered an unknown error: HTTP {response.status}"))
\ No newline at end of file
+        source = download()
+        length = await source.__anext__()
+        return BlobReader(blob_id, length, source)
+
+    async def delete_blob(self, database: str, collection: str, blob_id: str) -> dict:
+        """Deletes a blob and its chunks.
+
+        Args:
+            database (str): The name of the database.
+            collection (str): The name of the collection.
+            blob_id (str): The ID of the blob.
+
+        Returns:
+            dict: The result, `deleted_count` is 0 when the blob did not exist.
+        """
+        return await self.request(
+            "DELETE",
+            f"{database}/{collection}/delete_blob",
+            {
+                "id": blob_id
+            }
+        )
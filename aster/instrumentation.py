@@ -0,0 +1,349 @@
+import math
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# `wait` is the time spent waiting for a call shared with other callers.
+PHASES = ("serialize", "encrypt", "network", "database", "decrypt", "deserialize", "wait")
+
+SUB_BUCKET_BITS = 7
+
+class Histogram:
+    def __init__(self):
+        """A latency histogram with HDR-style log-linear buckets.
+
+        Values are kept in microseconds, exact below 128 us and with 128
+        sub-buckets per power of two above, so every percentile is within
+        1% of the recorded value while memory grows with the range of the
+        values instead of their number.
+        """
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._buckets: Dict[Tuple[int, int], int] = {}
+
+    def record(self, seconds: float) -> None:
+        value = max(0, int(seconds * 1e6))
+        shift = max(0, value.bit_length() - SUB_BUCKET_BITS)
+        bucket = (shift, value >> shift)
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, fraction: float) -> float:
+        """Returns the value below which a fraction of the recorded values fall.
+
+        Args:
+            fraction (float): The fraction, e.g. 0.99 for p99.
+
+        Returns:
+            float: The value in seconds, 0.0 when nothing was recorded.
+        """
+        if not self.count:
+            return 0.0
+
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for (shift, value), count in sorted(self._buckets.items(), key = lambda item: item[0][1] << item[0][0]):
+            seen += count
+            if seen >= rank:
+                return ((value << shift) + (1 << shift) // 2) / 1e6
+
+        return self.max or 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        """Summarizes the histogram.
+
+        Returns:
+            Dict[str, float]: The count and the mean, p50, p90, p99 and max in seconds.
+        """
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.50),
+            "p90": self.percentile(0.90),
+            "p99": self.percentile(0.99),
+            "max": self.max or 0.0
+        }
+
+class Operation:
+    def __init__(self, instrumentation: "Instrumentation", name: str, attributes: Dict[str, Any]):
+        """The timings of one operation, split into phases.
+
+        Args:
+            instrumentation (Instrumentation): Where the operation is reported when it ends.
+            name (str): The name of the operation, e.g. `fetch`.
+            attributes (Dict[str, Any]): Context such as the database and the collection.
+        """
+        self.instrumentation = instrumentation
+        self.name = name
+        self.attributes = attributes
+        self.phases: Dict[str, float] = {}
+        self.sizes: Dict[str, int] = {}
+        self.spans: List[Tuple[str, float, float]] = []
+        self.error: Optional[BaseException] = None
+        self.started = 0.0
+        self.duration = 0.0
+        self.context: Any = None
+        self._token: Any = None
+
+    def __enter__(self) -> "Operation":
+        self._token = _current.set(self)
+        self.started = time.perf_counter()
+        self.instrumentation.start(self)
+        return self
+
+    def __exit__(self, error_type: Any, error: Any, traceback: Any) -> None:
+        self.duration = time.perf_counter() - self.started
+        self.error = error
+        _current.reset(self._token)
+        self.instrumentation.finish(self)
+
+    def phase(self, name: str) -> "Phase":
+        """Times a phase, phases that run several times add up.
+
+        Args:
+            name (str): The phase, one of `PHASES`.
+
+        Returns:
+            Phase: The context manager that times it.
+        """
+        return Phase(self, name)
+
+    def size(self, name: str, size: int) -> None:
+        """Adds to a payload size.
+
+        Args:
+            name (str): The payload, e.g. `request_bytes`.
+            size (int): The size in bytes.
+        """
+        self.sizes[name] = self.sizes.get(name, 0) + size
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+class Phase:
+    def __init__(self, operation: Operation, name: str):
+        self.operation = operation
+        self.name = name
+        self.started = 0.0
+
+    def __enter__(self) -> "Phase":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        ended = time.perf_counter()
+        operation = self.operation
+        operation.phases[self.name] = operation.phases.get(self.name, 0.0) + ended - self.started
+        operation.spans.append((self.name, self.started, ended))
+
+class _Nested:
+    # An operation started while another one runs reports into the outer one.
+    def __init__(self, operation: Operation):
+        self.operation = operation
+
+    def __enter__(self) -> Operation:
+        return self.operation
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+class _NullOperation:
+    # Shared by every operation while instrumentation is disabled, so it costs no timing calls.
+    name = ""
+    attributes: Dict[str, Any] = {}
+
+    def __enter__(self) -> "_NullOperation":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+    def phase(self, name: str) -> "_NullOperation":
+        return self
+
+    def size(self, name: str, size: int) -> None:
+        pass
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+NULL_OPERATION = _NullOperation()
+
+_current: "ContextVar[Optional[Operation]]" = ContextVar("aster_operation", default = None)
+
+async def detached(awaitable: Awaitable[T]) -> T:
+    """Runs an awaitable outside of the operation that is running.
+
+    A task copies the context it was started from, so a task that outlives
+    its caller, or serves several callers, would report its operations into
+    the caller's, possibly after it has finished. Wrap the coroutine of such
+    a task in this.
+
+    Args:
+        awaitable (Awaitable[T]): The coroutine the task runs.
+
+    Returns:
+        T: Its result.
+    """
+    # The task has its own copy of the context, so this does not touch the caller's.
+    _current.set(None)
+    return await awaitable
+
+class Instrumentation:
+    """Receives the timings of the client stack.
+
+    This base class is disabled and records nothing. Subclasses override
+    `start` and `finish`, which get every top-level Operation. An operation
+    that starts while another one runs in the same task, e.g. the request
+    HTTPClient sends for `Aster.get`, adds its phases and sizes to the
+    outer operation instead of being reported on its own. Tasks started
+    for single-flight calls, hedged requests and coalesced batches run
+    `detached`, so what they start never nests into an operation that may
+    have finished already.
+    """
+    enabled = False
+
+    def operation(self, name: str, **attributes: Any) -> Any:
+        """Starts timing an operation.
+
+        Args:
+            name (str): The name of the operation.
+            **attributes: Context such as the database and the collection.
+
+        Returns:
+            Operation: The context manager of the operation.
+        """
+        if not self.enabled:
+            return NULL_OPERATION
+
+        current = _current.get()
+        if current is not None:
+            return _Nested(current)
+
+        return Operation(self, name, attributes)
+
+    def start(self, operation: Operation) -> None:
+        pass
+
+    def finish(self, operation: Operation) -> None:
+        pass
+
+DISABLED = Instrumentation()
+
+class MetricsRecorder(Instrumentation):
+    enabled = True
+
+    def __init__(self):
+        """Keeps latency histograms per operation and per phase, and payload size totals."""
+        self.latency: Dict[str, Histogram] = {}
+        self.phases: Dict[Tuple[str, str], Histogram] = {}
+        self.sizes: Dict[Tuple[str, str], int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def finish(self, operation: Operation) -> None:
+        self.latency.setdefault(operation.name, Histogram()).record(operation.duration)
+        for phase, seconds in operation.phases.items():
+            self.phases.setdefault((operation.name, phase), Histogram()).record(seconds)
+
+        for name, size in operation.sizes.items():
+            self.sizes[(operation.name, name)] = self.sizes.get((operation.name, name), 0) + size
+
+        if operation.error is not None:
+            self.errors[operation.name] = self.errors.get(operation.name, 0) + 1
+
+    def export(self) -> Dict[str, dict]:
+        """Exports the recorded metrics.
+
+        Returns:
+            Dict[str, dict]: Per operation its latency summary, the summary of every phase, the payload
+                size totals and the number of errors.
+        """
+        return {
+            name: dict(
+                histogram.snapshot(),
+                phases = {phase: self.phases[(operation, phase)].snapshot() for operation, phase in self.phases if operation == name},
+                sizes = {size: total for (operation, size), total in self.sizes.items() if operation == name},
+                errors = self.errors.get(name, 0)
+            )
+            for name, histogram in self.latency.items()
+        }
+
+    def reset(self) -> None:
+        self.latency.clear()
+        self.phases.clear()
+        self.sizes.clear()
+        self.errors.clear()
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    enabled = True
+
+    def __init__(self, tracer: Optional[Any] = None):
+        """Reports every operation as an OpenTelemetry span with a child span per phase.
+
+        Needs the `opentelemetry-api` package.
+
+        Args:
+            tracer (Any, optional): The tracer, defaults to the tracer of the global tracer provider. Defaults to None.
+        """
+        from opentelemetry import trace # type: ignore
+
+        self.trace = trace
+        self.tracer = tracer or trace.get_tracer("aster.db")
+
+    def start(self, operation: Operation) -> None:
+        operation.context = self.tracer.start_span(f"aster.{operation.name}", start_time = time.time_ns())
+
+    def finish(self, operation: Operation) -> None:
+        span = operation.context
+        # Phases were timed with perf_counter, they are placed on the wall clock relative to the end.
+        offset = time.time_ns() - int(time.perf_counter() * 1e9)
+        parent = self.trace.set_span_in_context(span)
+        for name, started, ended in operation.spans:
+            child = self.tracer.start_span(f"aster.{name}", context = parent, start_time = offset + int(started * 1e9))
+            child.end(end_time = offset + int(ended * 1e9))
+
+        for key, value in operation.attributes.items():
+            if value is not None:
+                span.set_attribute(f"aster.{key}", value if isinstance(value, (str, bool, int, float)) else str(value))
+
+        for name, size in operation.sizes.items():
+            span.set_attribute(f"aster.{name}", size)
+
+        if operation.error is not None:
+            span.record_exception(operation.error)
+            span.set_status(self.trace.Status(self.trace.StatusCode.ERROR, str(operation.error)))
+
+        span.end()
+
+class CompositeInstrumentation(Instrumentation):
+    enabled = True
+
+    def __init__(self, *instrumentations: Instrumentation):
+        """Reports every operation to several instrumentations, e.g. metrics and tracing.
+
+        Args:
+            *instrumentations (Instrumentation): The instrumentations.
+        """
+        self.instrumentations = [instrumentation for instrumentation in instrumentations if instrumentation.enabled]
+
+    def start(self, operation: Operation) -> None:
+        contexts = []
+        for instrumentation in self.instrumentations:
+            operation.context = None
+            instrumentation.start(operation)
+            contexts.append(operation.context)
+
+        operation.context = contexts
+
+    def finish(self, operation: Operation) -> None:
+        contexts = operation.context
+        for instrumentation, context in zip(self.instrumentations, contexts):
+            operation.context = context
+            instrumentation.finish(operation)
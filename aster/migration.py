@@ -0,0 +1,359 @@
+from .blob import CHUNKS_COLLECTION, FILES_COLLECTION
+from .client import AsterClient
+from .codec import ENVELOPE_VERSIONS, KEYS_FIELD, MASTER_KEY_FIELD, VERSION_FIELD
+from .schema import storable
+
+from pymongo import ASCENDING, ReplaceOne, UpdateOne # type: ignore
+from bson import json_util # type: ignore
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+CHECKPOINT_COLLECTION = "_aster_migrations"
+
+async def list_collections(client: AsterClient, database: str, skipped: Tuple[str, ...]) -> List[str]:
+    """Lists the collections of a database a job goes through.
+
+    Args:
+        client (AsterClient): The client.
+        database (str): The name of the database.
+        skipped (Tuple[str, ...]): Suffixes such as `FILES_COLLECTION` of the blob collections to leave out.
+
+    Returns:
+        List[str]: The names, sorted.
+    """
+    suffixes = tuple(f".{suffix}" for suffix in skipped)
+    names = await client.mongo_client[database].list_collection_names()
+    return sorted(
+        name for name in names
+        if name != CHECKPOINT_COLLECTION and not name.startswith("system.") and not name.endswith(suffixes)
+    )
+
+class RateLimiter:
+    def __init__(self, rate: Optional[float]):
+        """Limits how many operations start per second.
+
+        Args:
+            rate (float, optional): Operations per second, None for no limit.
+        """
+        self.rate = rate
+        self._next = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, operations: int = 1) -> None:
+        """Waits until `operations` more operations fit into the rate.
+
+        Args:
+            operations (int, optional): The number of operations. Defaults to 1.
+        """
+        if not self.rate:
+            return
+
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + operations / self.rate
+            if start > now:
+                await asyncio.sleep(start - now)
+
+class MigrationStats:
+    def __init__(self, collection: str, migrated: int = 0):
+        """Progress of the migration of one collection.
+
+        Args:
+            collection (str): The name of the collection.
+            migrated (int, optional): Documents migrated by earlier runs. Defaults to 0.
+        """
+        self.collection = collection
+        self.migrated = migrated
+        self.resumed_from = migrated
+        self.started = time.monotonic()
+        self.done = False
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Documents per second migrated by this run.
+
+        Returns:
+            float: The throughput.
+        """
+        return (self.migrated - self.resumed_from) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self) -> str:
+        return f"<MigrationStats collection={self.collection!r} migrated={self.migrated} throughput={self.throughput:.1f}/s done={self.done}>"
+
+class Migration:
+    def __init__(
+        self,
+        client: AsterClient,
+        database: str,
+        collections: Optional[List[str]] = None,
+        batch_size: int = 1000,
+        workers: int = 4,
+        max_ops_per_second: Optional[float] = None,
+        on_progress: Optional[Callable[[MigrationStats], Any]] = None
+    ):
+        """Encrypts the plaintext documents of an existing database in place.
+
+        Every collection is streamed in `_id` order, batches are encrypted by
+        `workers` concurrent workers (on the crypto executor of the client)
+        and written back with one `bulk_write` each. After every batch the
+        highest `_id` below which everything is written is checkpointed to
+        `_aster_migrations`, so a crashed run resumes where it stopped, and a
+        finished one picks up the documents inserted after it. Documents that
+        are already encrypted are skipped, so running it again is safe, and
+        documents of the legacy RSA format are rewritten in the current one.
+
+        Values of a type fields cannot hold, such as dates and ObjectIds,
+        are stored as their extended JSON.
+
+        Args:
+            client (AsterClient): The client with the key to encrypt with.
+            database (str): The name of the database.
+            collections (List[str], optional): The collections, None for every collection but those of blobs. Defaults to None.
+            batch_size (int, optional): Documents per bulk write. Defaults to 1000.
+            workers (int, optional): Batches encrypted and written at the same time. Defaults to 4.
+            max_ops_per_second (float, optional): Documents written per second, None for no limit. Defaults to None.
+            on_progress (Callable[[MigrationStats], Any], optional): Called after every batch. Defaults to None.
+        """
+        self.client = client
+        self.database = database
+        self.collections = collections
+        self.batch_size = batch_size
+        self.workers = workers
+        self.limiter = RateLimiter(max_ops_per_second)
+        self.on_progress = on_progress
+        self.checkpoints = client.mongo_client[database][CHECKPOINT_COLLECTION]
+
+    async def run(self) -> Dict[str, MigrationStats]:
+        """Migrates every collection.
+
+        Returns:
+            Dict[str, MigrationStats]: The stats by collection.
+        """
+        collections = self.collections
+        if collections is None:
+            # Blobs are encrypted as they are stored, replacing their chunks would destroy them.
+            collections = await list_collections(self.client, self.database, (FILES_COLLECTION, CHUNKS_COLLECTION))
+
+        return {collection: await self.migrate(collection) for collection in collections}
+
+    async def migrate(self, collection: str) -> MigrationStats:
+        """Migrates one collection, resuming from its checkpoint.
+
+        Args:
+            collection (str): The name of the collection.
+
+        Returns:
+            MigrationStats: The stats of the collection.
+        """
+        checkpoint = await self.checkpoints.find_one({"_id": collection}) or {}
+        stats = MigrationStats(collection, checkpoint.get("migrated", 0))
+        # A finished collection is scanned again from its checkpoint, documents added since still need encrypting.
+        query: dict = {VERSION_FIELD: {"$exists": False}}
+        if "last_id" in checkpoint:
+            query["_id"] = {"$gt": checkpoint["last_id"]}
+
+        col = self.client.mongo_client[self.database][collection]
+        loop = asyncio.get_running_loop()
+        cursor = col.find(query, sort = [("_id", ASCENDING)], batch_size = self.batch_size)
+        queue: asyncio.Queue = asyncio.Queue(self.workers * 2)
+        completed: Dict[int, Any] = {}
+        state = {"committed": 0}
+        lock = asyncio.Lock()
+
+        async def commit(sequence: int, last_id: Any, written: int) -> None:
+            async with lock:
+                completed[sequence] = (last_id, written)
+                while state["committed"] + 1 in completed:
+                    state["committed"] += 1
+                    last, count = completed.pop(state["committed"])
+                    stats.migrated += count
+                    await self.checkpoints.update_one(
+                        {"_id": collection},
+                        {"$set": {"last_id": last, "migrated": stats.migrated}},
+                        upsert = True
+                    )
+
+            if self.on_progress is not None:
+                self.on_progress(stats)
+
+        async def worker() -> None:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+
+                sequence, batch = item
+                await self.limiter.acquire(len(batch))
+                plaintexts = await loop.run_in_executor(None, self._plaintexts, batch)
+                encrypted = await self.client.executor.encode_many(
+                    plaintexts,
+                    self.client.collection_options(self.database, collection)
+                )
+                await col.bulk_write([
+                    ReplaceOne({"_id": document["_id"], VERSION_FIELD: {"$exists": False}}, document)
+                    for document in encrypted
+                ], ordered = False)
+                await commit(sequence, batch[-1]["_id"], len(batch))
+
+        async def reader() -> None:
+            sequence = 0
+            while True:
+                batch = await cursor.to_list(self.batch_size)
+                if not batch:
+                    break
+
+                sequence += 1
+                await queue.put((sequence, batch))
+
+            for _ in range(self.workers):
+                await queue.put(None)
+
+        tasks = [asyncio.ensure_future(reader())] + [asyncio.ensure_future(worker()) for _ in range(self.workers)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+            await cursor.close()
+
+        await self.checkpoints.update_one({"_id": collection}, {"$set": {"done": True}}, upsert = True)
+        stats.done = True
+        return stats
+
+    def _plaintexts(self, batch: List[dict]) -> List[dict]:
+        # Legacy RSA documents have no version field either, they are decrypted and written in the current format.
+        codec = self.client.codec
+        return [
+            dict(codec.decode_legacy(document), _id = document["_id"]) if codec.is_legacy(document) else self.plaintext(document)
+            for document in batch
+        ]
+
+    @staticmethod
+    def plaintext(document: dict) -> dict:
+        return {
+            key: value if key == "_id" or storable(value) else json_util.dumps(value)
+            for key, value in document.items()
+        }
+
+class KeyRotation:
+    def __init__(
+        self,
+        client: AsterClient,
+        database: str,
+        collections: Optional[List[str]] = None,
+        batch_size: int = 1000,
+        max_ops_per_second: Optional[float] = None,
+        on_progress: Optional[Callable[[MigrationStats], Any]] = None
+    ):
+        """Moves the documents of a database to the active key after `AsterClient.rotate_key`.
+
+        Only the wrapped data keys of a document are rewritten, its fields are
+        not decrypted, and each data key costs one RSA operation no matter how
+        many documents share it. Every update is conditional on the wrapped
+        keys it replaces, so a document that a writer changed in the meantime
+        is left alone. The job holds no locks, reads and writes keep going
+        while it runs, and `max_ops_per_second` bounds the load it adds.
+        Running it again picks up whatever is still on an older key.
+
+        Args:
+            client (AsterClient): The client, after the new key was rotated in.
+            database (str): The name of the database.
+            collections (List[str], optional): The collections, None for every collection but blob chunks. Defaults to None.
+            batch_size (int, optional): Documents per bulk write. Defaults to 1000.
+            max_ops_per_second (float, optional): Documents written per second, None for no limit. Defaults to None.
+            on_progress (Callable[[MigrationStats], Any], optional): Called after every batch. Defaults to None.
+        """
+        self.client = client
+        self.database = database
+        self.collections = collections
+        self.batch_size = batch_size
+        self.limiter = RateLimiter(max_ops_per_second)
+        self.on_progress = on_progress
+
+    def start(self) -> "asyncio.Task[Dict[str, MigrationStats]]":
+        """Runs the rotation in the background.
+
+        Returns:
+            asyncio.Task: The task, its result are the stats by collection.
+        """
+        return asyncio.ensure_future(self.run())
+
+    async def run(self) -> Dict[str, MigrationStats]:
+        """Rotates every collection.
+
+        Returns:
+            Dict[str, MigrationStats]: The stats by collection.
+        """
+        collections = self.collections
+        if collections is None:
+            # Chunks hold no keys, the files of a blob carry its wrapped data key and are rotated like documents.
+            collections = await list_collections(self.client, self.database, (CHUNKS_COLLECTION,))
+
+        return {collection: await self.rotate(collection) for collection in collections}
+
+    def _updates(self, batch: List[dict]) -> List[UpdateOne]:
+        updates = []
+        for document in batch:
+            update = self.client.codec.rewrap(document)
+            if update is None:
+                continue
+
+            condition = {"_id": document["_id"]}
+            for field in update:
+                if field.startswith(KEYS_FIELD + "."):
+                    condition[field] = document[KEYS_FIELD][field[len(KEYS_FIELD) + 1:]]
+
+            updates.append(UpdateOne(condition, {"$set": update}))
+
+        return updates
+
+    async def rotate(self, collection: str) -> MigrationStats:
+        """Moves one collection to the active key.
+
+        Args:
+            collection (str): The name of the collection.
+
+        Returns:
+            MigrationStats: The stats of the collection.
+        """
+        stats = MigrationStats(collection)
+        col = self.client.mongo_client[self.database][collection]
+        loop = asyncio.get_running_loop()
+        last_id: Any = None
+        while True:
+            query: dict = {
+                VERSION_FIELD: {"$in": list(ENVELOPE_VERSIONS)},
+                MASTER_KEY_FIELD: {"$ne": self.client.codec.crypto.active_id}
+            }
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+
+            batch = await col.find(
+                query,
+                projection = {KEYS_FIELD: 1, MASTER_KEY_FIELD: 1},
+                sort = [("_id", ASCENDING)],
+                limit = self.batch_size
+            ).to_list(None)
+            if not batch:
+                break
+
+            last_id = batch[-1]["_id"]
+            updates = await loop.run_in_executor(None, self._updates, batch)
+            if updates:
+                await self.limiter.acquire(len(updates))
+                result = await col.bulk_write(updates, ordered = False)
+                stats.migrated += result.modified_count
+
+            if self.on_progress is not None:
+                self.on_progress(stats)
+
+        stats.done = True
+        return stats
@@ -1,4 +1,5 @@
-from typing import Optional
+from base64 import b64encode
+from typing import Optional, Union
 
 class DirectLink:
     def __init__(self, mongo_uri: str):
@@ -7,7 +8,7 @@ class DirectLink:
         Args:
             mongo_uri (str): The URI of the MongoDB server.
         """
-        if not mongo_uri.startswith("mongodb://") or not mongo_uri.startswith("mongodb+srv://"):
+        if not mongo_uri.startswith(("mongodb://", "mongodb+srv://")):
             raise ValueError("Invalid MONGO URI provided.")
 
         else:
@@ -29,4 +30,29 @@ class KeyFile:
         Returns:
             str: The key.
         """
-        return self.key
\ No newline at end of file
+        return self.key
+
+def load_key(private_key: Optional[Union[str, KeyFile]]) -> Optional[str]:
+    """Loads a key that is given either as a string or as a KeyFile.
+
+    Args:
+        private_key (str, KeyFile, optional): The key or the key file.
+
+    Returns:
+        str, optional: The key.
+    """
+    return private_key.load_key() if isinstance(private_key, KeyFile) else private_key
+
+def authorization(private_key: Optional[str]) -> str:
+    """Builds the Authorization header for a private key.
+
+    PEM keys span several lines, which HTTP headers cannot carry, so the key
+    is sent base64 encoded.
+
+    Args:
+        private_key (str, optional): The private key.
+
+    Returns:
+        str: The header value.
+    """
+    return "Key " + b64encode((private_key or "").encode()).decode()
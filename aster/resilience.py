@@ -0,0 +1,220 @@
+from .errors import TimeoutError
+
+import asyncio
+import bisect
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Deque, Dict, Iterator, List, Optional
+
+_deadline: "ContextVar[Optional[float]]" = ContextVar("aster_deadline", default = None)
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """Bounds every call made inside the block, across all clients.
+
+    The calls raise `TimeoutError` once `seconds` have passed since the
+    block was entered. Nested blocks keep the earlier deadline, and a
+    deadline is never extended by the default timeout of a client.
+
+        with deadline(0.25):
+            document = await db.get("shop", "orders", {"id": order_id})
+
+    Args:
+        seconds (float): The time the calls in the block may take together.
+    """
+    expires = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(expires if current is None else min(current, expires))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def expires(timeout: Optional[float] = None) -> Optional[float]:
+    """Returns when a call has to be done, by the enclosing `deadline` and a default timeout.
+
+    Args:
+        timeout (float, optional): The default timeout of the client, None for no default. Defaults to None.
+
+    Returns:
+        float, optional: The `time.monotonic` deadline, None when the call is unbounded.
+    """
+    current = _deadline.get()
+    if timeout is None:
+        return current
+
+    default = time.monotonic() + timeout
+    return default if current is None else min(current, default)
+
+def remaining(expires_at: Optional[float]) -> Optional[float]:
+    """Returns the seconds left until a deadline.
+
+    Args:
+        expires_at (float, optional): The deadline returned by `expires`.
+
+    Returns:
+        float, optional: The seconds left, None for no deadline.
+
+    Raises:
+        TimeoutError: The deadline has passed.
+    """
+    if expires_at is None:
+        return None
+
+    left = expires_at - time.monotonic()
+    if left <= 0:
+        raise TimeoutError("The deadline passed before the call finished.")
+
+    return left
+
+async def within(expires_at: Optional[float], awaitable: Awaitable[Any]) -> Any:
+    """Waits for an awaitable until a deadline.
+
+    Args:
+        expires_at (float, optional): The deadline returned by `expires`, None to wait forever.
+        awaitable (Awaitable[Any]): The awaitable, cancelled when the deadline passes.
+
+    Returns:
+        Any: The result of the awaitable.
+
+    Raises:
+        TimeoutError: The deadline passed first.
+    """
+    if expires_at is None:
+        return await awaitable
+
+    try:
+        left = remaining(expires_at)
+    except TimeoutError:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+
+        raise
+
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError as error:
+        raise TimeoutError("The deadline passed before the call finished.") from error
+
+class RetryBudget:
+    def __init__(self, ratio: float = 0.1, reserve: int = 10):
+        """Caps retries and hedged requests at a share of the regular requests.
+
+        Every request deposits `ratio` tokens and every extra request
+        withdraws one, so a struggling server gets at most `ratio` more load
+        instead of a retry storm. `reserve` tokens are there from the start
+        and are the most that can be saved up.
+
+        Args:
+            ratio (float, optional): Extra requests per request. Defaults to 0.1.
+            reserve (int, optional): The tokens to start with and the most that are kept. Defaults to 10.
+        """
+        self.ratio = ratio
+        self.reserve = reserve
+        self.balance = float(reserve)
+
+    def deposit(self) -> None:
+        self.balance = min(self.reserve, self.balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Takes a token for an extra request.
+
+        Returns:
+            bool: Whether the extra request may be sent.
+        """
+        if self.balance < 1:
+            return False
+
+        self.balance -= 1
+        return True
+
+class RetryPolicy:
+    def __init__(self, attempts: int = 3, base_delay: float = 0.05, max_delay: float = 1.0):
+        """How often and how soon idempotent calls are retried.
+
+        Retries wait with full jitter, a random time between zero and
+        `base_delay * 2 ** retry` capped at `max_delay`, so clients that
+        failed together do not come back together. A retry that would not
+        fit before the deadline is not made.
+
+        Args:
+            attempts (int, optional): The attempts per call, including the first. Defaults to 3.
+            base_delay (float, optional): Seconds the backoff starts from. Defaults to 0.05.
+            max_delay (float, optional): The longest backoff in seconds. Defaults to 1.0.
+        """
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, retry: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+class Hedging:
+    def __init__(self, quantile: float = 0.95, min_delay: float = 0.002, initial_delay: float = 0.05, window: int = 1000):
+        """When reads are sent a second time to another replica.
+
+        A read that has not been answered after the `quantile` latency of
+        the last `window` answers of its route is sent again to another
+        replica, and whichever answers first is used. Only the slowest
+        `1 - quantile` of reads are hedged, which is where the tail latency
+        comes from.
+
+        Args:
+            quantile (float, optional): The latency quantile after which a read is hedged. Defaults to 0.95.
+            min_delay (float, optional): The shortest wait in seconds before hedging. Defaults to 0.002.
+            initial_delay (float, optional): The wait in seconds until a route has latencies to go by. Defaults to 0.05.
+            window (int, optional): The number of recent latencies kept per route. Defaults to 1000.
+        """
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.initial_delay = initial_delay
+        self.window = window
+        self.hedged = 0
+        self.won = 0
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._sorted: Dict[str, List[float]] = {}
+        self._delays: Dict[str, float] = {}
+
+    def record(self, route: str, seconds: float) -> None:
+        """Records the latency of an answered read.
+
+        Args:
+            route (str): The route, e.g. `fetch`.
+            seconds (float): The latency.
+        """
+        latencies = self._latencies.get(route)
+        if latencies is None:
+            latencies = self._latencies[route] = deque()
+            self._sorted[route] = []
+
+        ordered = self._sorted[route]
+        if len(latencies) == self.window:
+            del ordered[bisect.bisect_left(ordered, latencies.popleft())]
+
+        latencies.append(seconds)
+        bisect.insort(ordered, seconds)
+        if len(ordered) >= 20:
+            self._delays[route] = max(self.min_delay, ordered[int(self.quantile * (len(ordered) - 1))])
+
+    def delay(self, route: str) -> float:
+        """Returns how long a read waits before it is hedged.
+
+        Args:
+            route (str): The route.
+
+        Returns:
+            float: The delay in seconds.
+        """
+        return self._delays.get(route, self.initial_delay)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """How many reads were hedged, how many of those the hedge answered first, and the delay per route.
+
+        Returns:
+            Dict[str, Any]: The counters.
+        """
+        return {"hedged": self.hedged, "won": self.won, "delays": dict(self._delays)}
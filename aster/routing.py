@@ -0,0 +1,215 @@
+import bisect
+import hashlib
+import time
+from typing import Dict, List, Optional, Sequence, Union
+
+class Node:
+    def __init__(self, url: str):
+        """One AsterDB Server and what the client has observed about it.
+
+        Args:
+            url (str): The URL of the server.
+        """
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.failures = 0
+        self.latency: Optional[float] = None
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self.requests = 0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def __repr__(self) -> str:
+        return f"<Node url={self.url!r} outstanding={self.outstanding} failures={self.failures} ejected={not self.healthy(time.monotonic())}>"
+
+class HashRing:
+    def __init__(self, members: Sequence[object], virtual_nodes: int = 64):
+        """A consistent hash ring, adding or removing a member only moves the keys next to it.
+
+        Args:
+            members (Sequence[object]): The members, hashed by their position and `repr`.
+            virtual_nodes (int, optional): Points per member on the ring, more spread keys more evenly. Defaults to 64.
+        """
+        self.members = list(members)
+        points = sorted(
+            (self.hash(f"{index}:{member!r}#{replica}"), index)
+            for index, member in enumerate(self.members)
+            for replica in range(virtual_nodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._indexes = [index for _, index in points]
+
+    @staticmethod
+    def hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def walk(self, key: str) -> List[object]:
+        """Returns every member in ring order, starting with the owner of a key.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            List[object]: The members, the owner first and the fallbacks after it.
+        """
+        start = bisect.bisect(self._hashes, self.hash(key))
+        order: List[object] = []
+        seen = set()
+        for offset in range(len(self._indexes)):
+            index = self._indexes[(start + offset) % len(self._indexes)]
+            if index not in seen:
+                seen.add(index)
+                order.append(self.members[index])
+                if len(order) == len(self.members):
+                    break
+
+        return order
+
+class Router:
+    def __init__(
+        self,
+        urls: Union[str, Sequence[Union[str, Sequence[str]]]],
+        max_failures: int = 3,
+        eject_for: float = 30.0,
+        slow_threshold: Optional[float] = None
+    ):
+        """Picks the AsterDB Server every request goes to.
+
+        `urls` is one URL, a list of interchangeable replicas, or a list of
+        shards that are each a list of replicas. The shard of a request is
+        chosen by consistent hashing on its database and collection. Within
+        the shard, writes go to the replica that owns the collection on the
+        hash ring, so a collection keeps being written through one server,
+        and reads go to the healthy replica with the fewest requests in flight.
+
+        Health is checked passively. A replica is ejected for `eject_for`
+        seconds after `max_failures` failed requests in a row, or when its
+        average latency exceeds `slow_threshold`. It gets traffic again once
+        that time has passed. When every replica of a shard is ejected they
+        are all used anyway, as a failing server beats none.
+
+        Args:
+            urls (str, Sequence[str, Sequence[str]]): The servers.
+            max_failures (int, optional): Consecutive failures that eject a replica. Defaults to 3.
+            eject_for (float, optional): Seconds an ejected replica gets no traffic. Defaults to 30.0.
+            slow_threshold (float, optional): Average latency in seconds that ejects a replica, None to never
+                eject for latency. Defaults to None.
+        """
+        if isinstance(urls, str):
+            urls = [urls]
+
+        if not urls:
+            raise ValueError("No server URL provided.")
+
+        groups = [urls] if all(isinstance(url, str) for url in urls) else [[url] if isinstance(url, str) else url for url in urls]
+        self.shards: List[List[Node]] = [[Node(url) for url in group] for group in groups]
+        self.nodes: List[Node] = [node for shard in self.shards for node in shard]
+        self.max_failures = max_failures
+        self.eject_for = eject_for
+        self.slow_threshold = slow_threshold
+        self._shard_ring = HashRing(range(len(self.shards)))
+        self._replica_rings = [HashRing([node.url for node in shard]) for shard in self.shards]
+
+    def _healthy(self, nodes: List[Node]) -> List[Node]:
+        now = time.monotonic()
+        return [node for node in nodes if node.healthy(now)] or nodes
+
+    def pick(self, key: str, read: bool) -> Node:
+        """Picks the replica for a request.
+
+        Args:
+            key (str): The routing key, `database/collection`.
+            read (bool): Whether the request only reads.
+
+        Returns:
+            Node: The replica.
+        """
+        index = self._shard_ring.walk(key)[0] if len(self.shards) > 1 else 0
+        shard = self.shards[index]
+        if len(shard) == 1:
+            return shard[0]
+
+        healthy = self._healthy(shard)
+        if read:
+            return min(healthy, key = lambda node: node.outstanding)
+
+        by_url = {node.url: node for node in healthy}
+        for url in self._replica_rings[index].walk(key):
+            if url in by_url:
+                return by_url[url]
+
+        return healthy[0]
+
+    def alternative(self, key: str, node: Node) -> Optional[Node]:
+        """Picks another replica of the same shard, for hedged and retried reads.
+
+        Args:
+            key (str): The routing key, `database/collection`.
+            node (Node): The replica to avoid.
+
+        Returns:
+            Node, optional: The healthy replica with the fewest requests in flight, None when there is no other.
+        """
+        index = self._shard_ring.walk(key)[0] if len(self.shards) > 1 else 0
+        now = time.monotonic()
+        others = [other for other in self.shards[index] if other is not node and other.healthy(now)]
+        return min(others, key = lambda other: other.outstanding) if others else None
+
+    def started(self, node: Node) -> float:
+        node.outstanding += 1
+        node.requests += 1
+        return time.monotonic()
+
+    def finished(self, node: Node, started: float, failed: bool) -> None:
+        """Records the outcome of a request and ejects the replica if it is failing or slow.
+
+        Args:
+            node (Node): The replica.
+            started (float): The value returned by `started`.
+            failed (bool): Whether the request failed because of the server or the connection.
+        """
+        node.outstanding -= 1
+        elapsed = time.monotonic() - started
+        node.latency = elapsed if node.latency is None else node.latency * 0.8 + elapsed * 0.2
+        node.failures = node.failures + 1 if failed else 0
+        slow = self.slow_threshold is not None and node.latency > self.slow_threshold
+        if node.failures >= self.max_failures or slow:
+            now = time.monotonic()
+            if node.healthy(now):
+                node.ejections += 1
+
+            node.ejected_until = now + self.eject_for
+            node.failures = 0
+            node.latency = None
+
+    def abandoned(self, node: Node) -> None:
+        """Releases a request that was cancelled before it finished, e.g. the loser of a hedged read.
+
+        Its elapsed time says nothing about the replica, so neither its
+        latency nor its failure count changes.
+
+        Args:
+            node (Node): The replica.
+        """
+        node.outstanding -= 1
+
+    @property
+    def stats(self) -> Dict[str, dict]:
+        """The health and load of every replica.
+
+        Returns:
+            Dict[str, dict]: The counters by URL.
+        """
+        now = time.monotonic()
+        return {
+            node.url: {
+                "requests": node.requests,
+                "outstanding": node.outstanding,
+                "latency": node.latency,
+                "ejections": node.ejections,
+                "healthy": node.healthy(now)
+            }
+            for node in self.nodes
+        }
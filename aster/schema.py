@@ -0,0 +1,306 @@
+import struct
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# The type of a value, stored in the header of every encrypted field so it is decrypted as what was written.
+STR = 0
+BYTES = 1
+INT = 2
+FLOAT = 3
+BOOL = 4
+NONE = 5
+LIST = 6
+DICT = 7
+
+_DOUBLE = struct.Struct(">d")
+_BOOLS = {True: b"\x01", False: b"\x00"}
+
+# Nested values are a tag byte and, unless their size is fixed, a varint length before the value.
+_FIXED = {FLOAT: 8, BOOL: 1, NONE: 0}
+
+_TAGS = {
+    str: STR,
+    bytes: BYTES,
+    bytearray: BYTES,
+    memoryview: BYTES,
+    int: INT,
+    float: FLOAT,
+    bool: BOOL,
+    type(None): NONE,
+    list: LIST,
+    tuple: LIST,
+    dict: DICT
+}
+
+_SUBCLASSES = (
+    (bool, BOOL),
+    (int, INT),
+    (float, FLOAT),
+    (str, STR),
+    ((bytes, bytearray, memoryview), BYTES),
+    (Mapping, DICT),
+    ((list, tuple), LIST)
+)
+
+_SCALARS = {
+    str: STR, "str": STR,
+    bytes: BYTES, "bytes": BYTES,
+    int: INT, "int": INT,
+    float: FLOAT, "float": FLOAT,
+    bool: BOOL, "bool": BOOL
+}
+
+_DYNAMIC = (dict, list, Any, "dict", "list", "any")
+
+def _varint(number: int) -> bytes:
+    encoded = bytearray()
+    while number >= 0x80:
+        encoded.append(number & 0x7F | 0x80)
+        number >>= 7
+
+    encoded.append(number)
+    return bytes(encoded)
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    number = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return number, offset
+
+        shift += 7
+
+def _tag(value: Any) -> int:
+    tag = _TAGS.get(type(value))
+    if tag is not None:
+        return tag
+
+    for types, tag in _SUBCLASSES:
+        if isinstance(value, types):
+            return tag
+
+    raise ValueError(f"Values of type {type(value).__name__} cannot be encrypted, use str, bytes, int, float, bool, None, list or dict.")
+
+def _frame(tag: int, body: bytes) -> bytes:
+    if tag in _FIXED:
+        return bytes((tag,)) + body
+
+    return bytes((tag,)) + _varint(len(body)) + body
+
+def _item(value: Any) -> bytes:
+    tag = _tag(value)
+    return _frame(tag, _BODIES[tag](value))
+
+def _list_body(values: Any) -> bytes:
+    return b"".join([_item(value) for value in values])
+
+def _dict_body(values: Any) -> bytes:
+    parts = []
+    for key, value in values.items():
+        raw_key = key.encode()
+        parts.append(_varint(len(raw_key)) + raw_key + _item(value))
+
+    return b"".join(parts)
+
+_BODIES: Dict[int, Callable[[Any], bytes]] = {
+    STR: lambda value: value.encode(),
+    BYTES: lambda value: bytes(memoryview(value)),
+    INT: lambda value: value.to_bytes((value.bit_length() + 8) // 8, "big", signed = True),
+    FLOAT: _DOUBLE.pack,
+    BOOL: _BOOLS.__getitem__,
+    NONE: lambda value: b"",
+    LIST: _list_body,
+    DICT: _dict_body
+}
+
+def _read_item(data: bytes, offset: int) -> Tuple[Any, int]:
+    tag = data[offset]
+    offset += 1
+    size = _FIXED.get(tag)
+    if size is None:
+        size, offset = _read_varint(data, offset)
+
+    end = offset + size
+    return unpack(tag, data[offset:end]), end
+
+def _unpack_list(data: bytes) -> list:
+    values = []
+    offset = 0
+    while offset < len(data):
+        value, offset = _read_item(data, offset)
+        values.append(value)
+
+    return values
+
+def _unpack_dict(data: bytes) -> dict:
+    values = {}
+    offset = 0
+    while offset < len(data):
+        size, offset = _read_varint(data, offset)
+        key = data[offset:offset + size].decode()
+        values[key], offset = _read_item(data, offset + size)
+
+    return values
+
+_UNPACKERS: Dict[int, Callable[[bytes], Any]] = {
+    STR: lambda data: data.decode(),
+    BYTES: bytes,
+    INT: lambda data: int.from_bytes(data, "big", signed = True),
+    FLOAT: lambda data: _DOUBLE.unpack(data)[0],
+    BOOL: lambda data: data == b"\x01",
+    NONE: lambda data: None,
+    LIST: _unpack_list,
+    DICT: _unpack_dict
+}
+
+def pack(value: Any) -> Tuple[int, bytes]:
+    """Encodes a value of any supported type in the binary layout fields are encrypted in.
+
+    Strings are their UTF-8 bytes and integers their shortest two's
+    complement, nested lists and dicts carry a tag byte per value.
+
+    Args:
+        value (Any): The value.
+
+    Returns:
+        Tuple[int, bytes]: The type tag and the encoded value.
+    """
+    tag = _tag(value)
+    return tag, _BODIES[tag](value)
+
+def unpack(tag: int, data: bytes) -> Any:
+    """Decodes a value encoded by `pack` or by a Schema.
+
+    Args:
+        tag (int): The type tag.
+        data (bytes): The encoded value.
+
+    Returns:
+        Any: The value.
+    """
+    unpacker = _UNPACKERS.get(tag)
+    if unpacker is None:
+        raise ValueError(f"Unknown value type: {tag}")
+
+    return unpacker(data)
+
+def storable(value: Any) -> bool:
+    """Returns whether a value, and everything nested in it, has a type fields can be encrypted with.
+
+    Args:
+        value (Any): The value.
+
+    Returns:
+        bool: Whether `pack` takes the value.
+    """
+    try:
+        tag = _tag(value)
+    except ValueError:
+        return False
+
+    if tag == LIST:
+        return all(storable(item) for item in value)
+
+    if tag == DICT:
+        return all(isinstance(key, str) and storable(item) for key, item in value.items())
+
+    return True
+
+def _compile(spec: Any) -> Tuple[Callable[[Any], Tuple[int, bytes]], Callable[[Any], bytes]]:
+    # Returns the encoder of a top-level value and the encoder of the same value nested in a list or dict.
+    if spec in _DYNAMIC:
+        return pack, _item
+
+    if isinstance(spec, (str, type)):
+        tag = _SCALARS.get(spec)
+        if tag is None:
+            raise ValueError(f"Invalid schema type: {spec!r}")
+
+        body = _BODIES[tag]
+        prefix = bytes((tag,))
+        if tag in _FIXED:
+            return lambda value: (tag, body(value)), lambda value: prefix + body(value)
+
+        def framed(value: Any) -> bytes:
+            encoded = body(value)
+            return prefix + _varint(len(encoded)) + encoded
+
+        return lambda value: (tag, body(value)), framed
+
+    if isinstance(spec, list) and len(spec) == 1:
+        _, item = _compile(spec[0])
+
+        def list_body(values: Any) -> bytes:
+            return b"".join([_item(value) if value is None else item(value) for value in values])
+
+        return lambda values: (LIST, list_body(values)), lambda values: _frame(LIST, list_body(values))
+
+    if isinstance(spec, dict):
+        fields = {
+            key: (_varint(len(key.encode())) + key.encode(), _compile(field)[1])
+            for key, field in spec.items()
+        }
+
+        def dict_body(values: Any) -> bytes:
+            parts = []
+            for key, value in values.items():
+                raw_key, item = fields[key]
+                parts.append(raw_key + (_item(value) if value is None else item(value)))
+
+            return b"".join(parts)
+
+        return lambda values: (DICT, dict_body(values)), lambda values: _frame(DICT, dict_body(values))
+
+    raise ValueError(f"Invalid schema type: {spec!r}")
+
+class Schema:
+    def __init__(self, fields: Dict[str, Any]):
+        """The types of the fields of a collection, compiled once into an encoder per field.
+
+        A type is `str`, `bytes`, `int`, `float`, `bool`, `dict` or `list`
+        (or their names, for JSON configs), a list with one type for a list
+        of that type, or a dict of types for a nested document with those
+        keys. Encoding a field calls its encoder straight away instead of
+        working out the type of every value, and a value that does not fit
+        raises ValueError instead of being stored as something else. None
+        is accepted for every field, and fields outside the schema are
+        encoded by their runtime type.
+
+        Args:
+            fields (Dict[str, Any]): The type of every field by name.
+        """
+        self.fields = dict(fields)
+        self._encoders = {name: _compile(spec)[0] for name, spec in self.fields.items()}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"fields": self.fields}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["fields"])
+
+    def __repr__(self) -> str:
+        return f"<Schema fields={self.fields!r}>"
+
+    def pack(self, name: str, value: Any) -> Tuple[int, bytes]:
+        """Encodes the value of a field.
+
+        Args:
+            name (str): The field name.
+            value (Any): The value.
+
+        Returns:
+            Tuple[int, bytes]: The type tag and the encoded value.
+        """
+        encoder = self._encoders.get(name)
+        if encoder is None or value is None:
+            return pack(value)
+
+        try:
+            return encoder(value)
+        except (AttributeError, KeyError, TypeError, ValueError, OverflowError, struct.error) as error:
+            raise ValueError(f"The value of '{name}' does not match its schema type {self.fields[name]!r}.") from error
+
+def as_schema(fields: Optional[Any]) -> Optional[Schema]:
+    return fields if fields is None or isinstance(fields, Schema) else Schema(fields)
@@ -0,0 +1,319 @@
+from .blob import CHUNK_SIZE
+from .client import AsterClient
+from .errors import (
+    BadRequestError,
+    DuplicateError,
+    NotFoundError,
+    PrivateKeyError,
+    TimeoutError
+)
+from . import wire
+from .objects import authorization
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Request # type: ignore
+from fastapi.responses import JSONResponse, Response, StreamingResponse # type: ignore
+from starlette.background import BackgroundTask # type: ignore
+from pymongo.errors import BulkWriteError, DuplicateKeyError # type: ignore
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult # type: ignore
+
+import hmac
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+CONFIG_ENVIRONMENT = "ASTER_CONFIG"
+
+ERROR_MAP = {
+    BadRequestError: 400,
+    ValueError: 400,
+    KeyError: 400,
+    PrivateKeyError: 401,
+    NotFoundError: 404,
+    DuplicateError: 409,
+    DuplicateKeyError: 409,
+    TimeoutError: 504
+}
+
+def load_config(path: Optional[str] = None) -> dict:
+    """Loads the config written by `aster.db.py install`.
+
+    Keys that are given as paths to key files are replaced with the keys.
+
+    Args:
+        path (str, optional): The path to the config, defaults to `$ASTER_CONFIG` or `./config.json`. Defaults to None.
+
+    Returns:
+        dict: The config.
+    """
+    with open(path or os.environ.get(CONFIG_ENVIRONMENT, "./config.json"), "r") as file:
+        config = json.load(file)
+
+    for field in ("private_key", "public_key"):
+        value = config.get(field)
+        if value and os.path.isfile(value):
+            with open(value, "r") as file:
+                config[field] = file.read()
+
+    for index, value in enumerate(config.get("previous_keys") or ()):
+        if os.path.isfile(value):
+            with open(value, "r") as file:
+                config["previous_keys"][index] = file.read()
+
+    return config
+
+def serialize(result: Any) -> Any:
+    """Turns Motor results into plain values, anything else is passed through as is.
+
+    The wire format encodes the documents, so bytes stay raw in binary formats.
+
+    Args:
+        result (Any): A document, a list of documents or a Motor result.
+
+    Returns:
+        Any: The value.
+    """
+    if isinstance(result, BulkWriteResult):
+        result = result.bulk_api_result
+
+    elif isinstance(result, InsertManyResult):
+        result = {"inserted_ids": result.inserted_ids}
+
+    elif isinstance(result, InsertOneResult):
+        result = {"inserted_id": result.inserted_id}
+
+    elif isinstance(result, UpdateResult):
+        result = {"matched_count": result.matched_count, "modified_count": result.modified_count}
+
+    elif isinstance(result, DeleteResult):
+        result = {"deleted_count": result.deleted_count}
+
+    return result
+
+def create_app(config: Optional[dict] = None, mongo_client: Optional[Any] = None) -> FastAPI:
+    """Creates the AsterDB Server.
+
+    Every worker process calls this once, so each worker owns exactly one
+    Motor connection pool that is shared by all of its requests.
+
+    Args:
+        config (dict, optional): The config, loaded with `load_config` when None. Defaults to None.
+        mongo_client (Any, optional): An existing Motor client, e.g. a stand-in for tests. Defaults to None.
+
+    Returns:
+        FastAPI: The application.
+    """
+    config = config or load_config()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        app.state.client = AsterClient(
+            config["mongo"],
+            config["private_key"],
+            per_document_keys = config.get("per_document_keys", False),
+            executor = config.get("executor", "inline"),
+            max_workers = config.get("max_workers"),
+            offload_threshold = config.get("offload_threshold", 256),
+            blind_indexes = config.get("blind_indexes"),
+            compression = config.get("compression"),
+            compression_threshold = config.get("compression_threshold", 1024),
+            mongo_client = mongo_client,
+            previous_keys = config.get("previous_keys"),
+            timeout = config.get("timeout"),
+            schemas = config.get("schemas")
+        )
+        try:
+            yield
+        finally:
+            await app.state.client.close()
+
+    app = FastAPI(title = "AsterDB", lifespan = lifespan)
+    app.state.client = None
+
+    for error, status in ERROR_MAP.items():
+        app.add_exception_handler(error, _error_handler(status))
+
+    expected = authorization(config["private_key"])
+
+    async def authorize(authorization: Optional[str] = Header(None)) -> AsterClient:
+        if authorization is None or not hmac.compare_digest(authorization, expected):
+            raise HTTPException(status_code = 401, detail = "The private key is invalid.")
+
+        return app.state.client
+
+    async def read(request: Request) -> dict:
+        return wire.loads(request.headers.get("Content-Type"), await request.body())
+
+    def respond(request: Request, result: Any) -> Response:
+        content_type = wire.negotiate(request.headers.get("Accept"))
+        return Response(wire.dumps(content_type, {"result": serialize(result)}), media_type = content_type)
+
+    @app.post("/create")
+    async def create_database(request: Request, client: AsterClient = Depends(authorize)):
+        payload = await read(request)
+        database = await client.create_database(payload["database"])
+        return respond(request, {"database": database.name})
+
+    @app.delete("/delete")
+    async def delete_database(request: Request, client: AsterClient = Depends(authorize)):
+        payload = await read(request)
+        return respond(request, await client.delete_database(payload["database"]))
+
+    @app.post("/{database}/create")
+    async def create_collection(database: str, request: Request, client: AsterClient = Depends(authorize)):
+        payload = await read(request)
+        collection = await client.create_collection(database, payload["collection"])
+        return respond(request, {"database": database, "collection": collection.name})
+
+    @app.post("/{database}/delete")
+    async def delete_collection(database: str, request: Request, client: AsterClient = Depends(authorize)):
+        payload = await read(request)
+        return respond(request, await client.delete_collection(database, payload["collection"]))
+
+    @app.post("/{database}/{collection}/fetch")
+    async def fetch(database: str, collection: str, request: Request, client: AsterClient = Depends(authorize)):
+        payload = await read(request)
+        return respond(request, await client.fetch(database, collection, payload["query"], projection = payload.get("projection")))
+
+    @app.post("/{database}/{collection}/fetch_many")
+    async def fetch_many(database: str, collection: str, request: Request, client: AsterClient = Depends(authorize)):
+        payload = await read(request)
+        return respond(request, await client.fetch_many(
+            database,
+            collection,
+            payload["query"],
+            payload.get("limit") or 0,
+            payload.get("skip") or 0,
+            payload.get("sort"),
+            payload.get("projection")
+        ))
+
+    @app.post("/{database}/{collection}/fetch_page")
+    async def fetch_page(database: str, collection: str, request: Request, client: AsterClient = Depends(authorize)):
+        payload = await read(request)
+        documents, token = await client.fetch_page(
+            database,
+            collection,
+            payload["query"],
+            payload.get("page_size") or 50,
+            payload.get("token"),
+            payload.get("projection")
+        )
+        return respond(request, {"documents": documents, "next": token})
+
+    @app.post("/{database}/{collection}/find")
+    async def find(database: str, collection: str, request: Request, client: AsterClient = Depends(authorize)):
+        payload = await read(request)
+        cursor = client.find(database, collection, payload["query"], payload.get("batch_size") or 100)
+
+        async def lines() -> AsyncIterator[bytes]:
+            async for document in cursor:
+                yield wire.dumps(wire.JSON, document) + b"\n"
+
+        return StreamingResponse(lines(), media_type = "application/x-ndjson")
+
+    @app.post("/{database}/{collection}/insert")
+    async def insert(database: str, collection: str, request: Request, client: AsterClient = Depends(authorize)):
+        payload = await read(request)
+        return respond(request, await client.insert(database, collection, payload["data"]))
+
+    @app.post("/{database}/{collection}/insert_many")
+    async def insert_many(database: str, collection: str, request: Request, client: AsterClient = Depends(authorize)):
+        payload = await read(request)
+        return respond(request, await client.insert_many(database, collection, payload["data"], payload.get("ordered", True)))
+
+    @app.patch("/{database}/{collection}/update")
+    async def update(database: str, collection: str, request: Request, client: AsterClient = Depends(authorize)):
+        payload = await read(request)
+        return respond(request, await client.update(database, collection, payload["query"], payload["data"]))
+
+    @app.patch("/{database}/{collection}/update_many")
+    async def update_many(database: str, collection: str, request: Request, client: AsterClient = Depends(authorize)):
+        payload = await read(request)
+        return respond(request, await client.update_many(database, collection, payload["query"], payload["data"]))
+
+    @app.delete("/{database}/{collection}/delete")
+    async def delete(database: str, collection: str, request: Request, client: AsterClient = Depends(authorize)):
+        payload = await read(request)
+        return respond(request, await client.delete(database, collection, payload["query"]))
+
+    @app.delete("/{database}/{collection}/delete_many")
+    async def delete_many(database: str, collection: str, request: Request, client: AsterClient = Depends(authorize)):
+        payload = await read(request)
+        return respond(request, await client.delete_many(database, collection, payload["query"]))
+
+    @app.post("/{database}/{collection}/bulk")
+    async def bulk_write(database: str, collection: str, request: Request, client: AsterClient = Depends(authorize)):
+        payload = await read(request)
+        try:
+            result = await client.bulk_write(database, collection, payload["operations"], payload.get("ordered", True))
+        except BulkWriteError as error:
+            # Failed operations are reported by index next to what succeeded, without echoing the ciphertext.
+            result = dict(error.details, writeErrors = [
+                {key: value for key, value in write_error.items() if key != "op"}
+                for write_error in error.details.get("writeErrors", [])
+            ])
+
+        return respond(request, result)
+
+    @app.post("/{database}/{collection}/indexes")
+    async def create_blind_indexes(database: str, collection: str, request: Request, client: AsterClient = Depends(authorize)):
+        return respond(request, await client.create_blind_indexes(database, collection))
+
+    @app.post("/{database}/{collection}/put_blob")
+    async def put_blob(
+        database: str,
+        collection: str,
+        request: Request,
+        blob_id: Optional[str] = None,
+        chunk_size: int = CHUNK_SIZE,
+        client: AsterClient = Depends(authorize)
+    ):
+        # The raw body is the blob, it is encrypted and stored while it is still arriving.
+        return respond(request, {"id": await client.put_blob(database, collection, request.stream(), blob_id, chunk_size)})
+
+    @app.post("/{database}/{collection}/open_blob")
+    async def open_blob(database: str, collection: str, request: Request, client: AsterClient = Depends(authorize)):
+        payload = await read(request)
+        blob = await client.open_blob(database, collection, payload["id"])
+        return StreamingResponse(
+            blob,
+            media_type = "application/octet-stream",
+            headers = {"Content-Length": str(blob.length)},
+            background = BackgroundTask(blob.close)
+        )
+
+    @app.delete("/{database}/{collection}/delete_blob")
+    async def delete_blob(database: str, collection: str, request: Request, client: AsterClient = Depends(authorize)):
+        payload = await read(request)
+        return respond(request, await client.delete_blob(database, collection, payload["id"]))
+
+    return app
+
+def _error_handler(status: int):
+    async def handler(request: Request, error: Exception) -> JSONResponse:
+        return JSONResponse({"error": str(error)}, status_code = status)
+
+    return handler
+
+def run(config_path: Optional[str] = None, workers: Optional[int] = None) -> None:
+    """Runs the AsterDB Server under uvicorn.
+
+    Args:
+        config_path (str, optional): The path to the config. Defaults to None.
+        workers (int, optional): The number of worker processes, defaults to `workers` in the config or 1. Defaults to None.
+    """
+    import uvicorn # type: ignore
+
+    if config_path is not None:
+        os.environ[CONFIG_ENVIRONMENT] = os.path.abspath(config_path)
+
+    config = load_config()
+    uvicorn.run(
+        "aster.server:create_app",
+        factory = True,
+        host = config.get("host", "127.0.0.1"),
+        port = int(config.get("port", 80)),
+        workers = workers or config.get("workers", 1),
+        log_level = config.get("log_level", "info")
+    )
@@ -0,0 +1,174 @@
+from datetime import datetime, timedelta, timezone
+import importlib
+import json
+from typing import Any, Dict
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+BSON = "application/bson"
+
+WIRE_FORMATS = {
+    "json": JSON,
+    "msgpack": MSGPACK,
+    "bson": BSON
+}
+
+# JSON uses MongoDB Extended JSON when bson is installed, so bytes, dates and ObjectIds survive the trip.
+PACKAGES = {
+    JSON: "bson.json_util",
+    MSGPACK: "msgpack",
+    BSON: "bson"
+}
+
+# MessagePack extension types, dates are milliseconds since the epoch like in BSON.
+EXT_OBJECT_ID = 1
+EXT_DATETIME = 2
+
+EPOCH = datetime(1970, 1, 1)
+
+_modules: Dict[str, Any] = {}
+
+def _module(content_type: str) -> Any:
+    """Imports the package of a content type on first use.
+
+    Args:
+        content_type (str): The content type.
+
+    Returns:
+        Any: The module, None if it is not installed.
+    """
+    if content_type not in _modules:
+        try:
+            _modules[content_type] = importlib.import_module(PACKAGES[content_type])
+        except ImportError:
+            _modules[content_type] = None
+
+    return _modules[content_type]
+
+def available(content_type: str) -> bool:
+    """Checks whether the package needed for a content type is installed.
+
+    Args:
+        content_type (str): The content type.
+
+    Returns:
+        bool: Whether bodies of that type can be encoded and decoded.
+    """
+    if content_type == MSGPACK:
+        return _module(MSGPACK) is not None
+
+    elif content_type == BSON:
+        return hasattr(_module(BSON), "encode")
+
+    return content_type == JSON
+
+def _tagged(value: Any) -> dict:
+    return {"$type": f"{type(value).__module__}.{type(value).__qualname__}", "$value": repr(value)}
+
+def canonical(payload: Any) -> str:
+    """Encodes a payload as a key, equal payloads share it whatever their key order.
+
+    Values of different types never share a key, an ObjectId and its hex
+    string or 1 and 1.0 differ. BSON types use canonical Extended JSON when
+    bson is installed, anything else JSON cannot carry is tagged with its type.
+
+    Args:
+        payload (Any): The payload, e.g. a query.
+
+    Returns:
+        str: The key.
+    """
+    json_util = _module(JSON)
+    if json_util is None:
+        return json.dumps(payload, sort_keys = True, default = _tagged)
+
+    return json_util.dumps(payload, json_options = json_util.CANONICAL_JSON_OPTIONS, sort_keys = True, default = _tagged)
+
+def negotiate(accept: str) -> str:
+    """Picks the first supported content type of an Accept header, JSON if there is none.
+
+    Args:
+        accept (str): The Accept header.
+
+    Returns:
+        str: The content type.
+    """
+    for content_type in (part.split(";")[0].strip() for part in (accept or "").split(",")):
+        if content_type in (MSGPACK, BSON) and available(content_type):
+            return content_type
+
+    return JSON
+
+def _pack(value: Any) -> Any:
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo = None)
+
+        milliseconds = (value - EPOCH) // timedelta(milliseconds = 1)
+        return _module(MSGPACK).ExtType(EXT_DATETIME, milliseconds.to_bytes(8, "big", signed = True))
+
+    json_util = _module(JSON)
+    if json_util is not None:
+        if isinstance(value, json_util.ObjectId):
+            return _module(MSGPACK).ExtType(EXT_OBJECT_ID, value.binary)
+
+        # Anything else BSON knows, e.g. Decimal128 or Timestamp, is sent as its Extended JSON.
+        return json.loads(json_util.dumps(value, json_options = json_util.RELAXED_JSON_OPTIONS))
+
+    raise TypeError(f"Object of type {type(value).__name__} cannot be encoded as MessagePack.")
+
+def _unpack(code: int, data: bytes) -> Any:
+    if code == EXT_DATETIME:
+        return EPOCH + timedelta(milliseconds = int.from_bytes(data, "big", signed = True))
+
+    elif code == EXT_OBJECT_ID:
+        json_util = _module(JSON)
+        return data.hex() if json_util is None else json_util.ObjectId(data)
+
+    return _module(MSGPACK).ExtType(code, data)
+
+def dumps(content_type: str, payload: Any) -> bytes:
+    """Encodes a body.
+
+    Binary formats carry `bytes` values as raw bytes. JSON carries them, and
+    dates and ObjectIds, as relaxed Extended JSON, which needs bson. Dates
+    come back as naive UTC datetimes in every format.
+
+    Args:
+        content_type (str): The content type.
+        payload (Any): The body, BSON needs a dict.
+
+    Returns:
+        bytes: The encoded body.
+    """
+    if content_type == MSGPACK:
+        return _module(MSGPACK).packb(payload, use_bin_type = True, default = _pack)
+
+    elif content_type == BSON:
+        return _module(BSON).encode(payload)
+
+    json_util = _module(JSON)
+    if json_util is None:
+        return json.dumps(payload).encode()
+
+    return json_util.dumps(payload, json_options = json_util.RELAXED_JSON_OPTIONS).encode()
+
+def loads(content_type: str, body: bytes) -> Any:
+    """Decodes a body, anything that is not a known binary format is read as JSON.
+
+    Args:
+        content_type (str): The content type, parameters such as the charset are ignored.
+        body (bytes): The encoded body.
+
+    Returns:
+        Any: The decoded body.
+    """
+    content_type = (content_type or JSON).split(";")[0].strip()
+    if content_type == MSGPACK:
+        return _module(MSGPACK).unpackb(body, raw = False, ext_hook = _unpack)
+
+    elif content_type == BSON:
+        return _module(BSON).decode(body)
+
+    json_util = _module(JSON)
+    return json.loads(body) if json_util is None else json_util.loads(body)
@@ -1,20 +1,116 @@
-from .client import AsterClient
-from .http import Requests
-from .objects import KeyFile, DirectLink
+from .blob import CHUNK_SIZE
+from .cache import DocumentCache, MISSING, SingleFlight
+from .coalesce import WriteBuffer
+from .instrumentation import DISABLED, Instrumentation
+from .objects import KeyFile, DirectLink, load_key
+from .resilience import expires, within
 
-from typing import Union, Optional
+import asyncio
+from typing import Any, Awaitable, AsyncIterator, Dict, List, Tuple, Union, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .blob import BlobReader
+    from .client import AsterClient
+    from .http import HTTPClient
+    from .migration import MigrationStats
 
 class Aster:
-    def __init__(self, url: Union[str, DirectLink], private_key: Optional[Union[str, KeyFile]] = None):
+    def __init__(
+        self,
+        url: Union[str, List[Union[str, List[str]]], DirectLink],
+        private_key: Optional[Union[str, KeyFile]] = None,
+        cache_size: int = 0,
+        cache_ttl: Optional[float] = 60.0,
+        write_buffer_delay: Optional[float] = None,
+        write_buffer_size: int = 100,
+        single_flight: bool = True,
+        instrumentation: Optional[Instrumentation] = None,
+        **options
+    ):
         """Initializes the Wrapper.
 
         Args:
-            url (str): The URL of the AsterDB Server.
+            url (str, List[str, List[str]], DirectLink): The URL of the AsterDB Server, the URLs of several
+                servers (see `HTTPClient`), or a DirectLink to MongoDB.
             private_key (str, KeyFile, optional): Private key that is used to encrypt and decrypt data. Defaults to None.
+            cache_size (int, optional): Number of `get` results kept in memory, 0 to disable the cache. Defaults to 0.
+            cache_ttl (float, optional): Seconds a cached result stays valid, None to never expire. Defaults to 60.0.
+            write_buffer_delay (float, optional): Seconds `insert` and `update` wait for other writes to the same
+                collection to share one bulk write, None to write each on its own. Defaults to None.
+            write_buffer_size (int, optional): The number of buffered writes that are flushed right away. Defaults to 100.
+            single_flight (bool, optional): Let concurrent identical `get` calls share one fetch and decryption. Defaults to True.
+            instrumentation (Instrumentation, optional): Receives the latency of every call split into phases,
+                e.g. a `MetricsRecorder` or an `OpenTelemetryInstrumentation`. Defaults to None.
+            **options: Options passed to the backend, e.g. the connection pool options of the HTTPClient
+                (`limit`, `limit_per_host`, `keepalive_timeout`, `ttl_dns_cache`), its `retry` and `hedging`,
+                `timeout` or `per_document_keys` of the AsterClient.
         """
         self.url = url
-        self.private_key = KeyFile().load_key(private_key)
-        self.client = Requests(self.url, self.private_key) if isinstance(url, str) else AsterClient(self.url, self.private_key)
+        self.private_key = load_key(private_key)
+        self.instrumentation = instrumentation or DISABLED
+        options["instrumentation"] = self.instrumentation
+        self.client: Union["HTTPClient", "AsterClient"]
+        if not isinstance(url, DirectLink):
+            from .http import HTTPClient
+            self.client = HTTPClient(self.url, self.private_key, **options)
+
+        else:
+            from .client import AsterClient
+            self.client = AsterClient(self.url, self.private_key, **options)
+
+        self.cache: Optional[DocumentCache] = DocumentCache(cache_size, cache_ttl) if cache_size > 0 else None
+        self.write_buffer: Optional[WriteBuffer] = WriteBuffer(
+            self.client,
+            write_buffer_delay,
+            write_buffer_size
+        ) if write_buffer_delay is not None else None
+        self.single_flight: Optional[SingleFlight] = SingleFlight() if single_flight else None
+
+    @property
+    def cache_stats(self) -> Dict[str, int]:
+        """The hit, miss and eviction counters of the cache.
+
+        Returns:
+            Dict[str, int]: The counters, empty when the cache is disabled.
+        """
+        return self.cache.stats if self.cache is not None else {}
+
+    @property
+    def single_flight_stats(self) -> Dict[str, int]:
+        """How many `get` calls were served by another call that was already running.
+
+        Returns:
+            Dict[str, int]: The counters, empty when single-flight is disabled.
+        """
+        return self.single_flight.stats if self.single_flight is not None else {}
+
+    async def _write(self, database: Optional[str], collection: Optional[str], write: Awaitable) -> Any:
+        try:
+            return await write
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate(database, collection)
+
+            if self.single_flight is not None:
+                self.single_flight.forget(database, collection)
+
+    async def close(self) -> None:
+        """Writes buffered writes and closes the underlying connections."""
+        if self.write_buffer is not None:
+            await self.write_buffer.flush()
+
+        await self.client.close()
+
+    async def flush(self) -> None:
+        """Writes every buffered write now."""
+        if self.write_buffer is not None:
+            await self.write_buffer.flush()
+
+    async def __aenter__(self) -> "Aster":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
 
     def set_key(self, private_key: Union[str, KeyFile]) -> Union[str, KeyFile]:
         """Sets the private key.
@@ -22,9 +118,47 @@ class Aster:
         Args:
             private_key (str, key): The private key.
         """
-        self.private_key = KeyFile().load_key(private_key)
+        self.private_key = load_key(private_key)
+        self.client.set_key(self.private_key)
+        if self.cache is not None:
+            self.cache.clear()
         return self.private_key
 
+    def rotate_key(self, private_key: Union[str, KeyFile]) -> Union[str, KeyFile]:
+        """Makes a new private key the active key, data written with the previous keys stays readable.
+
+        Args:
+            private_key (str, KeyFile): The new private key.
+        """
+        if not isinstance(self.url, DirectLink):
+            raise ValueError("Keys of an AsterDB Server are rotated in its config.")
+
+        self.private_key = load_key(private_key)
+        self.client.rotate_key(self.private_key)
+        return self.private_key
+
+    def reencrypt(
+        self,
+        database: str,
+        collections: Optional[List[str]] = None,
+        max_ops_per_second: Optional[float] = None
+    ) -> "asyncio.Task[Dict[str, MigrationStats]]":
+        """Starts moving the documents of a database to the active key in the background.
+
+        Args:
+            database (str): The name of the database.
+            collections (List[str], optional): The collections, None for every collection. Defaults to None.
+            max_ops_per_second (float, optional): Documents rewritten per second, None for no limit. Defaults to None.
+
+        Returns:
+            asyncio.Task: The task, its result are the stats by collection.
+        """
+        if not isinstance(self.url, DirectLink):
+            raise ValueError("Keys of an AsterDB Server are rotated in its config.")
+
+        from .migration import KeyRotation
+        return KeyRotation(self.client, database, collections, max_ops_per_second = max_ops_per_second).start()
+
     def set_database(self, database: str) -> str:
         """Sets the database.
 
@@ -53,7 +187,28 @@ class Aster:
         Returns:
             dict: The query result.
         """
-        return await self.client.fetch(database, collection, query)
+        with self.instrumentation.operation("get", database = database, collection = collection) as operation:
+            key = DocumentCache.key(database, collection, query)
+            if self.cache is not None:
+                result = self.cache.get(key)
+                operation.set(cache_hit = result is not MISSING)
+                if result is not MISSING:
+                    return result
+
+            async def fetch() -> dict:
+                generation = self.cache.generation if self.cache is not None else 0
+                result = await self.client.fetch(database, collection, query)
+                if self.cache is not None:
+                    self.cache.set(key, result, generation)
+
+                return result
+
+            if self.single_flight is None:
+                return await fetch()
+
+            # The shared fetch is not cut short by the deadline of whoever started it, every caller waits until its own.
+            with operation.phase("wait"):
+                return await within(expires(), self.single_flight.run(key, fetch))
 
     async def insert(self, database: Optional[str], collection: Optional[str], data: dict) -> dict:
         """Inserts data into a collection.
@@ -66,7 +221,11 @@ class Aster:
         Returns:
             dict: The inserted data.
         """
-        return await self.client.insert(database, collection, data)
+        if self.write_buffer is not None:
+            operation = {"op": "insert_one", "data": data}
+            return await self._write(database, collection, self.write_buffer.submit(database, collection, operation))
+
+        return await self._write(database, collection, self.client.insert(database, collection, data))
 
     async def update(self, database: Optional[str], collection: Optional[str], query: dict, data: dict) -> dict:
         """Updates data in a collection.
@@ -78,9 +237,14 @@ class Aster:
             data (dict): The data that should be updated.
 
         Returns:
-            dict: The updated data.
+            dict: The updated data, with the write buffer only whether it was acknowledged since bulk writes
+                do not count matches per operation.
         """
-        return await self.client.update(database, collection, query, data)
+        if self.write_buffer is not None and "$inc" not in data:
+            operation = {"op": "update_one", "query": query, "data": data}
+            return await self._write(database, collection, self.write_buffer.submit(database, collection, operation))
+
+        return await self._write(database, collection, self.client.update(database, collection, query, data))
 
     async def delete(self, database: Optional[str], collection: Optional[str], query: dict) -> dict:
         """Deletes data in a collection.
@@ -93,7 +257,224 @@ class Aster:
         Returns:
             dict: The deleted data.
         """
-        return await self.client.delete(database, collection, query)
+        return await self._write(database, collection, self.client.delete(database, collection, query))
+
+    async def fetch_many(
+        self,
+        database: Optional[str],
+        collection: Optional[str],
+        query: dict,
+        limit: int = 0,
+        skip: int = 0,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        projection: Optional[List[str]] = None
+    ) -> List[dict]:
+        """Gets every document that matches the query.
+
+        Limit, skip, sort and projection are applied by MongoDB, so only the
+        requested documents and fields are transferred and decrypted.
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+            query (dict): The query that should be used to find the data.
+            limit (int, optional): The maximum number of documents, 0 for no limit. Defaults to 0.
+            skip (int, optional): The number of documents to skip. Defaults to 0.
+            sort (List[Tuple[str, int]], optional): Field and direction pairs. Defaults to None.
+            projection (List[str], optional): The fields to return, None for all fields. Defaults to None.
+
+        Returns:
+            List[dict]: The query result.
+        """
+        return await self.client.fetch_many(database, collection, query, limit, skip, sort, projection)
+
+    async def fetch_page(
+        self,
+        database: Optional[str],
+        collection: Optional[str],
+        query: dict,
+        page_size: int = 50,
+        token: Optional[str] = None,
+        projection: Optional[List[str]] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Gets one page of documents.
+
+        Example:
+            documents, token = await aster.fetch_page("database", "collection", {})
+            while token is not None:
+                documents, token = await aster.fetch_page("database", "collection", {}, token = token)
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+            query (dict): The query that should be used to find the data.
+            page_size (int, optional): The number of documents per page. Defaults to 50.
+            token (str, optional): The token returned with the previous page, None for the first page. Defaults to None.
+            projection (List[str], optional): The fields to return, None for all fields. Defaults to None.
+
+        Returns:
+            Tuple[List[dict], Optional[str]]: The documents and the token of the next page, None on the last page.
+        """
+        return await self.client.fetch_page(database, collection, query, page_size, token, projection)
+
+    def find(self, database: Optional[str], collection: Optional[str], query: dict, batch_size: int = 100) -> AsyncIterator[dict]:
+        """Streams every document that matches the query.
+
+        Documents are fetched and decrypted `batch_size` at a time, so memory
+        stays flat no matter how large the result is.
+
+        Example:
+            async for document in aster.find("database", "collection", {}):
+                ...
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+            query (dict): The query that should be used to find the data.
+            batch_size (int, optional): The number of documents per batch. Defaults to 100.
+
+        Returns:
+            AsyncIterator[dict]: The documents.
+        """
+        return self.client.find(database, collection, query, batch_size)
+
+    async def insert_many(self, database: Optional[str], collection: Optional[str], data: List[dict], ordered: bool = True) -> dict:
+        """Inserts a batch of documents in one bulk operation.
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+            data (List[dict]): The documents that should be inserted.
+            ordered (bool, optional): Stop at the first failed insert. Defaults to True.
+
+        Returns:
+            dict: The inserted data.
+        """
+        return await self._write(database, collection, self.client.insert_many(database, collection, data, ordered))
+
+    async def update_many(self, database: Optional[str], collection: Optional[str], query: dict, data: dict) -> dict:
+        """Updates every document that matches the query.
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+            query (dict): The query that should be used to find the data.
+            data (dict): The data that should be updated.
+
+        Returns:
+            dict: The updated data.
+        """
+        return await self._write(database, collection, self.client.update_many(database, collection, query, data))
+
+    async def delete_many(self, database: Optional[str], collection: Optional[str], query: dict) -> dict:
+        """Deletes every document that matches the query.
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+            query (dict): The query that should be used to find the data.
+
+        Returns:
+            dict: The deleted data.
+        """
+        return await self._write(database, collection, self.client.delete_many(database, collection, query))
+
+    async def bulk_write(self, database: Optional[str], collection: Optional[str], operations: List[dict], ordered: bool = True) -> dict:
+        """Runs a mixed batch of writes in one bulk operation.
+
+        Every operation is a dict with an `op` of `insert_one`, `update_one`,
+        `update_many`, `delete_one` or `delete_many` and the `data` and/or
+        `query` that operation takes.
+
+        Args:
+            database (str, optional): The name of the database.
+            collection (str, optional): The name of the collection.
+            operations (List[dict]): The operations.
+            ordered (bool, optional): Stop at the first failed operation. Defaults to True.
+
+        Returns:
+            dict: The result of the batch.
+        """
+        return await self._write(database, collection, self.client.bulk_write(database, collection, operations, ordered))
+
+    async def put_blob(
+        self,
+        database: str,
+        collection: str,
+        data: Any,
+        blob_id: Optional[str] = None,
+        chunk_size: int = CHUNK_SIZE
+    ) -> str:
+        """Stores a value too large for a document, such as a file.
+
+        The data is split into chunks that are encrypted and stored one at a
+        time in `<collection>.chunks`, GridFS-style, so neither the client
+        nor the server holds the whole value.
+
+        Example:
+            with open("video.mp4", "rb") as file:
+                blob_id = await aster.put_blob("media", "videos", file)
+
+        Args:
+            database (str): The name of the database.
+            collection (str): The name of the collection.
+            data (Any): Bytes, a file object with `read`, or a sync or async iterable of bytes.
+            blob_id (str, optional): The ID of the blob, a new ObjectId string when None. Defaults to None.
+            chunk_size (int, optional): The size of the chunks in bytes. Defaults to CHUNK_SIZE.
+
+        Returns:
+            str: The ID of the blob.
+        """
+        return await self.client.put_blob(database, collection, data, blob_id, chunk_size)
+
+    async def open_blob(self, database: str, collection: str, blob_id: str) -> "BlobReader":
+        """Opens a blob stored with `put_blob`.
+
+        The chunks are decrypted as they are read, iterating the reader
+        yields them as memoryviews.
+
+        Example:
+            async with await aster.open_blob("media", "videos", blob_id) as blob:
+                async for chunk in blob:
+                    file.write(chunk)
+
+        Args:
+            database (str): The name of the database.
+            collection (str): The name of the collection.
+            blob_id (str): The ID of the blob.
+
+        Returns:
+            BlobReader: The reader, with the size of the blob in `length`.
+        """
+        return await self.client.open_blob(database, collection, blob_id)
+
+    async def delete_blob(self, database: str, collection: str, blob_id: str) -> dict:
+        """Deletes a blob.
+
+        Args:
+            database (str): The name of the database.
+            collection (str): The name of the collection.
+            blob_id (str): The ID of the blob.
+
+        Returns:
+            dict: The deleted data.
+        """
+        return await self.client.delete_blob(database, collection, blob_id)
+
+    async def create_blind_indexes(self, database: str, collection: str) -> List[str]:
+        """Creates the MongoDB indexes for the blind indexed fields of a collection.
+
+        Blind indexes are enabled per field with the `blind_indexes` option,
+        equality queries on those fields are then answered from an index.
+
+        Args:
+            database (str): The name of the database.
+            collection (str): The name of the collection.
+
+        Returns:
+            List[str]: The names of the created indexes.
+        """
+        return await self.client.create_blind_indexes(database, collection)
 
     async def create_database(self, database: str) -> dict:
         """Creates a database.
@@ -118,7 +499,7 @@ class Aster:
         Args:
             database (str): The name of the database.
         """
-        return await self.client.delete_database(database)
+        return await self._write(database, None, self.client.delete_database(database))
 
     async def delete_collection(self, database: str, collection: str) -> dict:
         """Deletes a collection.
@@ -127,4 +508,4 @@ class Aster:
             database (str): The name of the database.
             collection (str): The name of the collection.
         """
-        return await self.client.delete_collection(database, collection)
\ No newline at end of file
+        return await self._write(database, collection, self.client.delete_collection(database, collection))
\ No newline at end of file
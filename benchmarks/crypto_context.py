@@ -0,0 +1,45 @@
+"""Per-call crypto setup overhead with and without a cached RSAContext.
+
+Compares parsing the PEM key and building a cipher on every call (the old
+`AsterClient` behaviour) with reusing a context parsed once.
+
+    $ python benchmarks/crypto_context.py --calls 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+from Crypto.PublicKey import RSA # type: ignore
+from Crypto.Cipher import PKCS1_v1_5 # type: ignore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aster.encryption import RSAContext # noqa: E402
+
+def per_call(private_key: str, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        PKCS1_v1_5.new(RSA.importKey(private_key))
+    return (time.perf_counter() - start) / calls
+
+def cached(private_key: str, calls: int) -> float:
+    context = RSAContext(private_key)
+    start = time.perf_counter()
+    for _ in range(calls):
+        context.cipher
+    return (time.perf_counter() - start) / calls
+
+def main(args: argparse.Namespace) -> None:
+    private_key = RSA.generate(args.bits).export_key().decode()
+    before = per_call(private_key, args.calls)
+    after = cached(private_key, args.calls)
+
+    print(f"RSA-{args.bits} setup per call, importKey + new: {before * 1e6:10.2f} us")
+    print(f"RSA-{args.bits} setup per call, RSAContext:      {after * 1e6:10.2f} us")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--bits", type = int, default = 2048)
+    parser.add_argument("--calls", type = int, default = 2000)
+    main(parser.parse_args())
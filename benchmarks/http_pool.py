@@ -0,0 +1,69 @@
+"""Requests/sec of the pooled HTTPClient against a session-per-request client.
+
+Starts a local aiohttp stand-in for the AsterDB Server and fires the same
+number of `fetch` calls through both clients.
+
+    $ python benchmarks/http_pool.py --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import aiohttp # type: ignore
+from aiohttp import web # type: ignore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aster.http import HTTPClient # noqa: E402
+
+async def handle_fetch(request: web.Request) -> web.Response:
+    await request.json()
+    return web.json_response({"result": [{"name": "aster"}]})
+
+async def start_server(host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_post("/{database}/{collection}/fetch", handle_fetch)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+async def unpooled_fetch(url: str) -> None:
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{url}/db/col/fetch", json = {"query": {}}) as response:
+            await response.json()
+
+async def run(call, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await call()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - start)
+
+async def main(args: argparse.Namespace) -> None:
+    runner = await start_server(args.host, args.port)
+    url = f"http://{args.host}:{args.port}"
+    try:
+        before = await run(lambda: unpooled_fetch(url), args.requests, args.concurrency)
+        async with HTTPClient(url, "key", limit = args.concurrency) as client:
+            after = await run(lambda: client.fetch("db", "col", {}), args.requests, args.concurrency)
+    finally:
+        await runner.cleanup()
+
+    print(f"session per request: {before:10.1f} req/s")
+    print(f"pooled HTTPClient:   {after:10.1f} req/s")
+    print(f"speedup:             {after / before:10.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 8765)
+    parser.add_argument("--requests", type = int, default = 2000)
+    parser.add_argument("--concurrency", type = int, default = 50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,81 @@
+"""Import time of `aster` and of each backend, with an enforced budget.
+
+Every statement runs in a fresh interpreter so nothing is cached between
+samples. `import aster` must stay within `--budget` milliseconds and must
+not load any of the heavy backend packages, the script exits with status 1
+when it does, so it can gate CI and release jobs.
+
+    $ python benchmarks/import_time.py --runs 10 --budget 50
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("aiohttp", "motor", "pymongo", "bson", "Crypto", "cryptography", "fastapi", "msgpack", "zstandard")
+
+STATEMENTS = (
+    "import aster",
+    "from aster import HTTPClient",
+    "from aster.client import AsterClient",
+    "from aster.server import create_app"
+)
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+exec({statement!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+def measure(statement: str, runs: int) -> Tuple[float, List[str]]:
+    samples: List[float] = []
+    loaded: List[str] = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(statement = statement, heavy = HEAVY_MODULES)],
+            cwd = ROOT,
+            check = True,
+            capture_output = True,
+            text = True
+        ).stdout
+        result = json.loads(output)
+        samples.append(result["elapsed"])
+        loaded = result["loaded"]
+
+    return statistics.median(samples), loaded
+
+def main(args: argparse.Namespace) -> int:
+    failures: List[str] = []
+    print(f"{'statement':40} {'median ms':>10}  heavy modules loaded")
+    for statement in STATEMENTS:
+        try:
+            elapsed, loaded = measure(statement, args.runs)
+        except subprocess.CalledProcessError:
+            print(f"{statement:40} {'not installed':>10}")
+            continue
+
+        print(f"{statement:40} {elapsed * 1000:10.2f}  {', '.join(loaded) or '-'}")
+        if statement == "import aster":
+            if elapsed * 1000 > args.budget:
+                failures.append(f"`import aster` took {elapsed * 1000:.2f} ms, the budget is {args.budget:.2f} ms.")
+
+            if loaded:
+                failures.append(f"`import aster` loaded {', '.join(loaded)}.")
+
+    for failure in failures:
+        print(failure, file = sys.stderr)
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--runs", type = int, default = 10)
+    parser.add_argument("--budget", type = float, default = 50.0, help = "milliseconds allowed for `import aster`")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+"""Routing of HTTPClient across several AsterDB Servers.
+
+Starts `--nodes` in-process servers on consecutive ports that share one
+in-memory MongoDB stand-in (`mongomock-motor`), sends a mixed read/write
+load through one HTTPClient and stops one server halfway through, so the
+output shows how requests were spread and that the stopped server was
+ejected while the others kept serving.
+
+    $ python benchmarks/multi_node.py --nodes 3 --requests 3000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List
+
+import aiohttp # type: ignore
+from Crypto.PublicKey import RSA # type: ignore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aster.errors import NotFoundError, ServerError, UnknownError # noqa: E402
+from aster.http import HTTPClient # noqa: E402
+
+async def start_nodes(args: argparse.Namespace, private_key: str) -> List:
+    import uvicorn # type: ignore
+    from mongomock_motor import AsyncMongoMockClient # type: ignore
+    from aster.server import create_app
+
+    mongo_client = AsyncMongoMockClient()
+    servers = []
+    for index in range(args.nodes):
+        config = {
+            "mongo": "mongodb://127.0.0.1:27017",
+            "private_key": private_key,
+            "blind_indexes": {f"bench.load{shard}": ["user"] for shard in range(args.collections)}
+        }
+        app = create_app(config, mongo_client = mongo_client)
+        server = uvicorn.Server(uvicorn.Config(app, host = args.host, port = args.port + index, log_level = "warning"))
+        servers.append((server, asyncio.ensure_future(server.serve())))
+
+    while not all(server.started for server, _ in servers):
+        await asyncio.sleep(0.05)
+
+    return servers
+
+async def main(args: argparse.Namespace) -> None:
+    private_key = RSA.generate(2048).export_key().decode()
+    servers = await start_nodes(args, private_key)
+    urls = [f"http://{args.host}:{args.port + index}" for index in range(args.nodes)]
+    errors = 0
+    try:
+        async with HTTPClient(urls, private_key, limit = args.concurrency, max_failures = 2, eject_for = 60.0) as client:
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def one(index: int) -> None:
+                nonlocal errors
+                async with semaphore:
+                    if index == args.requests // 2:
+                        servers[-1][0].should_exit = True
+
+                    collection = f"load{index % args.collections}"
+                    try:
+                        if index % 4 == 0:
+                            await client.insert("bench", collection, {"user": str(index)})
+                        else:
+                            await client.fetch("bench", collection, {"user": str(index - index % 4)})
+                    except NotFoundError:
+                        # The insert it reads may still be in flight, a miss is a valid answer.
+                        pass
+                    except (ServerError, UnknownError, aiohttp.ClientError, asyncio.TimeoutError):
+                        errors += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(index) for index in range(args.requests)))
+            elapsed = time.perf_counter() - start
+            stats = client.router.stats
+    finally:
+        for server, task in servers:
+            server.should_exit = True
+            await task
+
+    print(f"requests:   {args.requests} over {args.nodes} node(s), last node stopped halfway")
+    print(f"throughput: {args.requests / elapsed:10.1f} req/s, {errors} failed")
+    for url, node in stats.items():
+        latency = f"{node['latency'] * 1000:.2f} ms" if node["latency"] is not None else "-"
+        print(f"{url:28} requests={node['requests']:6d} ejections={node['ejections']} healthy={node['healthy']} latency={latency}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 8780)
+    parser.add_argument("--nodes", type = int, default = 3)
+    parser.add_argument("--collections", type = int, default = 8)
+    parser.add_argument("--requests", type = int, default = 3000)
+    parser.add_argument("--concurrency", type = int, default = 50)
+    asyncio.run(main(parser.parse_args()))
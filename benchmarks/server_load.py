@@ -0,0 +1,135 @@
+"""Load test of the AsterDB Server through HTTPClient.
+
+By default the server runs in-process against an in-memory MongoDB stand-in
+(`mongomock-motor`). Pass `--mongo` with the URI of a local `mongod` to run
+the real multi-worker server in a subprocess instead.
+
+    $ python benchmarks/server_load.py --requests 2000 --concurrency 50
+    $ python benchmarks/server_load.py --mongo mongodb://127.0.0.1:27017 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from Crypto.PublicKey import RSA # type: ignore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aster.errors import NotFoundError # noqa: E402
+from aster.http import HTTPClient # noqa: E402
+
+def write_config(args: argparse.Namespace) -> str:
+    config = {
+        "host": args.host,
+        "port": args.port,
+        "mongo": args.mongo or "mongodb://127.0.0.1:27017",
+        "private_key": RSA.generate(2048).export_key().decode(),
+        "workers": args.workers,
+        "blind_indexes": {"bench.load": ["user"]},
+        "log_level": "warning"
+    }
+    handle, path = tempfile.mkstemp(suffix = ".json")
+    with os.fdopen(handle, "w") as file:
+        json.dump(config, file)
+
+    return path
+
+async def wait_for_port(host: str, port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout = 0.5).close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+
+    raise RuntimeError(f"The server did not start on {host}:{port}.")
+
+async def start_in_process(config_path: str):
+    import uvicorn # type: ignore
+    from mongomock_motor import AsyncMongoMockClient # type: ignore
+    from aster.server import create_app, load_config
+
+    config = load_config(config_path)
+    app = create_app(config, mongo_client = AsyncMongoMockClient())
+    server = uvicorn.Server(uvicorn.Config(app, host = config["host"], port = config["port"], log_level = "warning"))
+    task = asyncio.ensure_future(server.serve())
+
+    async def stop():
+        server.should_exit = True
+        await task
+
+    return stop
+
+async def start_subprocess(config_path: str):
+    process = subprocess.Popen(
+        [sys.executable, "-c", f"from aster.server import run; run({config_path!r})"],
+        cwd = ROOT
+    )
+
+    async def stop():
+        process.terminate()
+        process.wait()
+
+    return stop
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+async def main(args: argparse.Namespace) -> None:
+    config_path = write_config(args)
+    with open(config_path) as file:
+        private_key = json.load(file)["private_key"]
+
+    stop = await (start_subprocess(config_path) if args.mongo else start_in_process(config_path))
+    try:
+        await wait_for_port(args.host, args.port)
+        async with HTTPClient(f"http://{args.host}:{args.port}", private_key, limit = args.concurrency) as client:
+            semaphore = asyncio.Semaphore(args.concurrency)
+            latencies: List[float] = []
+
+            async def one(index: int) -> None:
+                async with semaphore:
+                    start = time.perf_counter()
+                    if index % 2 == 0:
+                        await client.insert("bench", "load", {"user": str(index), "payload": "x" * args.value_size})
+                    else:
+                        try:
+                            await client.fetch("bench", "load", {"user": str(index - 1)})
+                        except NotFoundError:
+                            # The insert it reads may still be in flight, a miss is a valid answer.
+                            pass
+
+                    latencies.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(index) for index in range(args.requests)))
+            elapsed = time.perf_counter() - start
+    finally:
+        await stop()
+        os.unlink(config_path)
+
+    print(f"requests:   {args.requests} ({args.concurrency} concurrent, {args.workers} worker(s))")
+    print(f"throughput: {args.requests / elapsed:10.1f} req/s")
+    print(f"p50:        {percentile(latencies, 0.50) * 1000:10.2f} ms")
+    print(f"p99:        {percentile(latencies, 0.99) * 1000:10.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 8766)
+    parser.add_argument("--mongo", default = None, help = "MongoDB URI, omit to use the in-memory stand-in")
+    parser.add_argument("--workers", type = int, default = 1)
+    parser.add_argument("--requests", type = int, default = 2000)
+    parser.add_argument("--concurrency", type = int, default = 50)
+    parser.add_argument("--value-size", type = int, default = 256)
+    asyncio.run(main(parser.parse_args()))
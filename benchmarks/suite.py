@@ -0,0 +1,360 @@
+"""Offline benchmark suite of the client stack, with machine-readable results.
+
+Runs without MongoDB or an AsterDB Server: the direct path talks to an
+in-process Motor-compatible fake (`mongomock-motor`) and the HTTP path talks
+to a local aiohttp stand-in for the server that serves the same routes with
+an AsterClient on that fake. Every operation runs for each document width
+and value size, next to the DocumentCodec and the Fernet `Encryption`
+alone, and is reported with its throughput and latency percentiles.
+
+Data is generated from `--seed` so runs are repeatable. `--output` writes
+the results as JSON together with the commit and the interpreter they were
+measured on, `--compare` prints the change against such a file and exits
+with status 1 when any throughput dropped by more than `--threshold` percent.
+
+    $ python benchmarks/suite.py --output results.json
+    $ python benchmarks/suite.py --compare results.json --threshold 10
+    $ python benchmarks/suite.py --paths direct --widths 8 --value-sizes 64 --ops 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import string
+import subprocess
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiohttp import web # type: ignore
+from Crypto.PublicKey import RSA # type: ignore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aster import wire # noqa: E402
+from aster.client import AsterClient # noqa: E402
+from aster.codec import DocumentCodec # noqa: E402
+from aster.encryption import Encryption, RSAContext # noqa: E402
+from aster.http import HTTPClient # noqa: E402
+from aster.instrumentation import Histogram # noqa: E402
+from aster.objects import authorization # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DATABASE = "bench"
+
+ROUTES: Dict[str, Callable[[AsterClient, str, str, dict], Awaitable[Any]]] = {
+    "insert": lambda client, database, collection, payload: client.insert(database, collection, payload["data"]),
+    "insert_many": lambda client, database, collection, payload: client.insert_many(database, collection, payload["data"], payload.get("ordered", True)),
+    "fetch": lambda client, database, collection, payload: client.fetch(database, collection, payload["query"], projection = payload.get("projection")),
+    "fetch_many": lambda client, database, collection, payload: client.fetch_many(
+        database, collection, payload["query"], payload.get("limit") or 0, payload.get("skip") or 0, payload.get("sort"), payload.get("projection")
+    ),
+    "update": lambda client, database, collection, payload: client.update(database, collection, payload["query"], payload["data"]),
+    "update_many": lambda client, database, collection, payload: client.update_many(database, collection, payload["query"], payload["data"]),
+    "delete": lambda client, database, collection, payload: client.delete(database, collection, payload["query"]),
+    "delete_many": lambda client, database, collection, payload: client.delete_many(database, collection, payload["query"]),
+    "bulk": lambda client, database, collection, payload: client.bulk_write(database, collection, payload["operations"], payload.get("ordered", True))
+}
+
+def serialize(result: Any) -> Any:
+    if hasattr(result, "bulk_api_result"):
+        return result.bulk_api_result
+
+    for name in ("inserted_id", "inserted_ids", "matched_count", "deleted_count"):
+        if hasattr(result, name):
+            result = {name: getattr(result, name)}
+            break
+
+    return result
+
+async def start_stand_in(client: AsterClient, private_key: str, host: str) -> web.AppRunner:
+    """Serves the AsterDB Server routes the suite uses with an AsterClient, on a free port."""
+    expected = authorization(private_key)
+
+    async def handle(request: web.Request) -> web.Response:
+        if request.headers.get("Authorization") != expected:
+            return web.json_response({"error": "The private key is invalid."}, status = 401)
+
+        payload = wire.loads(request.headers.get("Content-Type"), await request.read())
+        info = request.match_info
+        result = await ROUTES[info["route"]](client, info["database"], info["collection"], payload)
+        content_type = wire.negotiate(request.headers.get("Accept"))
+        return web.Response(body = wire.dumps(content_type, {"result": serialize(result)}), content_type = content_type)
+
+    app = web.Application(client_max_size = 256 * 1024 ** 2)
+    app.router.add_route("*", "/{database}/{collection}/{route}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, 0).start()
+    return runner
+
+def documents(rng: random.Random, count: int, width: int, value_size: int, offset: int = 0) -> List[dict]:
+    return [
+        dict(
+            {"key": str(offset + index)},
+            **{f"field{field}": "".join(rng.choices(string.ascii_letters, k = value_size)) for field in range(width - 1)}
+        )
+        for index in range(count)
+    ]
+
+def result(name: str, width: Optional[int], value_size: int, histogram: Histogram, seconds: float, documents: int) -> dict:
+    return {
+        "name": name,
+        "width": width,
+        "value_size": value_size,
+        "ops": histogram.count,
+        "documents": documents,
+        "seconds": seconds,
+        "ops_per_second": histogram.count / seconds if seconds else 0.0,
+        "documents_per_second": documents / seconds if seconds else 0.0,
+        "latency": histogram.snapshot()
+    }
+
+async def timed(calls: List[Callable[[], Awaitable[Any]]], concurrency: int) -> tuple:
+    histogram = Histogram()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(call: Callable[[], Awaitable[Any]]) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await call()
+            histogram.record(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(call) for call in calls))
+    return histogram, time.perf_counter() - started
+
+async def run_client(path: str, client: Any, args: argparse.Namespace, width: int, value_size: int) -> List[dict]:
+    rng = random.Random(f"{args.seed}:{path}:{width}:{value_size}")
+    collection = f"w{width}s{value_size}"
+    singles = documents(rng, args.ops, width, value_size)
+    batches = documents(rng, args.ops, width, value_size, offset = args.ops)
+    extras = documents(rng, args.ops, width, value_size, offset = 2 * args.ops)
+    groups = [batches[index:index + args.batch_size] for index in range(0, len(batches), args.batch_size)]
+    results = []
+
+    def keys(group: List[dict]) -> dict:
+        return {"key": {"$in": [document["key"] for document in group]}}
+
+    def record(operation: str, histogram: Histogram, seconds: float, count: int) -> None:
+        results.append(result(f"{path}.{operation}", width, value_size, histogram, seconds, count))
+
+    histogram, seconds = await timed([
+        lambda document = document: client.insert(DATABASE, collection, document) for document in singles
+    ], args.concurrency)
+    record("insert", histogram, seconds, len(singles))
+
+    histogram, seconds = await timed([
+        lambda group = group: client.insert_many(DATABASE, collection, group) for group in groups
+    ], args.concurrency)
+    record("insert_many", histogram, seconds, len(batches))
+
+    histogram, seconds = await timed([
+        lambda document = document: client.fetch(DATABASE, collection, {"key": document["key"]}) for document in singles
+    ], args.concurrency)
+    record("fetch", histogram, seconds, len(singles))
+
+    histogram, seconds = await timed([
+        lambda group = group: client.fetch_many(DATABASE, collection, keys(group)) for group in groups
+    ], args.concurrency)
+    record("fetch_many", histogram, seconds, len(batches))
+
+    value = "u" * value_size
+    histogram, seconds = await timed([
+        lambda document = document: client.update(DATABASE, collection, {"key": document["key"]}, {"$set": {"field0": value}})
+        for document in singles
+    ], args.concurrency)
+    record("update", histogram, seconds, len(singles))
+
+    histogram, seconds = await timed([
+        lambda group = group: client.update_many(DATABASE, collection, keys(group), {"$set": {"field0": value}}) for group in groups
+    ], args.concurrency)
+    record("update_many", histogram, seconds, len(batches))
+
+    histogram, seconds = await timed([
+        lambda document = document: client.delete(DATABASE, collection, {"key": document["key"]}) for document in singles
+    ], args.concurrency)
+    record("delete", histogram, seconds, len(singles))
+
+    histogram, seconds = await timed([
+        lambda group = group: client.delete_many(DATABASE, collection, keys(group)) for group in groups
+    ], args.concurrency)
+    record("delete_many", histogram, seconds, len(batches))
+
+    # Each batch inserts its documents and deletes them again, mongomock cannot run bulk updates yet.
+    histogram, seconds = await timed([
+        lambda group = group: client.bulk_write(
+            DATABASE,
+            collection,
+            [{"op": "insert_one", "data": document} for document in group] +
+            [{"op": "delete_one", "query": {"key": document["key"]}} for document in group]
+        )
+        for group in [extras[index:index + args.batch_size] for index in range(0, len(extras), args.batch_size)]
+    ], args.concurrency)
+    record("bulk_write", histogram, seconds, 2 * len(extras))
+    return results
+
+def run_codec(private_key: str, args: argparse.Namespace, width: int, value_size: int) -> List[dict]:
+    rng = random.Random(f"{args.seed}:codec:{width}:{value_size}")
+    codec = DocumentCodec(RSAContext(private_key))
+    batch = documents(rng, args.ops, width, value_size)
+    results = []
+
+    encoded = []
+    histogram = Histogram()
+    started = time.perf_counter()
+    for document in batch:
+        call = time.perf_counter()
+        encoded.append(codec.encode(document))
+        histogram.record(time.perf_counter() - call)
+
+    results.append(result("codec.encode", width, value_size, histogram, time.perf_counter() - started, len(batch)))
+
+    histogram = Histogram()
+    started = time.perf_counter()
+    for document in encoded:
+        call = time.perf_counter()
+        codec.decode(document)
+        histogram.record(time.perf_counter() - call)
+
+    results.append(result("codec.decode", width, value_size, histogram, time.perf_counter() - started, len(encoded)))
+    return results
+
+def run_encryption(args: argparse.Namespace, value_size: int) -> List[dict]:
+    rng = random.Random(f"{args.seed}:encryption:{value_size}")
+    encryption = Encryption(Encryption.generate_keys())
+    messages = ["".join(rng.choices(string.ascii_letters, k = value_size)).encode() for _ in range(args.ops)]
+    results = []
+    for name, call, inputs in (
+        ("encryption.encrypt", encryption.encrypt, messages),
+        ("encryption.decrypt", encryption.decrypt_public_key, [encryption.encrypt(message) for message in messages])
+    ):
+        histogram = Histogram()
+        started = time.perf_counter()
+        for value in inputs:
+            start = time.perf_counter()
+            call(value)
+            histogram.record(time.perf_counter() - start)
+
+        results.append(result(name, None, value_size, histogram, time.perf_counter() - started, len(inputs)))
+
+    return results
+
+def metadata(args: argparse.Namespace) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd = ROOT, capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "arguments": vars(args)
+    }
+
+async def main(args: argparse.Namespace) -> dict:
+    from mongomock_motor import AsyncMongoMockClient # type: ignore
+
+    private_key = RSA.generate(2048).export_key().decode()
+    indexes = {f"{DATABASE}.w{width}s{size}": ["key"] for width in args.widths for size in args.value_sizes}
+    results: List[dict] = []
+
+    for width in args.widths:
+        for value_size in args.value_sizes:
+            if "codec" in args.paths:
+                results.extend(run_codec(private_key, args, width, value_size))
+
+            if "direct" in args.paths:
+                client = AsterClient("mongodb://127.0.0.1:27017", private_key, blind_indexes = indexes, mongo_client = AsyncMongoMockClient())
+                try:
+                    results.extend(await run_client("direct", client, args, width, value_size))
+                finally:
+                    await client.close()
+
+            if "http" in args.paths:
+                client = AsterClient("mongodb://127.0.0.1:27017", private_key, blind_indexes = indexes, mongo_client = AsyncMongoMockClient())
+                runner = await start_stand_in(client, private_key, args.host)
+                port = runner.addresses[0][1]
+                try:
+                    async with HTTPClient(f"http://{args.host}:{port}", private_key, single_flight = False, wire_format = args.wire_format) as http:
+                        results.extend(await run_client("http", http, args, width, value_size))
+                finally:
+                    await runner.cleanup()
+                    await client.close()
+
+    if "encryption" in args.paths:
+        for value_size in args.value_sizes:
+            results.extend(run_encryption(args, value_size))
+
+    return {"metadata": metadata(args), "results": results}
+
+def compare(report: dict, baseline: dict, threshold: float) -> List[str]:
+    """Prints the throughput change of every benchmark against a baseline and returns the regressions."""
+    previous = {(item["name"], item["width"], item["value_size"]): item for item in baseline["results"]}
+    regressions = []
+    print(f"\ncompared with {baseline['metadata'].get('commit') or 'baseline'}")
+    for item in report["results"]:
+        before = previous.get((item["name"], item["width"], item["value_size"]))
+        if before is None or not before["ops_per_second"]:
+            continue
+
+        change = (item["ops_per_second"] / before["ops_per_second"] - 1) * 100
+        label = f"{item['name']} width={item['width']} size={item['value_size']}"
+        print(f"{label:48} {before['ops_per_second']:12.1f} -> {item['ops_per_second']:12.1f} ops/s {change:+7.1f}%")
+        if change < -threshold:
+            regressions.append(f"{label} is {-change:.1f}% slower.")
+
+    return regressions
+
+def report_table(report: dict) -> None:
+    print(f"{'benchmark':22} {'width':>5} {'size':>6} {'ops/s':>12} {'docs/s':>12} {'p50 ms':>9} {'p99 ms':>9}")
+    for item in report["results"]:
+        latency = item["latency"]
+        print(
+            f"{item['name']:22} {item['width'] if item['width'] is not None else '-':>5} {item['value_size']:>6} "
+            f"{item['ops_per_second']:12.1f} {item['documents_per_second']:12.1f} "
+            f"{latency['p50'] * 1000:9.3f} {latency['p99'] * 1000:9.3f}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paths", nargs = "+", default = ["codec", "encryption", "direct", "http"], choices = ["codec", "encryption", "direct", "http"])
+    parser.add_argument("--widths", nargs = "+", type = int, default = [4, 32], help = "fields per document")
+    parser.add_argument("--value-sizes", nargs = "+", type = int, default = [16, 1024], help = "bytes per value")
+    parser.add_argument("--ops", type = int, default = 500, help = "operations per benchmark")
+    parser.add_argument("--batch-size", type = int, default = 50, help = "documents per insert_many, fetch_many, update_many, bulk_write and delete_many")
+    parser.add_argument("--concurrency", type = int, default = 8)
+    parser.add_argument("--wire-format", default = "json", choices = ["json", "msgpack", "bson"])
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--output", help = "write the results as JSON to this file, `-` for stdout")
+    parser.add_argument("--compare", help = "a results file of an earlier run")
+    parser.add_argument("--threshold", type = float, default = 10.0, help = "throughput drop in percent that fails --compare")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent = 2)
+
+    else:
+        report_table(report)
+        if args.output:
+            with open(args.output, "w") as file:
+                json.dump(report, file, indent = 2)
+
+    regressions: List[str] = []
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(report, json.load(file), args.threshold)
+
+    for regression in regressions:
+        print(regression, file = sys.stderr)
+
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,62 @@
+"""Payload size and encode/decode time of the HTTPClient wire formats.
+
+Encrypts representative documents with DocumentCodec and encodes a batch
+of them as JSON, where ciphertext has to travel as base64 text, and as
+MessagePack and BSON, where ciphertext travels as raw bytes.
+
+    $ python benchmarks/wire_format.py --documents 500 --fields 20 --value-size 128
+"""
+import argparse
+import os
+import sys
+import time
+from base64 import b64encode
+from typing import Callable, List
+
+from Crypto.PublicKey import RSA # type: ignore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aster import wire # noqa: E402
+from aster.codec import DocumentCodec, KEYS_FIELD, VERSION_FIELD # noqa: E402
+from aster.encryption import RSAContext # noqa: E402
+
+def text(document: dict) -> dict:
+    return {
+        key: value if key in (VERSION_FIELD, KEYS_FIELD) else b64encode(value).decode()
+        for key, value in document.items()
+    }
+
+def timed(function: Callable, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return (time.perf_counter() - start) / rounds
+
+def main(args: argparse.Namespace) -> None:
+    codec = DocumentCodec(RSAContext(RSA.generate(2048).export_key().decode()))
+    documents: List[dict] = codec.encode_many([
+        {f"field_{index}": os.urandom(args.value_size // 2).hex() for index in range(args.fields)}
+        for _ in range(args.documents)
+    ])
+    text_documents = [text(document) for document in documents]
+
+    print(f"{'format':10} {'bytes':>12} {'encode ms':>12} {'decode ms':>12}")
+    for name, content_type in wire.WIRE_FORMATS.items():
+        if not wire.available(content_type):
+            print(f"{name:10} {'not installed':>12}")
+            continue
+
+        payload = {"result": text_documents if content_type == wire.JSON else documents}
+        body = wire.dumps(content_type, payload)
+        encode = timed(lambda: wire.dumps(content_type, payload), args.rounds)
+        decode = timed(lambda: wire.loads(content_type, body), args.rounds)
+        print(f"{name:10} {len(body):12d} {encode * 1000:12.3f} {decode * 1000:12.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--documents", type = int, default = 500)
+    parser.add_argument("--fields", type = int, default = 20)
+    parser.add_argument("--value-size", type = int, default = 128)
+    parser.add_argument("--rounds", type = int, default = 20)
+    main(parser.parse_args())
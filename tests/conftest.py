@@ -0,0 +1,110 @@
+import asyncio
+import inspect
+import socket
+import sys
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Crypto.PublicKey import RSA # type: ignore # noqa: E402
+from mongomock_motor import AsyncCursor, AsyncMongoMockClient # type: ignore # noqa: E402
+import mongomock.collection # type: ignore # noqa: E402
+
+from aster.client import AsterClient # noqa: E402
+from aster.objects import DirectLink # noqa: E402
+
+# pymongo passes `sort` to bulk updates and replacements, which mongomock does not take yet.
+for _name in ("add_update", "add_replace"):
+    def _without_sort(self: Any, *args: Any, _original: Any = getattr(mongomock.collection.BulkOperationBuilder, _name), **kwargs: Any) -> Any:
+        kwargs.pop("sort", None)
+        return _original(self, *args, **kwargs)
+
+    setattr(mongomock.collection.BulkOperationBuilder, _name, _without_sort)
+
+# mongomock_motor hands out the whole cursor from `to_list`, Motor stops after `length` documents.
+async def _to_list(self: Any, length: Any = None) -> list:
+    documents = []
+    while not length or len(documents) < length:
+        try:
+            documents.append(await self.next())
+        except StopAsyncIteration:
+            break
+
+    return documents
+
+AsyncCursor.to_list = _to_list
+
+def pytest_pyfunc_call(pyfuncitem: Any) -> Any:
+    # Coroutine tests run on a fresh event loop each, no plugin needed.
+    if inspect.iscoroutinefunction(pyfuncitem.obj):
+        arguments = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+        asyncio.run(pyfuncitem.obj(**arguments))
+        return True
+
+    return None
+
+@pytest.fixture(scope = "session")
+def private_key() -> str:
+    return RSA.generate(2048).export_key().decode()
+
+@pytest.fixture(scope = "session")
+def new_key() -> str:
+    return RSA.generate(2048).export_key().decode()
+
+@pytest.fixture
+def mongo() -> Any:
+    return AsyncMongoMockClient()
+
+@pytest.fixture
+def client(mongo: Any, private_key: str) -> AsterClient:
+    return AsterClient(DirectLink("mongodb://localhost"), private_key, mongo_client = mongo)
+
+@pytest.fixture
+def serve() -> Any:
+    """Runs an ASGI app under uvicorn on a free local port inside the running test, yielding its URL."""
+    import uvicorn # type: ignore
+
+    @asynccontextmanager
+    async def running(app: Any) -> AsyncIterator[str]:
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        server = uvicorn.Server(uvicorn.Config(app, log_level = "warning", lifespan = "on"))
+        task = asyncio.ensure_future(server.serve(sockets = [sock]))
+        while not server.started:
+            if task.done():
+                task.result()
+
+            await asyncio.sleep(0.01)
+
+        try:
+            yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+        finally:
+            server.should_exit = True
+            await task
+            sock.close()
+
+    return running
+
+@pytest.fixture
+def stub() -> Any:
+    """Serves an aiohttp handler for every path on a free local port inside the running test, yielding its URL."""
+    from aiohttp import web # type: ignore
+
+    @asynccontextmanager
+    async def running(handler: Any, **options: Any) -> AsyncIterator[str]:
+        app = web.Application()
+        app.router.add_route("*", "/{path:.*}", handler)
+        runner = web.AppRunner(app, **options)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        try:
+            yield f"http://127.0.0.1:{runner.addresses[0][1]}"
+        finally:
+            await runner.cleanup()
+
+    return running
@@ -0,0 +1,100 @@
+import io
+import os
+
+import pytest
+
+from aster.client import AsterClient
+from aster.errors import NotFoundError, PrivateKeyError
+from aster.migration import KeyRotation, Migration
+from aster.objects import DirectLink
+
+DATA = os.urandom(100_000)
+
+async def read(client, blob_id):
+    async with await client.open_blob("db", "files", blob_id) as blob:
+        return await blob.read()
+
+async def test_round_trip_from_every_source(client):
+    async def pieces():
+        for offset in range(0, len(DATA), 3000):
+            yield DATA[offset:offset + 3000]
+
+    for source in (DATA, io.BytesIO(DATA), pieces(), [DATA[:10], DATA[10:]]):
+        blob_id = await client.put_blob("db", "files", source, chunk_size = 8192)
+        assert await read(client, blob_id) == DATA
+
+async def test_reader_streams_memoryviews(client):
+    blob_id = await client.put_blob("db", "files", DATA, chunk_size = 8192)
+    blob = await client.open_blob("db", "files", blob_id)
+    assert blob.length == len(DATA)
+    head = await blob.read(100)
+    chunks = [chunk async for chunk in blob]
+    assert all(isinstance(chunk, memoryview) for chunk in chunks)
+    assert head + b"".join(chunks) == DATA
+
+async def test_empty_blob(client):
+    blob_id = await client.put_blob("db", "files", b"")
+    assert await read(client, blob_id) == b""
+
+async def test_reordered_chunks_fail(client, mongo):
+    blob_id = await client.put_blob("db", "files", DATA, chunk_size = 8192)
+    chunks = mongo["db"]["files.chunks"]
+    first = await chunks.find_one({"files_id": blob_id, "n": 0})
+    second = await chunks.find_one({"files_id": blob_id, "n": 1})
+    await chunks.update_one({"_id": first["_id"]}, {"$set": {"data": second["data"]}})
+    with pytest.raises(PrivateKeyError):
+        await read(client, blob_id)
+
+async def test_truncated_blobs_fail(client, mongo):
+    blob_id = await client.put_blob("db", "files", DATA, chunk_size = 8192)
+    await mongo["db"]["files.chunks"].delete_one({"files_id": blob_id, "n": 12})
+    with pytest.raises(PrivateKeyError):
+        await read(client, blob_id)
+
+    # A shorter length turns a middle chunk into the last one, which it was not sealed as.
+    blob_id = await client.put_blob("db", "files", DATA, chunk_size = 8192)
+    await mongo["db"]["files.files"].update_one({"_id": blob_id}, {"$set": {"length": 8192 * 3}})
+    with pytest.raises(PrivateKeyError):
+        await read(client, blob_id)
+
+async def test_chunks_cannot_move_between_blobs(client, mongo):
+    first = await client.put_blob("db", "files", DATA, chunk_size = 8192)
+    second = await client.put_blob("db", "files", DATA, chunk_size = 8192)
+    chunks = mongo["db"]["files.chunks"]
+    moved = await chunks.find_one({"files_id": first, "n": 0})
+    await chunks.update_one({"files_id": second, "n": 0}, {"$set": {"data": moved["data"]}})
+    with pytest.raises(PrivateKeyError):
+        await read(client, second)
+
+async def test_failed_upload_leaves_nothing(client, mongo):
+    async def failing():
+        yield DATA
+        raise RuntimeError("disconnected")
+
+    with pytest.raises(RuntimeError):
+        await client.put_blob("db", "files", failing(), blob_id = "partial", chunk_size = 8192)
+
+    assert await mongo["db"]["files.chunks"].count_documents({"files_id": "partial"}) == 0
+    with pytest.raises(NotFoundError):
+        await client.open_blob("db", "files", "partial")
+
+async def test_delete(client):
+    blob_id = await client.put_blob("db", "files", DATA)
+    assert (await client.delete_blob("db", "files", blob_id)).deleted_count == 1
+    with pytest.raises(NotFoundError):
+        await client.open_blob("db", "files", blob_id)
+
+async def test_migrations_leave_blobs_alone(client, mongo):
+    blob_id = await client.put_blob("db", "files", DATA, chunk_size = 8192)
+    await mongo["db"]["plain"].insert_one({"value": "1"})
+    stats = await Migration(client, "db").run()
+    assert set(stats) == {"plain"}
+    assert await read(client, blob_id) == DATA
+
+async def test_key_rotation_rewraps_blob_keys(client, mongo, private_key, new_key):
+    blob_id = await client.put_blob("db", "files", DATA, chunk_size = 8192)
+    client.rotate_key(new_key)
+    stats = await KeyRotation(client, "db").run()
+    assert stats["files.files"].migrated == 1 and "files.chunks" not in stats
+    rotated = AsterClient(DirectLink("mongodb://localhost"), new_key, mongo_client = mongo)
+    assert await read(rotated, blob_id) == DATA
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+from bson import ObjectId # type: ignore
+
+from aster import cache as cache_module
+from aster.cache import MISSING, DocumentCache, SingleFlight
+from aster.errors import NotFoundError
+from aster.objects import DirectLink
+from aster.wrapper import Aster
+
+async def test_collapsed_callers_get_their_own_copy():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def call():
+        await release.wait()
+        return {"name": "Ada", "tags": ["math"]}
+
+    first = asyncio.ensure_future(flight.run(("db", "users", "{}"), call))
+    second = asyncio.ensure_future(flight.run(("db", "users", "{}"), call))
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(first, second)
+    results[0]["tags"].append("poetry")
+    assert results[1] == {"name": "Ada", "tags": ["math"]}
+    assert flight.stats == {"calls": 1, "collapsed": 1, "in_flight": 0}
+
+def test_cached_documents_are_copied():
+    cache = DocumentCache()
+    document = {"name": "Ada", "address": {"city": "London"}}
+    key = cache.key("db", "users", {})
+    cache.set(key, document)
+    document["address"]["city"] = "Paris"
+    cache.get(key)["address"]["city"] = "Rome"
+    assert cache.get(key) == {"name": "Ada", "address": {"city": "London"}}
+
+def test_keys_keep_the_type_of_values():
+    object_id = ObjectId()
+    assert DocumentCache.key("db", "users", {"_id": object_id}) != DocumentCache.key("db", "users", {"_id": str(object_id)})
+    assert DocumentCache.key("db", "users", {"age": 1}) != DocumentCache.key("db", "users", {"age": 1.0})
+    assert DocumentCache.key("db", "users", {"a": 1, "b": 2}) == DocumentCache.key("db", "users", {"b": 2, "a": 1})
+
+async def test_object_id_and_string_queries_are_cached_apart(mongo, private_key):
+    async with Aster(DirectLink("mongodb://localhost"), private_key, mongo_client = mongo, cache_size = 8) as aster:
+        object_id = (await aster.insert("db", "users", {"name": "Ada"})).inserted_id
+        assert await aster.get("db", "users", {"_id": object_id}) == {"name": "Ada"}
+        with pytest.raises(NotFoundError):
+            await aster.get("db", "users", {"_id": str(object_id)})
+
+        assert len(aster.cache) == 1
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = DocumentCache(max_size = 2)
+    first, second, third = (cache.key("db", "users", {"n": index}) for index in range(3))
+    cache.set(first, 1)
+    cache.set(second, 2)
+    assert cache.get(first) == 1
+    cache.set(third, 3)
+    assert cache.get(second) is MISSING
+    assert (cache.get(first), cache.get(third)) == (1, 3)
+    assert cache.stats == {"hits": 3, "misses": 1, "evictions": 1, "size": 2}
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = DocumentCache(ttl = 10)
+    forever = DocumentCache(ttl = None)
+    key = cache.key("db", "users", {})
+    cache.set(key, "Ada")
+    forever.set(key, "Ada")
+    now[0] += 9
+    assert cache.get(key) == "Ada"
+    now[0] += 2
+    assert cache.get(key) is MISSING and len(cache) == 0
+    assert forever.get(key) == "Ada"
+
+def test_results_fetched_before_an_invalidation_are_not_stored():
+    cache = DocumentCache()
+    key = cache.key("db", "users", {})
+    generation = cache.generation
+    cache.invalidate("db", "other")
+    cache.set(key, "stale", generation)
+    assert cache.get(key) is MISSING
+    cache.set(key, "fresh", cache.generation)
+    assert cache.get(key) == "fresh"
+
+def test_invalidation_is_scoped_to_its_namespace():
+    cache = DocumentCache()
+    keys = [cache.key("db", "users", {}), cache.key("db", "posts", {}), cache.key("other", "users", {})]
+    for key in keys:
+        cache.set(key, key[1])
+
+    cache.invalidate("db", "users")
+    assert [cache.get(key) is MISSING for key in keys] == [True, False, False]
+    cache.invalidate("db")
+    assert [cache.get(key) is MISSING for key in keys] == [True, True, False]
+    cache.clear()
+    assert len(cache) == 0
+
+async def test_writes_invalidate_cached_reads(mongo, private_key):
+    async with Aster(DirectLink("mongodb://localhost"), private_key, mongo_client = mongo, cache_size = 8) as aster:
+        await aster.insert("db", "users", {"name": "Ada", "visits": "1"})
+        await aster.insert("db", "posts", {"title": "Notes"})
+        assert (await aster.get("db", "users", {}))["visits"] == "1"
+        await aster.get("db", "posts", {})
+        assert (await aster.get("db", "users", {}))["visits"] == "1"
+        assert aster.cache_stats["hits"] == 1
+        await aster.update("db", "users", {}, {"visits": "2"})
+        assert len(aster.cache) == 1
+        assert (await aster.get("db", "users", {}))["visits"] == "2"
+        await aster.delete("db", "users", {})
+        with pytest.raises(NotFoundError):
+            await aster.get("db", "users", {})
@@ -0,0 +1,140 @@
+from base64 import b64encode
+
+import pytest
+from bson import ObjectId # type: ignore
+from pymongo.results import UpdateResult # type: ignore
+
+from aster import client as client_module
+from aster.client import AsterClient
+from aster.codec import ENVELOPE_VERSION, VERSION_FIELD, LazyDocument
+from aster.errors import NotFoundError, ServerError
+from aster.instrumentation import MetricsRecorder
+from aster.resilience import RetryPolicy
+from aster.migration import CHECKPOINT_COLLECTION, KeyRotation, Migration
+from aster.objects import DirectLink
+
+async def test_insert_fetch_update_delete(client):
+    await client.insert("db", "users", {"name": "Ada", "visits": 1})
+    assert await client.fetch("db", "users", {}) == {"name": "Ada", "visits": 1}
+    await client.update("db", "users", {}, {"$set": {"name": "Grace"}, "$inc": {"visits": 2}})
+    assert await client.fetch_many("db", "users", {}) == [{"name": "Grace", "visits": 3}]
+    await client.delete("db", "users", {})
+    assert await client.fetch_many("db", "users", {}) == []
+
+async def test_increment_gives_up_after_its_attempts(client, monkeypatch):
+    class Conflicting:
+        # Every write loses against a concurrent one.
+        def __init__(self, collection):
+            self.collection = collection
+            self.writes = 0
+
+        def find_one(self, *args):
+            return self.collection.find_one(*args)
+
+        async def update_one(self, *args):
+            self.writes += 1
+            return UpdateResult({"n": 0, "nModified": 0}, True)
+
+    await client.insert("db", "users", {"visits": 1})
+    collection = Conflicting(client._get_collection("db", "users"))
+    monkeypatch.setattr(client, "_get_collection", lambda database, name: collection)
+    monkeypatch.setattr(client_module, "INCREMENT_RETRY", RetryPolicy(attempts = 3, base_delay = 0.001, max_delay = 0.001))
+    client.instrumentation = MetricsRecorder()
+    with pytest.raises(ServerError):
+        await client.update("db", "users", {}, {"$inc": {"visits": 1}})
+
+    assert collection.writes == 3
+    assert client.instrumentation.export()["update"]["errors"] == 1
+
+async def test_find_decrypts_one_batch_at_a_time(client, monkeypatch):
+    await client.insert_many("db", "users", [{"_id": index, "age": index} for index in range(25)])
+    batches = []
+    decode_many = client.executor.decode_many
+    async def recording(documents):
+        batches.append(len(documents))
+        return await decode_many(documents)
+
+    monkeypatch.setattr(client.executor, "decode_many", recording)
+    assert [document["age"] async for document in client.find("db", "users", {}, batch_size = 10)] == list(range(25))
+    assert batches == [10, 10, 5]
+    assert [document["age"] async for document in client.find("db", "users", {"_id": {"$gte": 20}})] == list(range(20, 25))
+
+async def test_fetch_many_pushes_limit_skip_sort_and_projection_down(client):
+    await client.insert_many("db", "users", [{"_id": index, "name": f"user{index}", "age": index} for index in range(10)])
+    documents = await client.fetch_many("db", "users", {}, limit = 3, skip = 2, sort = [("_id", -1)], projection = ["name"])
+    assert documents == [{"name": "user7"}, {"name": "user6"}, {"name": "user5"}]
+    assert len(await client.fetch_many("db", "users", {"_id": {"$lt": 8}}, skip = 5)) == 3
+    assert [document["age"] for document in await client.fetch_many("db", "users", {}, limit = 2)] == [0, 1]
+
+async def test_fetch_page_tokens_walk_every_document_once(client):
+    await client.insert_many("db", "users", [{"_id": index, "age": index} for index in range(10)])
+    pages, token = [], None
+    while True:
+        documents, token = await client.fetch_page("db", "users", {"_id": {"$ne": 4}}, page_size = 4, token = token, projection = ["age"])
+        pages.append([document["age"] for document in documents])
+        if token is None:
+            break
+
+    assert pages == [[0, 1, 2, 3], [5, 6, 7, 8], [9]]
+    object_id = ObjectId()
+    assert client.decode_page_token(client.encode_page_token(object_id)) == object_id
+    with pytest.raises(ValueError):
+        client.decode_page_token("not a token")
+
+async def test_blind_index_queries(mongo, private_key):
+    client = AsterClient(DirectLink("mongodb://localhost"), private_key, mongo_client = mongo, blind_indexes = {"db.users": ["name", "age"]})
+    await client.insert_many("db", "users", [{"name": "Ada", "age": 36}, {"name": "Grace", "age": 85}])
+    assert (await client.fetch("db", "users", {"name": "Grace"}))["age"] == 85
+    assert (await client.fetch("db", "users", {"age": 36}))["name"] == "Ada"
+    assert await client.fetch_many("db", "users", {"age": "36"}) == []
+    with pytest.raises(NotFoundError):
+        await client.fetch("db", "users", {"name": "Alan"})
+
+async def test_migration_resumes_from_its_checkpoint(client, mongo):
+    col = mongo["db"]["plain"]
+    await col.insert_many([{"_id": index, "value": str(index)} for index in range(10)])
+    await mongo["db"][CHECKPOINT_COLLECTION].insert_one({"_id": "plain", "last_id": 4, "migrated": 5})
+    stats = await Migration(client, "db", batch_size = 2).run()
+    assert stats["plain"].migrated == 10 and stats["plain"].done
+    assert await col.find_one({"_id": 3}) == {"_id": 3, "value": "3"}
+    decrypted = await client.fetch_many("db", "plain", {"_id": {"$gt": 4}})
+    assert [document["value"] for document in decrypted] == [str(index) for index in range(5, 10)]
+    assert (await Migration(client, "db").run())["plain"].migrated == 10
+
+async def test_finished_migrations_pick_up_new_documents(client, mongo):
+    col = mongo["db"]["plain"]
+    await col.insert_many([{"_id": index, "value": str(index)} for index in range(3)])
+    assert (await Migration(client, "db").run())["plain"].migrated == 3
+    await col.insert_many([{"_id": index, "value": str(index)} for index in range(3, 5)])
+    stats = await Migration(client, "db").run()
+    assert stats["plain"].migrated == 5 and stats["plain"].done
+    assert await col.count_documents({"value": {"$exists": True}}) == 0
+    assert [document["value"] for document in await client.fetch_many("db", "plain", {})] == ["0", "1", "2", "3", "4"]
+
+async def test_migration_rewrites_legacy_documents_once(client, mongo):
+    rsa = client.codec.crypto.active
+    seal = lambda text: b64encode(rsa.encrypt(text.encode())).decode() # noqa: E731
+    col = mongo["db"]["mixed"]
+    await col.insert_many([{"_id": 1, seal("name"): seal("Ada")}, {"_id": 2, "name": "Grace"}])
+    assert client.codec.is_legacy(await col.find_one({"_id": 1}))
+    assert not client.codec.is_legacy(await col.find_one({"_id": 2}))
+    assert (await Migration(client, "db").run())["mixed"].migrated == 2
+    assert await col.count_documents({VERSION_FIELD: ENVELOPE_VERSION}) == 2
+    assert [document["name"] for document in await client.fetch_many("db", "mixed", {})] == ["Ada", "Grace"]
+
+async def test_key_rotation_rewraps_every_document(client, mongo, new_key):
+    await client.insert_many("db", "users", [{"name": str(index)} for index in range(5)])
+    client.rotate_key(new_key)
+    await client.insert("db", "users", {"name": "new"})
+    stats = await KeyRotation(client, "db", ["users"]).run()
+    assert stats["users"].migrated == 5
+    assert await mongo["db"]["users"].count_documents({"_kek": {"$ne": client.crypto.active_id}}) == 0
+    assert len(await client.fetch_many("db", "users", {})) == 6
+
+async def test_lazy_fetch_keeps_the_projection(client):
+    await client.insert("db", "users", {"name": "Ada", "age": 36, "city": "London"})
+    document = await client.fetch("db", "users", {}, projection = ["name", "age"], lazy = True)
+    assert isinstance(document, LazyDocument)
+    assert len(document) == 2 and "city" not in document
+    assert document["age"] == 36 and dict(document) == {"name": "Ada", "age": 36}
+    assert dict(await client.fetch("db", "users", {}, lazy = True)) == {"name": "Ada", "age": 36, "city": "London"}
@@ -0,0 +1,82 @@
+import asyncio
+
+from aster.coalesce import WriteBuffer
+
+class Client:
+    def __init__(self, error):
+        self.error = error
+        self.batches = []
+
+    async def bulk_write(self, database, collection, operations, ordered):
+        self.batches.append(len(operations))
+        if len(operations) > 1 or operations[0]["data"].get("bad"):
+            raise self.error
+
+        return {"writeErrors": []}
+
+async def write(buffer, documents):
+    return await asyncio.gather(
+        *(buffer.submit("db", "users", {"op": "insert_one", "data": document}) for document in documents),
+        return_exceptions = True
+    )
+
+async def test_unsent_batches_are_split_up():
+    client = Client(ValueError("The value cannot be encrypted."))
+    results = await write(WriteBuffer(client), [{"_id": 1}, {"_id": 2, "bad": True}, {"_id": 3}])
+    assert client.batches == [3, 1, 1, 1]
+    assert results[0] == {"inserted_id": 1} and results[2] == {"inserted_id": 3}
+    assert isinstance(results[1], ValueError)
+
+async def test_other_failures_are_not_written_again():
+    error = ConnectionResetError("The connection was lost mid-batch.")
+    client = Client(error)
+    results = await write(WriteBuffer(client), [{"_id": 1}, {"_id": 2}, {"_id": 3}])
+    assert client.batches == [3]
+    assert results == [error] * 3
+
+async def test_flush_writes_right_away():
+    client = Client(ValueError())
+    buffer = WriteBuffer(client, max_delay = 60)
+    task = asyncio.ensure_future(buffer.submit("db", "users", {"op": "insert_one", "data": {"_id": 1}}))
+    await asyncio.sleep(0)
+    await buffer.flush()
+    assert await asyncio.wait_for(task, 1) == {"inserted_id": 1}
+
+async def test_update_counts_are_only_reported_when_the_batch_settles_them():
+    class Counting:
+        def __init__(self, matched):
+            self.matched = matched
+
+        async def bulk_write(self, database, collection, operations, ordered):
+            return {"writeErrors": [], "nMatched": self.matched, "nModified": self.matched}
+
+    for matched, expected in ((0, 0), (1, None), (2, 1)):
+        buffer = WriteBuffer(Counting(matched))
+        results = await asyncio.gather(*(buffer.submit("db", "users", {"op": "update_one", "query": {}, "data": {}}) for _ in range(2)))
+        assert results == [{"matched_count": expected, "modified_count": expected}] * 2
+
+async def test_buffered_writes_return_what_unbuffered_ones_do(serve, mongo, private_key):
+    from aster.objects import DirectLink
+    from aster.server import create_app
+    from aster.wrapper import Aster
+
+    def shape(result):
+        if isinstance(result, dict):
+            return {key: type(value) for key, value in result.items()}
+
+        return type(result), type(getattr(result, "inserted_id", None))
+
+    def matched(result):
+        return result["matched_count"] if isinstance(result, dict) else result.matched_count
+
+    config = {"mongo": "mongodb://localhost", "private_key": private_key}
+    async with serve(create_app(config, mongo)) as url:
+        for target in (DirectLink("mongodb://localhost"), url):
+            options = {"mongo_client": mongo} if isinstance(target, DirectLink) else {}
+            async with Aster(target, private_key, **options) as plain, Aster(target, private_key, write_buffer_delay = 0.001, **options) as buffered:
+                inserts = [await aster.insert("db", "shapes", {"name": "Grace"}) for aster in (plain, buffered)]
+                ids = [result["inserted_id"] if isinstance(result, dict) else result.inserted_id for result in inserts]
+                updates = [await aster.update("db", "shapes", {"_id": ids[0]}, {"name": "Alan"}) for aster in (plain, buffered)]
+
+            assert shape(inserts[0]) == shape(inserts[1]) and shape(updates[0]) == shape(updates[1])
+            assert [matched(result) for result in updates] == [1, 1]
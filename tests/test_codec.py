@@ -0,0 +1,163 @@
+import os
+import struct
+from base64 import b64encode
+
+import pytest
+
+from aster.codec import (
+    BLIND_INDEX_FIELD,
+    KEYS_FIELD,
+    NONCE_SIZE,
+    VERSION_FIELD,
+    CollectionOptions,
+    DocumentCodec
+)
+from aster.encryption import KeyRing, RSAContext
+from aster.errors import PrivateKeyError
+
+DOCUMENT = {
+    "name": "Ada",
+    "avatar": b"\x00\xff",
+    "age": 36,
+    "score": 9.5,
+    "admin": True,
+    "deleted": None,
+    "tags": ["a", 1, [None]],
+    "address": {"city": "London", "zip": 1}
+}
+
+@pytest.fixture
+def codec(private_key):
+    return DocumentCodec(RSAContext(private_key))
+
+def test_round_trip_keeps_types(codec):
+    document = codec.encode(dict(DOCUMENT, _id = 1))
+    assert document[VERSION_FIELD] == 3
+    assert "name" not in document
+    assert codec.decode(document) == DOCUMENT
+
+def test_decodes_legacy_rsa_documents(codec):
+    rsa = codec.crypto.active
+    document = {
+        "_id": 1,
+        b64encode(rsa.encrypt(b"name")).decode(): b64encode(rsa.encrypt(b"Ada")).decode()
+    }
+    assert codec.decode(document) == {"name": "Ada"}
+
+def test_decodes_base64_fields_of_version_2(codec):
+    data_key = codec.data_key
+    token = codec.field_token("name")
+    nonce = os.urandom(NONCE_SIZE)
+    plaintext = struct.pack(">H", 4) + b"name" + b"Ada"
+    ciphertext = data_key.id + nonce + data_key.aead.encrypt(nonce, plaintext, token.encode())
+    document = {
+        VERSION_FIELD: 2,
+        KEYS_FIELD: {data_key.id.hex(): data_key.wrapped},
+        token: b64encode(ciphertext).decode()
+    }
+    assert codec.decode(document) == {"name": "Ada"}
+
+def test_fields_are_bound_to_their_name(codec):
+    document = codec.encode({"name": "Ada", "role": "admin"})
+    name, role = codec.field_token("name"), codec.field_token("role")
+    document[name], document[role] = document[role], document[name]
+    with pytest.raises(PrivateKeyError):
+        codec.decode(document)
+
+def test_modified_ciphertext_fails(codec):
+    document = codec.encode({"name": "Ada"})
+    token = codec.field_token("name")
+    document[token] = document[token][:-1] + bytes([document[token][-1] ^ 1])
+    with pytest.raises(PrivateKeyError):
+        codec.decode(document)
+
+def test_per_document_keys_differ(private_key):
+    codec = DocumentCodec(RSAContext(private_key), per_document = True)
+    first, second = codec.encode({"a": "1"}), codec.encode({"a": "1"})
+    assert first[KEYS_FIELD] != second[KEYS_FIELD]
+    assert codec.decode(second) == {"a": "1"}
+
+def test_compression(codec):
+    options = CollectionOptions(compression = "zlib", compression_threshold = 64)
+    value = "x" * 10000
+    compressed = codec.encode({"text": value}, options = options)
+    plain = codec.encode({"text": value})
+    token = codec.field_token("text")
+    assert len(compressed[token]) < len(plain[token]) / 10
+    assert codec.decode(compressed) == {"text": value}
+
+def test_blind_indexes_match_equal_values_of_the_same_type(codec):
+    options = CollectionOptions(indexed = ["name", "age"])
+    document = codec.encode({"name": "5", "age": 5}, options = options)
+    indexes = document[BLIND_INDEX_FIELD]
+    assert indexes[codec.field_token("age")] == codec.blind_index("age", 5, options)
+    assert codec.blind_index("age", 5, options) != codec.blind_index("age", "5", options)
+    assert codec.blind_index("age", 5, options) != codec.blind_index("name", 5, options)
+
+def test_rewrite_query(codec):
+    options = CollectionOptions(indexed = ["name"])
+    query = codec.rewrite_query({"name": {"$in": ["a", "b"]}, "_id": 1}, options.indexed, options)
+    assert query == {
+        codec.index_field("name"): {"$in": [codec.blind_index("name", "a"), codec.blind_index("name", "b")]},
+        "_id": 1
+    }
+    with pytest.raises(ValueError):
+        codec.rewrite_query({"name": {"$gt": "a"}}, options.indexed, options)
+
+def test_schema_rejects_mismatched_values(codec):
+    options = CollectionOptions(schema = {"age": int, "tags": [str]})
+    assert codec.decode(codec.encode({"age": 1, "tags": ["a"]}, options = options)) == {"age": 1, "tags": ["a"]}
+    for document in ({"age": "1"}, {"tags": ["a", 2]}):
+        with pytest.raises(ValueError):
+            codec.encode(document, options = options)
+
+def test_rewrap_moves_data_keys_to_the_active_key(private_key, new_key):
+    codec = DocumentCodec(KeyRing([private_key]))
+    document = codec.encode({"name": "Ada"})
+    ring = KeyRing([private_key]).rotate(new_key)
+    rotated = DocumentCodec(ring)
+    update = rotated.rewrap(document)
+    assert update is not None
+    for field, value in update.items():
+        if field.startswith(KEYS_FIELD + "."):
+            document[KEYS_FIELD][field.split(".", 1)[1]] = value
+
+        else:
+            document[field] = value
+
+    assert rotated.rewrap(document) is None
+    # Only the new key and the root the field names are derived from are needed afterwards.
+    assert DocumentCodec(KeyRing([new_key, private_key])).decode(document) == {"name": "Ada"}
+
+def test_data_key_is_replaced_after_its_use_limit(private_key):
+    codec = DocumentCodec(RSAContext(private_key), max_key_uses = 4)
+    documents = [codec.encode({"a": "1", "b": "2"}) for _ in range(4)]
+    keys = [next(iter(document[KEYS_FIELD])) for document in documents]
+    assert keys[0] == keys[1] != keys[2] == keys[3]
+    assert all(codec.decode(document) == {"a": "1", "b": "2"} for document in documents)
+
+def test_lazy_documents_decrypt_only_what_is_read(codec, monkeypatch):
+    stored = codec.encode(dict(DOCUMENT, _id = 1))
+    decrypted = []
+    decrypt_field = codec.decrypt_field
+    monkeypatch.setattr(codec, "decrypt_field", lambda token, *args: decrypted.append(token) or decrypt_field(token, *args))
+    document = codec.decode_lazy(stored)
+    assert len(document) == len(DOCUMENT) and "name" in document and "missing" not in document
+    assert decrypted == []
+    assert document["name"] == "Ada" and document["name"] == "Ada"
+    assert document.get("address") == {"city": "London", "zip": 1}
+    assert decrypted == [codec.field_token("name"), codec.field_token("address")]
+    with pytest.raises(KeyError):
+        document["missing"]
+
+    assert dict(document) == DOCUMENT
+    count = len(decrypted)
+    assert sorted(document.keys()) == sorted(DOCUMENT) and document == DOCUMENT and document["age"] == 36
+    assert len(decrypted) == count
+    with pytest.raises(TypeError):
+        document["name"] = "Grace"
+
+def test_lazy_documents_read_the_legacy_format(codec):
+    rsa = codec.crypto.active
+    document = codec.decode_lazy({"_id": 1, b64encode(rsa.encrypt(b"name")).decode(): b64encode(rsa.encrypt(b"Ada")).decode()})
+    assert dict(document) == {"name": "Ada"} and len(document) == 1
@@ -0,0 +1,91 @@
+import os
+import pickle
+import threading
+
+import pytest
+
+from aster.codec import VERSION_FIELD, CollectionOptions, DocumentCodec
+from aster.encryption import RSAContext
+from aster.executor import CryptoExecutor
+from aster.schema import Schema
+
+SCHEMA = {"name": str, "age": int, "tags": [str], "address": {"city": str}}
+
+def documents(count):
+    return [{"_id": index, "name": f"user{index}", "age": index, "tags": ["a"], "address": {"city": "London"}} for index in range(count)]
+
+@pytest.fixture
+def codec(private_key):
+    return DocumentCodec(RSAContext(private_key))
+
+def test_rejects_unknown_modes(codec):
+    with pytest.raises(ValueError):
+        CryptoExecutor(codec, "fiber")
+
+async def test_inline_runs_on_the_calling_thread(codec):
+    executor = CryptoExecutor(codec)
+    threads = []
+    assert executor.pool is None
+    assert await executor.run(lambda: threads.append(threading.current_thread()) or 1) == 1
+    assert threads == [threading.current_thread()]
+    stored = await executor.encode_many(documents(300))
+    assert [document["name"] for document in await executor.decode_many(stored)] == [f"user{index}" for index in range(300)]
+
+async def test_batches_are_offloaded_from_the_threshold(codec, monkeypatch):
+    executor = CryptoExecutor(codec, "thread", max_workers = 2, threshold = 10)
+    offloaded = []
+    original = executor._map
+    async def counting(*args):
+        offloaded.append(len(args[2]))
+        return await original(*args)
+
+    monkeypatch.setattr(executor, "_map", counting)
+    try:
+        stored = await executor.encode_many(documents(1))
+        await executor.decode(stored[0])
+        assert offloaded == []
+        stored = await executor.encode_many(documents(2))
+        await executor.decode_many(stored)
+        assert offloaded == [2, 2]
+    finally:
+        executor.shutdown()
+
+async def test_threads_split_batches_across_the_pool(codec, monkeypatch):
+    executor = CryptoExecutor(codec, "thread", max_workers = 4, threshold = 1)
+    threads = set()
+    decode = codec.decode
+    monkeypatch.setattr(codec, "decode", lambda document: threads.add(threading.current_thread().name) or decode(document))
+    try:
+        stored = await executor.encode_many(documents(40))
+        decoded = await executor.decode_many(stored)
+    finally:
+        executor.shutdown()
+
+    assert [document["age"] for document in decoded] == list(range(40))
+    assert threads and all(name.startswith("aster-crypto") for name in threads)
+    assert executor.pool is None
+
+def test_schemas_survive_pickling():
+    schema = pickle.loads(pickle.dumps(Schema(SCHEMA)))
+    assert schema.fields == SCHEMA
+    assert schema.pack("age", 36) == Schema(SCHEMA).pack("age", 36)
+    options = pickle.loads(pickle.dumps(CollectionOptions(schema = SCHEMA, compression = "zlib")))
+    assert options.schema.fields == SCHEMA and options.method == CollectionOptions(compression = "zlib").method
+
+async def test_processes_encode_with_the_keys_and_schema_of_the_parent(codec):
+    executor = CryptoExecutor(codec, "process", max_workers = 2, threshold = 1)
+    options = CollectionOptions(schema = SCHEMA)
+    try:
+        pids = {await executor.run(os.getpid) for _ in range(4)}
+        stored = await executor.encode_many(documents(20), options)
+        assert all(document[VERSION_FIELD] == 3 and "name" not in document for document in stored)
+        # Documents sealed in the workers open with the codec of the parent, and the other way round.
+        assert [codec.decode(document)["age"] for document in stored] == list(range(20))
+        decoded = await executor.decode_many(codec.encode_many(documents(20), options))
+    finally:
+        executor.shutdown()
+
+    assert os.getpid() not in pids
+    assert decoded == [{key: value for key, value in document.items() if key != "_id"} for document in documents(20)]
+    with pytest.raises(ValueError):
+        codec.encode_many([{"age": "36"}], options)
@@ -0,0 +1,28 @@
+import asyncio
+
+from aster.cache import SingleFlight
+from aster.instrumentation import MetricsRecorder, detached
+
+async def test_operations_nest_within_a_task():
+    recorder = MetricsRecorder()
+    with recorder.operation("get"):
+        with recorder.operation("fetch") as inner:
+            inner.size("response_bytes", 10)
+
+    assert set(recorder.export()) == {"get"}
+    assert recorder.export()["get"]["sizes"] == {"response_bytes": 10}
+
+async def test_detached_tasks_do_not_report_into_the_caller():
+    recorder = MetricsRecorder()
+
+    async def call():
+        with recorder.operation("fetch"):
+            await asyncio.sleep(0)
+
+    with recorder.operation("get"):
+        await SingleFlight().run(("db", "users", "{}"), call)
+        task = asyncio.ensure_future(detached(call()))
+
+    await task
+    assert recorder.export()["fetch"]["count"] == 2
+    assert recorder.export()["get"]["count"] == 1
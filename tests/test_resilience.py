@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web # type: ignore
+
+from aster.errors import ServerError, TimeoutError
+from aster.http import HTTPClient
+from aster.resilience import Hedging, RetryBudget, RetryPolicy, deadline, expires
+
+def failing(hits):
+    async def handler(request):
+        hits.append(request.path)
+        return web.Response(status = 503)
+
+    return handler
+
+def ndjson(gap, lines):
+    async def handler(request):
+        response = web.StreamResponse(headers = {"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        for index in range(lines):
+            await asyncio.sleep(gap)
+            await response.write(b'{"index": %d}\n' % index)
+
+        await response.write_eof()
+        return response
+
+    return handler
+
+async def test_streams_may_outlast_the_timeout_while_they_keep_arriving(stub, private_key):
+    async with stub(ndjson(0.05, 8)) as url, HTTPClient(url, private_key, timeout = 0.2) as http:
+        assert [document["index"] async for document in http.find("db", "users", {})] == list(range(8))
+
+async def test_stalled_streams_time_out(stub, private_key):
+    async with stub(ndjson(1, 2)) as url, HTTPClient(url, private_key, timeout = 0.2) as http:
+        with pytest.raises(TimeoutError):
+            [document async for document in http.find("db", "users", {})]
+
+@pytest.mark.parametrize("attempts", [1, 2, 4])
+async def test_reads_are_retried_up_to_the_attempts(stub, private_key, attempts):
+    hits = []
+    async with stub(failing(hits)) as url, HTTPClient(url, private_key, retry = RetryPolicy(attempts, base_delay = 0.001)) as http:
+        with pytest.raises(ServerError):
+            await http.fetch("db", "users", {})
+
+    assert len(hits) == attempts
+
+async def test_a_spent_budget_stops_retries(stub, private_key):
+    hits = []
+    async with stub(failing(hits)) as url, HTTPClient(url, private_key, retry = RetryPolicy(4, base_delay = 0.001)) as http:
+        http.budget = RetryBudget(ratio = 0.5, reserve = 2)
+        http.budget.balance = 0
+        for _ in range(2):
+            with pytest.raises(ServerError):
+                await http.fetch("db", "users", {})
+
+    # The first read saves up half a token, the second one a whole token for a single retry.
+    assert len(hits) == 3
+
+async def test_writes_are_never_retried(stub, private_key):
+    hits = []
+    async with stub(failing(hits)) as url, HTTPClient(url, private_key, retry = RetryPolicy(4, base_delay = 0.001), hedging = Hedging()) as http:
+        for write in (http.insert("db", "users", {"name": "Ada"}), http.update("db", "users", {}, {"name": "Ada"}), http.delete("db", "users", {})):
+            with pytest.raises(ServerError):
+                await write
+
+    assert hits == ["/db/users/insert", "/db/users/update", "/db/users/delete"]
+
+async def test_the_deadline_bounds_every_call_below_it(stub, private_key):
+    async def slow(request):
+        await asyncio.sleep(1)
+        return web.json_response({"result": {}})
+
+    # Shared reads run until the default timeout by design, without them the deadline has to reach the request itself.
+    async with stub(slow) as url, HTTPClient(url, private_key, timeout = 5, single_flight = False) as http:
+        with deadline(0.1):
+            with deadline(2):
+                assert expires(5) <= time.monotonic() + 0.1
+
+        for call in (lambda: http.fetch("db", "users", {}), lambda: http.insert("db", "users", {"name": "Ada"})):
+            started = time.monotonic()
+            with deadline(0.1), pytest.raises(TimeoutError):
+                await call()
+
+            assert time.monotonic() - started < 0.5
+
+async def test_hedging_cancels_the_slower_request(stub, private_key):
+    cancelled = []
+
+    async def slow(request):
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(request.path)
+            raise
+
+        return web.json_response({"result": "slow"})
+
+    async def fast(request):
+        return web.json_response({"result": "fast"})
+
+    hedging = Hedging(initial_delay = 0.02)
+    async with stub(slow, handler_cancellation = True) as slow_url, stub(fast) as fast_url:
+        async with HTTPClient([slow_url, fast_url], private_key, hedging = hedging) as http:
+            started = time.monotonic()
+            assert await http.fetch("db", "users", {}) == "fast"
+            assert time.monotonic() - started < 0.5
+            assert http.router.stats[slow_url]["outstanding"] == 0
+
+        # The client hangs up on the loser, which ends its handler on the server.
+        for _ in range(50):
+            if cancelled:
+                break
+
+            await asyncio.sleep(0.01)
+
+    assert (hedging.hedged, hedging.won) == (1, 1)
+    assert cancelled == ["/db/users/fetch"]
@@ -0,0 +1,112 @@
+import asyncio
+import time
+from collections import Counter
+
+from aiohttp import web # type: ignore
+
+from aster.http import HTTPClient
+from aster.resilience import Hedging
+from aster.routing import HashRing, Router
+
+REPLICAS = ["http://a", "http://b", "http://c"]
+
+def finish(router, node, seconds = 0.0, failed = False):
+    router.finished(node, router.started(node) - seconds, failed)
+
+def test_hash_ring_moves_only_the_keys_of_a_removed_member():
+    keys = [f"db/collection{index}" for index in range(500)]
+    before = HashRing(["a", "b", "c", "d"])
+    owners = {key: before.walk(key)[0] for key in keys}
+    assert set(owners.values()) == {"a", "b", "c", "d"}
+    assert sorted(before.walk(keys[0])) == ["a", "b", "c", "d"]
+    # Members are hashed by position, so dropping the last one leaves the others in place.
+    after = HashRing(["a", "b", "c"])
+    for key in keys:
+        if owners[key] != "d":
+            assert after.walk(key)[0] == owners[key]
+
+def test_shards_are_picked_by_consistent_hashing():
+    router = Router([["http://a1", "http://a2"], ["http://b1", "http://b2"]])
+    picked = {router.pick(f"db/collection{index}", False).url[:8] for index in range(100)}
+    assert picked == {"http://a", "http://b"}
+    shard = next(shard for shard in router.shards if router.pick("db/users", False) in shard)
+    assert all(router.pick("db/users", True) in shard for _ in range(10))
+    assert len({router.pick("db/users", False).url for _ in range(10)}) == 1
+
+def test_writes_stick_to_the_owner_and_reads_go_to_the_least_busy():
+    router = Router(REPLICAS)
+    owner = router.pick("db/users", False)
+    router.started(owner)
+    assert router.pick("db/users", False) is owner
+    read = router.pick("db/users", True)
+    assert read is not owner
+    router.started(read)
+    third = router.pick("db/users", True)
+    assert third not in (owner, read)
+
+def test_failures_eject_until_eject_for_has_passed():
+    router = Router(REPLICAS, max_failures = 2, eject_for = 0.05)
+    node = router.nodes[0]
+    finish(router, node, failed = True)
+    assert node.healthy(time.monotonic())
+    finish(router, node, failed = False)
+    finish(router, node, failed = True)
+    assert node.healthy(time.monotonic())
+    finish(router, node, failed = True)
+    assert not node.healthy(time.monotonic())
+    assert all(router.pick("db/users", True) is not node for _ in range(10))
+    assert router.alternative("db/users", router.nodes[1]) is router.nodes[2]
+    time.sleep(0.06)
+    assert node.healthy(time.monotonic())
+    assert router.pick("db/users", True) is node
+
+def test_slow_replicas_are_ejected():
+    router = Router(REPLICAS, slow_threshold = 0.5)
+    node = router.nodes[1]
+    finish(router, node, seconds = 0.2)
+    assert node.healthy(time.monotonic())
+    finish(router, node, seconds = 5.0)
+    assert not node.healthy(time.monotonic())
+    assert node.latency is None
+
+def test_every_replica_is_used_when_all_are_ejected():
+    router = Router(REPLICAS, max_failures = 1)
+    for node in router.nodes:
+        finish(router, node, failed = True)
+
+    assert router.pick("db/users", True) in router.nodes
+
+def test_abandoned_requests_only_release_their_slot():
+    router = Router(REPLICAS, max_failures = 1, slow_threshold = 0.5)
+    node = router.nodes[0]
+    router.started(node)
+    router.abandoned(node)
+    assert node.outstanding == 0 and node.latency is None and node.healthy(time.monotonic())
+
+def test_stats():
+    router = Router(REPLICAS, max_failures = 1)
+    finish(router, router.nodes[0], seconds = 0.25)
+    finish(router, router.nodes[1], failed = True)
+    router.started(router.nodes[2])
+    stats = router.stats
+    assert stats["http://a"]["requests"] == 1 and 0.25 <= stats["http://a"]["latency"] < 0.5
+    assert stats["http://b"]["ejections"] == 1 and not stats["http://b"]["healthy"]
+    assert stats["http://c"]["outstanding"] == 1
+
+async def test_hedge_losers_do_not_make_a_slow_replica_look_fast(stub, private_key):
+    async def slow(request):
+        await asyncio.sleep(1)
+        return web.json_response({"result": "slow"})
+
+    async def fast(request):
+        return web.json_response({"result": "fast"})
+
+    async with stub(slow) as slow_url, stub(fast) as fast_url:
+        hedging = Hedging(initial_delay = 0.02)
+        async with HTTPClient([slow_url, fast_url], private_key, hedging = hedging, slow_threshold = 0.5) as http:
+            results = Counter([await http.request("POST", "db/users/fetch", {"query": {}}) for _ in range(3)])
+            stats = http.router.stats
+
+    assert results == {"fast": 3}
+    assert hedging.hedged == 3
+    assert stats[slow_url]["latency"] is None and stats[slow_url]["outstanding"] == 0
@@ -0,0 +1,133 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from aster import wire
+
+from aster.errors import BadRequestError, DuplicateError, NotFoundError, PrivateKeyError, TimeoutError
+from aster.http import HTTPClient
+from aster.instrumentation import MetricsRecorder
+from aster.objects import authorization
+from aster.server import create_app
+
+def config(private_key, **options):
+    return dict({"mongo": "mongodb://localhost", "private_key": private_key}, **options)
+
+async def test_round_trip(serve, mongo, private_key):
+    async with serve(create_app(config(private_key), mongo)) as url, HTTPClient(url, private_key) as http:
+        await http.insert("db", "users", {"name": "Ada"})
+        assert [document["name"] for document in await http.fetch_many("db", "users", {})] == ["Ada"]
+        assert [document["name"] async for document in http.find("db", "users", {})] == ["Ada"]
+
+async def test_blob_round_trip(serve, mongo, private_key):
+    data = bytes(range(256)) * 4000
+    async with serve(create_app(config(private_key), mongo)) as url, HTTPClient(url, private_key) as http:
+        blob_id = await http.put_blob("db", "files", data, chunk_size = 65536)
+        blob = await http.open_blob("db", "files", blob_id)
+        assert blob.length == len(data)
+        assert await blob.read() == data
+        assert (await http.delete_blob("db", "files", blob_id))["deleted_count"] == 1
+
+async def test_error_mapping(serve, mongo, private_key, new_key):
+    async with serve(create_app(config(private_key), mongo)) as url, HTTPClient(url, private_key) as http:
+        await http.insert("db", "users", {"_id": 1, "name": "Ada"})
+        with pytest.raises(DuplicateError):
+            await http.insert("db", "users", {"_id": 1, "name": "Ada"})
+
+        with pytest.raises(BadRequestError):
+            await http.bulk_write("db", "users", [{"op": "upsert"}])
+
+        with pytest.raises(NotFoundError):
+            await http.open_blob("db", "files", "missing")
+
+        http.set_key(new_key)
+        with pytest.raises(PrivateKeyError):
+            await http.insert("db", "users", {"name": "Ada"})
+
+async def test_timeouts_map_to_504(serve, mongo, private_key):
+    async with serve(create_app(config(private_key, timeout = 1e-9), mongo)) as url, HTTPClient(url, private_key) as http:
+        with pytest.raises(TimeoutError):
+            await http.insert("db", "users", {"name": "Ada"})
+
+async def test_fetch_matches_the_direct_client(serve, mongo, private_key):
+    from aster.objects import DirectLink
+    from aster.wrapper import Aster
+
+    async with serve(create_app(config(private_key, blind_indexes = {"db.users": ["name"]}), mongo)) as url:
+        async with Aster(url, private_key, cache_size = 8) as http, Aster(DirectLink("mongodb://localhost"), private_key, mongo_client = mongo, blind_indexes = {"db.users": ["name"]}) as direct:
+            await http.insert("db", "users", {"name": "Ada", "age": 36})
+            await http.insert("db", "users", {"name": "Grace", "age": 85})
+            for aster in (http, direct):
+                assert await aster.get("db", "users", {"name": "Grace"}) == {"name": "Grace", "age": 85}
+                assert await aster.client.fetch("db", "users", {"name": "Ada"}, projection = ["age"]) == {"age": 36}
+                with pytest.raises(TypeError):
+                    await aster.client.fetch("db", "users", {"name": "Ada"}, 1)
+
+                with pytest.raises(NotFoundError):
+                    await aster.get("db", "users", {"name": "Alan"})
+
+@pytest.mark.parametrize("wire_format", ["json", "msgpack", "bson"])
+async def test_values_round_trip_in_every_wire_format(serve, mongo, private_key, wire_format):
+    # Fields cannot hold dates, the `_id` carries one through the insert result and the queries.
+    at = datetime(2024, 5, 17, 9, 30, 0, 250000)
+    values = {"data": b"\x00\xff" * 64, "count": 2 ** 40}
+    document = dict(values, _id = at)
+    async with serve(create_app(config(private_key), mongo)) as url, HTTPClient(url, private_key, wire_format = wire_format) as http:
+        assert http.content_type == wire.WIRE_FORMATS[wire_format]
+        assert (await http.insert("db", "values", document))["inserted_id"] == at
+        assert await http.fetch("db", "values", {"_id": at}) == values
+        assert [found async for found in http.find("db", "values", {"_id": at})] == [values]
+
+async def test_single_flight_keeps_object_id_and_string_reads_apart(serve, mongo, private_key):
+    async with serve(create_app(config(private_key), mongo)) as url, HTTPClient(url, private_key) as http:
+        object_id = (await http.insert("db", "users", {"name": "Ada"}))["inserted_id"]
+        found, missing = await asyncio.gather(
+            http.fetch("db", "users", {"_id": object_id}),
+            http.fetch("db", "users", {"_id": str(object_id)}),
+            return_exceptions = True
+        )
+        assert found == {"name": "Ada"}
+        assert isinstance(missing, NotFoundError)
+        assert http.single_flight.stats["calls"] == 2
+
+async def test_collapsed_callers_time_their_own_wait(serve, mongo, private_key):
+    recorder = MetricsRecorder()
+    async with serve(create_app(config(private_key), mongo)) as url, HTTPClient(url, private_key, instrumentation = recorder) as http:
+        await http.insert("db", "users", {"name": "Ada"})
+        recorder.reset()
+        results = await asyncio.gather(*(http.fetch("db", "users", {}) for _ in range(2)))
+        assert results == [{"name": "Ada"}] * 2
+        assert http.single_flight.stats["collapsed"] == 1
+
+    metrics = recorder.export()
+    assert metrics["fetch"]["count"] == 2
+    assert metrics["fetch"]["phases"]["wait"]["count"] == 2
+    assert metrics["fetch.shared"]["count"] == 1
+    assert set(metrics["fetch.shared"]["phases"]) >= {"serialize", "network", "deserialize"}
+
+async def test_find_streams_newline_delimited_json(serve, mongo, private_key):
+    async with serve(create_app(config(private_key), mongo)) as url, HTTPClient(url, private_key) as http:
+        await http.insert_many("db", "users", [{"_id": index, "age": index} for index in range(5)])
+        async with http.session.post(
+            f"{url}/db/users/find",
+            json = {"query": {"_id": {"$gt": 1}}, "batch_size": 2},
+            headers = {"Authorization": authorization(private_key)}
+        ) as response:
+            assert response.headers["Content-Type"].startswith("application/x-ndjson")
+            lines = [json.loads(line) async for line in response.content if line.strip()]
+
+        assert lines == [{"age": 2}, {"age": 3}, {"age": 4}]
+        assert [document["age"] async for document in http.find("db", "users", {}, batch_size = 2)] == list(range(5))
+
+async def test_fetch_many_and_fetch_page_over_http(serve, mongo, private_key):
+    async with serve(create_app(config(private_key), mongo)) as url, HTTPClient(url, private_key) as http:
+        await http.insert_many("db", "users", [{"_id": index, "name": f"user{index}", "age": index} for index in range(5)])
+        documents = await http.fetch_many("db", "users", {}, 2, 1, [("_id", -1)], ["name"])
+        assert documents == [{"name": "user3"}, {"name": "user2"}]
+        first, token = await http.fetch_page("db", "users", {}, page_size = 3)
+        second, last = await http.fetch_page("db", "users", {}, page_size = 3, token = token)
+        assert [document["age"] for document in first + second] == list(range(5)) and last is None
+        with pytest.raises(BadRequestError):
+            await http.fetch_page("db", "users", {}, token = "not a token")
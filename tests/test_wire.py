@@ -0,0 +1,22 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId # type: ignore
+from pymongo.results import InsertOneResult # type: ignore
+
+from aster import wire
+from aster.server import serialize
+
+DOCUMENT = {"_id": ObjectId(), "data": b"\x00\xff", "at": datetime(2024, 5, 17, 9, 30, 0, 250000), "count": 2 ** 40}
+
+@pytest.mark.parametrize("content_type", list(wire.WIRE_FORMATS.values()))
+def test_round_trip(content_type):
+    assert wire.loads(content_type, wire.dumps(content_type, {"result": DOCUMENT}))["result"] == DOCUMENT
+
+def test_binary_formats_keep_bytes_raw():
+    for content_type in (wire.MSGPACK, wire.BSON):
+        assert DOCUMENT["data"] in wire.dumps(content_type, DOCUMENT)
+
+def test_serialize_only_converts_motor_results():
+    assert serialize(DOCUMENT) is DOCUMENT
+    assert serialize(InsertOneResult(DOCUMENT["_id"], True)) == {"inserted_id": DOCUMENT["_id"]}